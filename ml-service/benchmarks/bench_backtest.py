@@ -0,0 +1,64 @@
+"""
+Benchmark a parallel walk-forward backtest against training its folds one by one
+
+Usage:
+    python benchmarks/bench_backtest.py [rows] [n_features] [folds]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.backtesting import WalkForwardBacktester, _init_worker, _run_fold
+from utils.dataset_store import DatasetStore
+from utils.resource_manager import ResourceManager
+from utils.synthetic_data import SyntheticDataGenerator
+
+MODEL_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'random_state': 42,
+    'eval_metric': 'logloss'
+}
+
+def main():
+    """Run the benchmark"""
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_features = int(sys.argv[2]) if len(sys.argv) > 2 else 968
+    n_folds = int(sys.argv[3]) if len(sys.argv) > 3 else 12
+
+    # Rows spread over about n_folds + 3 days: 3-day train, 1-day test, 1-day step
+    generator = SyntheticDataGenerator(n_features=n_features, failure_rate=0.05,
+                                       mean_interval_ms=(n_folds + 3) * 86_400_000 / n_rows)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = DatasetStore(os.path.join(data_dir, 'dataset'))
+        generator.save(store, n_rows)
+
+        resource_manager = ResourceManager()
+        backtester = WalkForwardBacktester(store, MODEL_PARAMS, resource_manager)
+        folds = backtester.generate_folds(3, 1, 1)[:n_folds]
+
+        # Sequential baseline: every fold trained in turn with all background threads
+        _init_worker(store.array_path('features'), store.array_path('responses'))
+        start = time.perf_counter()
+        fold_seconds = [_run_fold(fold, MODEL_PARAMS, resource_manager.background_threads)['seconds']
+                        for fold in folds]
+        sequential = time.perf_counter() - start
+
+        result = backtester.run(3, 1, 1)
+
+    print(f"Rows: {n_rows}, features: {n_features}, folds: {len(folds)}, cores: {resource_manager.total_cores}")
+    print(f"One fold (≈ one /train):  {np.median(fold_seconds):8.2f} s")
+    print(f"Sequential folds:         {sequential:8.2f} s")
+    print(f"Parallel backtest:        {result['seconds']:8.2f} s "
+          f"({result['workers']} workers x {result['threads_per_worker']} threads)")
+
+if __name__ == "__main__":
+    main()
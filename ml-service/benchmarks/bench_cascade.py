@@ -0,0 +1,46 @@
+"""
+Benchmark cascade inference against full-ensemble scoring
+
+Trains the service's 100-tree model on a Bosch-shaped synthetic set where
+most parts are clear passes, then sweeps prefix length and escalation band
+on a held-out window.
+
+Usage:
+    python benchmarks/bench_cascade.py [rows] [n_features]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.cascade import CascadeScorer
+from utils.synthetic_data import SyntheticDataGenerator
+
+def main():
+    """Run the benchmark"""
+    import xgboost as xgb
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    n_features = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    data = SyntheticDataGenerator(n_features=n_features, failure_rate=0.05).generate(n_rows)
+    X, y = data['features'], data['responses'].astype(int)  # 1 = Pass, about 5% fail
+
+    split = n_rows // 2
+    model = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.1,
+                              random_state=42, n_jobs=1)
+    model.fit(X[:split], y[:split])
+    X_test, y_test = X[split:], y[split:]
+
+    print(f"Test rows: {len(X_test)}, features: {n_features}, fail rate: {1 - y_test.mean():.3f}")
+    print(f"{'prefix':>6} {'band':>6} {'escalated':>10} {'acc diff':>10} {'agreement':>10} {'gain':>7}")
+    for prefix_trees in (10, 20, 40):
+        for margin_band in (1.0, 2.0, 3.0):
+            result = CascadeScorer(model, prefix_trees, margin_band).evaluate(X_test, y_test)
+            print(f"{prefix_trees:>6} {margin_band:>6.1f} {result['escalated_fraction']:>10.3f} "
+                  f"{result['accuracy_difference']:>+10.4f} {result['agreement']:>10.4f} "
+                  f"{result['throughput_gain']:>6.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark compressed request and response transport for bulk payloads
+
+Builds /train and /simulate payloads from Bosch-shaped synthetic parts and
+reports their size raw, gzip- and (if zstandard is installed) zstd-encoded,
+with the client's compression time. Then starts the service with uvicorn
+and times /train once and /simulate several times per encoding, end to end
+over loopback. Loopback hides transfer time, so the table also projects
+latency on a link of the given bandwidth: loopback latency plus wire bytes
+over bandwidth.
+
+Usage:
+    python benchmarks/bench_compression.py [rows] [mbit_per_s] [port]
+"""
+
+import gzip
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from load_test import start_service
+from utils.compression import available_encodings
+from utils.synthetic_data import SyntheticDataGenerator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def encode(body: bytes, encoding: str) -> bytes:
+    """Compress a request body as a client would"""
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=1)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return body
+
+def post(client: httpx.Client, url: str, body: bytes, encoding: str) -> tuple:
+    """POST a JSON body compressed with encoding and accepting it back; returns seconds, sent and received bytes"""
+    headers = {'content-type': 'application/json'}
+    if encoding != 'identity':
+        headers.update({'content-encoding': encoding, 'accept-encoding': encoding})
+    else:
+        headers['accept-encoding'] = 'identity'
+    started = time.perf_counter()
+    payload = encode(body, encoding)
+    response = client.post(url, content=payload, headers=headers)
+    response.raise_for_status()
+    response.json()
+    seconds = time.perf_counter() - started
+    # Bytes as they came over the wire, before httpx decoded them
+    return seconds, len(payload), response.num_bytes_downloaded
+
+def main():
+    """Run the benchmark"""
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    mbit_per_s = float(sys.argv[2]) if len(sys.argv) > 2 else 100.0
+    port = int(sys.argv[3]) if len(sys.argv) > 3 else 8765
+    bytes_per_s = mbit_per_s * 1e6 / 8
+
+    generator = SyntheticDataGenerator(failure_rate=0.05)
+    points = generator.to_points(generator.generate(n_rows))
+    split = int(n_rows * 0.8)
+    strip = lambda rows: [{k: v for k, v in p.items() if k != 'id'} for p in rows]
+    payloads = {
+        'train': json.dumps({'trainStart': 'a', 'trainEnd': 'b', 'testStart': 'c', 'testEnd': 'd',
+                             'trainingData': strip(points[:split]),
+                             'testingData': strip(points[split:])}).encode(),
+        'simulate': json.dumps({'simulationStart': 'a', 'simulationEnd': 'b',
+                                'data': points[split:]}).encode()
+    }
+    encodings = ['identity'] + available_encodings()[::-1]
+
+    print(f"Payload sizes ({n_rows} rows)")
+    print(f"{'payload':>9} {'encoding':>9} {'MB':>8} {'ratio':>7} {'encode ms':>10}")
+    for name, body in payloads.items():
+        for encoding in encodings:
+            started = time.perf_counter()
+            size = len(encode(body, encoding))
+            print(f"{name:>9} {encoding:>9} {size / 1e6:>8.2f} {len(body) / size:>7.1f} "
+                  f"{(time.perf_counter() - started) * 1000:>10.1f}")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        process = start_service(port, data_dir)
+        try:
+            url = f"http://127.0.0.1:{port}"
+            print(f"\nEnd to end (projected at {mbit_per_s:g} Mbit/s)")
+            print(f"{'endpoint':>9} {'encoding':>9} {'sent MB':>8} {'recv MB':>8} {'loopback ms':>12} "
+                  f"{'projected ms':>13}")
+            with httpx.Client(timeout=600) as client:
+                for endpoint, repeat in (('train', 1), ('simulate', 5)):
+                    for encoding in encodings:
+                        runs = [post(client, f"{url}/{endpoint}", payloads[endpoint], encoding)
+                                for _ in range(repeat)]
+                        seconds = statistics.median(run[0] for run in runs)
+                        _, sent, received = runs[-1]
+                        projected = seconds + (sent + received) / bytes_per_s
+                        print(f"{endpoint:>9} {encoding:>9} {sent / 1e6:>8.2f} {received / 1e6:>8.2f} "
+                              f"{seconds * 1000:>12.1f} {projected * 1000:>13.1f}")
+        finally:
+            process.terminate()
+            process.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark compacted models against the full ensemble
+
+Trains the service's 100-tree model on a Bosch-shaped synthetic set, then
+compacts it under several accuracy-loss limits and compares single-row and
+batch latency and test accuracy of the full and the selected model.
+
+Usage:
+    python benchmarks/bench_distillation.py [rows] [n_features]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from models.distillation import ModelDistiller
+from utils.synthetic_data import SyntheticDataGenerator
+
+def latency(model, X: np.ndarray, repeat: int) -> float:
+    """Best wall time of one predict_proba call over repeat calls"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        model.predict_proba(X)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    """Run the benchmark"""
+    import xgboost as xgb
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_features = int(sys.argv[2]) if len(sys.argv) > 2 else 968
+
+    data = SyntheticDataGenerator(n_features=n_features, failure_rate=0.05).generate(n_rows)
+    # The service fills missing features with 0
+    X, y = np.nan_to_num(data['features']), data['responses'].astype(int)
+    split = n_rows // 2
+    X_train, y_train, X_test, y_test = X[:split], y[:split], X[split:], y[split:]
+
+    full = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.1,
+                             random_state=42, n_jobs=1)
+    full.fit(X_train, y_train)
+    row = X_test[:1]
+
+    print(f"Test rows: {len(X_test)}, features: {n_features}, fail rate: {1 - y_test.mean():.3f}")
+    print(f"{'limit':>6} {'model':>16} {'acc':>7} {'loss':>8} {'agree':>7} {'1-row us':>9} "
+          f"{'batch us/row':>13} {'compact s':>10}")
+    print(f"{'-':>6} {'full 100x6':>16} {'':>7} {'':>8} {'':>7} {latency(full, row, 500) * 1e6:>9.1f} "
+          f"{latency(full, X_test, 3) / len(X_test) * 1e6:>13.2f} {'':>10}")
+    for limit in (0.0, 0.001, 0.005, 0.01):
+        started = time.perf_counter()
+        fast, report = ModelDistiller(limit).compact(full, X_train, X_test, y_test)
+        seconds = time.perf_counter() - started
+        if fast is None:
+            print(f"{limit:>6.3f} {'none':>16}")
+            continue
+        selected = report['selected']
+        name = f"{selected['kind']} {selected['trees']}x{selected['max_depth']}"
+        print(f"{limit:>6.3f} {name:>16} {selected['accuracy']:>7.4f} {selected['accuracy_loss']:>+8.4f} "
+              f"{selected['agreement']:>7.4f} {latency(fast, row, 500) * 1e6:>9.1f} "
+              f"{latency(fast, X_test, 3) / len(X_test) * 1e6:>13.2f} {seconds:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark drift monitor overhead relative to batch inference
+
+Usage:
+    python benchmarks/bench_drift_overhead.py [n_features] [batch_size]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import xgboost as xgb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.drift_monitor import FeatureDriftMonitor
+
+def best_of(func, repeats: int = 20) -> float:
+    """Return the fastest wall time of several runs in seconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    """Run the benchmark"""
+    n_features = int(sys.argv[1]) if len(sys.argv) > 1 else 968
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = np.random.default_rng(42)
+
+    X_train = rng.normal(size=(5000, n_features)).astype(np.float32)
+    y_train = (X_train[:, 0] + X_train[:, 1] > 0).astype(int)
+    X_batch = rng.normal(0.1, 1.0, size=(batch_size, n_features)).astype(np.float32)
+
+    model = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.1,
+                              random_state=42, eval_metric='logloss')
+    model.fit(X_train, y_train)
+
+    monitor = FeatureDriftMonitor([f"f{i}" for i in range(n_features)])
+    monitor.fit(X_train)
+
+    inference = best_of(lambda: model.predict_proba(X_batch))
+    update = best_of(lambda: monitor.update(X_batch))
+
+    print(f"Features: {n_features}, batch size: {batch_size}")
+    print(f"Inference:     {inference * 1000:8.2f} ms")
+    print(f"Drift update:  {update * 1000:8.2f} ms")
+    print(f"Overhead:      {update / inference * 100:8.2f} %")
+    print(f"Sketch memory: {monitor.live_counts.nbytes + monitor.reference_counts.nbytes} bytes")
+
+if __name__ == "__main__":
+    main()
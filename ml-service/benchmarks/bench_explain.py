@@ -0,0 +1,59 @@
+"""
+Benchmark batched feature attributions: TreeSHAP, approximate and cached
+
+Compares one pred_contribs call per row against one call per batch, the
+approximate mode, and a second request for the same rows served from the
+explanation cache.
+
+Usage:
+    python benchmarks/bench_explain.py [rows] [n_features]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.explainer import PredictionExplainer
+
+def timed(function) -> float:
+    """Seconds one call takes"""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def main():
+    """Run the benchmark"""
+    import xgboost as xgb
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_features = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    rng = np.random.default_rng(42)
+    columns = [f"L{j // 100}_S{j // 10}_F{j}" for j in range(n_features)]
+    X_fit = rng.normal(size=(5000, n_features)).astype(np.float32)
+    model = xgb.XGBClassifier(n_estimators=100, max_depth=6, n_jobs=1)
+    model.fit(X_fit, (X_fit[:, 0] + X_fit[:, 1] > 0).astype(int))
+    X = rng.normal(size=(n_rows, n_features)).astype(np.float32)
+    booster = model.get_booster()
+
+    per_row_rows = min(n_rows, 200)
+    per_row = timed(lambda: [booster.predict(xgb.DMatrix(X[i:i + 1]), pred_contribs=True)
+                             for i in range(per_row_rows)]) / per_row_rows
+
+    explainer = PredictionExplainer()
+    exact = timed(lambda: explainer.explain(model, 'v1', columns, X, top_k=5)) / n_rows
+    cached = min(timed(lambda: explainer.explain(model, 'v1', columns, X, top_k=5)) for _ in range(3)) / n_rows
+    approximate = timed(lambda: explainer.explain(model, 'v1', columns, X, top_k=5, approximate=True)) / n_rows
+
+    print(f"Rows: {n_rows}, features: {n_features}, trees: 100, depth: 6")
+    print(f"{'variant':>22} {'us/row':>10}")
+    for name, seconds in (('TreeSHAP, per row', per_row), ('TreeSHAP, batched', exact),
+                          ('approximate, batched', approximate), ('cached', cached)):
+        print(f"{name:>22} {seconds * 1e6:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark peak RSS of the pandas float64 path against the float32 path
+
+Each measurement runs in a fresh subprocess so peak RSS is not shared.
+The reported figure is peak RSS minus RSS after the request rows exist,
+i.e. the memory the data path itself adds on top of the parsed request.
+
+Usage:
+    python benchmarks/bench_memory.py [n_features] [rows ...]
+"""
+
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def current_rss_bytes() -> int:
+    """Current resident set size of this process"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def run_case(path: str, n_rows: int, n_features: int) -> None:
+    """Build request rows, score them through one data path and print the RSS delta"""
+    import numpy as np
+    import xgboost as xgb
+
+    rng = np.random.default_rng(42)
+    columns = [f"L0_S{j // 10}_F{j}" for j in range(n_features)]
+    values = rng.normal(size=n_features).tolist()
+    rows = [dict(zip(columns, values)) for _ in range(n_rows)]
+
+    model = xgb.XGBClassifier(n_estimators=100, max_depth=6, random_state=42)
+    X_fit = rng.normal(size=(1000, n_features)).astype(np.float32)
+    model.fit(X_fit, (X_fit[:, 0] > 0).astype(int))
+
+    baseline = current_rss_bytes()
+
+    if path == 'pandas':
+        import pandas as pd
+        features_df = pd.DataFrame(rows)
+        features_df = features_df.reindex(columns=columns).fillna(0)
+        model.predict_proba(features_df)
+    else:
+        from config import Config
+        from utils.data_processor import DataProcessor
+        budget_bytes = Config.get_memory_params()['request_memory_budget_mb'] * 1024 * 1024
+        chunk_rows = max(1, budget_bytes // DataProcessor.estimate_matrix_bytes(1, n_features))
+        for start in range(0, n_rows, chunk_rows):
+            X = DataProcessor.build_feature_matrix(rows[start:start + chunk_rows], columns)
+            model.predict_proba(X)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(max(0, peak - baseline))
+
+def main():
+    """Run the benchmark"""
+    if len(sys.argv) > 1 and sys.argv[1] == '--case':
+        run_case(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+        return
+
+    n_features = int(sys.argv[1]) if len(sys.argv) > 1 else 968
+    row_counts = [int(arg) for arg in sys.argv[2:]] or [100_000, 1_000_000]
+
+    print(f"Features: {n_features}, memory budget: {os.getenv('REQUEST_MEMORY_BUDGET_MB', '1024')} MB")
+    print(f"{'rows':>10} {'pandas float64 (MB)':>22} {'float32 (MB)':>14}")
+    for n_rows in row_counts:
+        results = []
+        for path in ('pandas', 'float32'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--case', path, str(n_rows), str(n_features)],
+                capture_output=True, text=True
+            )
+            results.append(int(output.stdout.strip()) / 1024 ** 2 if output.returncode == 0 else float('nan'))
+        print(f"{n_rows:>10} {results[0]:>22.1f} {results[1]:>14.1f}")
+
+if __name__ == "__main__":
+    main()
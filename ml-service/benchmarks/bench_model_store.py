@@ -0,0 +1,76 @@
+"""
+Benchmark native model bundles against joblib pickles
+
+Trains ensembles of growing size on a Bosch-shaped synthetic set, saves
+each as a joblib pickle (the service's earlier format) and as a native
+bundle, and reports file size, save time and the best load time of each,
+checking that both load to identical predictions.
+
+Usage:
+    python benchmarks/bench_model_store.py [rows] [n_features]
+"""
+
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from models.model_store import bundle_paths, load_model_bundle, save_model_bundle
+from utils.synthetic_data import SyntheticDataGenerator
+
+def best_time(function, repeat: int = 5) -> float:
+    """Best wall time of function over repeat calls"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def bundle_size(path: str) -> int:
+    """Bytes of a bundle's metadata and booster files"""
+    return sum(os.path.getsize(bundle_file) for bundle_file in glob.glob(f"{os.path.splitext(path)[0]}.*"))
+
+def main():
+    """Run the benchmark"""
+    import joblib
+    import xgboost as xgb
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_features = int(sys.argv[2]) if len(sys.argv) > 2 else 968
+
+    generator = SyntheticDataGenerator(n_features=n_features, failure_rate=0.05)
+    data = generator.generate(n_rows)
+    X, y = np.nan_to_num(data['features']), data['responses'].astype(int)
+    columns = generator.feature_columns
+
+    print(f"{'model':>10} {'format':>7} {'size MB':>8} {'save ms':>8} {'load ms':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for trees, depth in ((100, 6), (500, 6), (1000, 8)):
+            model = xgb.XGBClassifier(n_estimators=trees, max_depth=depth, learning_rate=0.1,
+                                      random_state=42, n_jobs=1).fit(X, y)
+            bundle = {'model': model, 'feature_columns': columns, 'model_version': 'bench', 'threshold': 0.5}
+            pickle_path = os.path.join(directory, f"model_{trees}.pkl")
+            native_path = bundle_paths(os.path.join(directory, f"native_{trees}.json"))[0]
+
+            save_pickle = best_time(lambda: joblib.dump(bundle, pickle_path), 3)
+            load_pickle = best_time(lambda: joblib.load(pickle_path))
+            save_native = best_time(lambda: save_model_bundle(native_path, model, columns, 'bench', 0.5), 3)
+            load_native = best_time(lambda: load_model_bundle(native_path))
+
+            expected = joblib.load(pickle_path)['model'].predict_proba(X[:1000])
+            assert np.array_equal(load_model_bundle(native_path)['model'].predict_proba(X[:1000]), expected)
+
+            name = f"{trees}x{depth}"
+            print(f"{name:>10} {'joblib':>7} {os.path.getsize(pickle_path) / 1e6:>8.2f} "
+                  f"{save_pickle * 1000:>8.1f} {load_pickle * 1000:>8.1f}")
+            print(f"{name:>10} {'native':>7} {bundle_size(native_path) / 1e6:>8.2f} "
+                  f"{save_native * 1000:>8.1f} {load_native * 1000:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark concurrent simulation replay: shared scheduler against a task per session
+
+Both variants replay the same sessions at the same speed. The baseline
+runs one asyncio task per session that sleeps until each record is due and
+scores it on its own; the scheduler batches due records across sessions.
+Reported are wall time, inference calls and how late records were replayed.
+
+Usage:
+    python benchmarks/bench_replay_sessions.py [sessions] [records] [speed]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.replay_scheduler import ReplaySession, ReplayScheduler
+
+N_FEATURES = 50
+
+def make_sessions(n_sessions: int, n_records: int, speed: float, scorer) -> list:
+    """Sessions with one record per recorded second"""
+    rng = np.random.default_rng(42)
+    sessions = []
+    for _ in range(n_sessions):
+        replay_times = np.datetime64('2021-01-01T00:00:00') + np.arange(n_records).astype('timedelta64[s]')
+        features = rng.normal(size=(n_records, N_FEATURES)).astype(np.float32)
+        sessions.append(ReplaySession(
+            np.datetime_as_string(replay_times, unit='s').tolist(), list(range(n_records)),
+            replay_times, speed, features=features, scorer=scorer
+        ))
+    return sessions
+
+async def run_baseline(sessions: list, lateness: list) -> int:
+    """One task per session, one prediction per record"""
+    calls = 0
+    loop = asyncio.get_running_loop()
+
+    async def replay(session):
+        nonlocal calls
+        session.started_at = loop.time()
+        for i in range(session.total_records):
+            delay = session.due_time(i) - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lateness.append(loop.time() - session.due_time(i))
+            session.scorer(session.features[i:i + 1])
+            calls += 1
+
+    await asyncio.gather(*(replay(session) for session in sessions))
+    return calls
+
+async def run_scheduler(sessions: list, lateness: list) -> int:
+    """All sessions on the shared timer loop"""
+    scheduler = ReplayScheduler(lambda timestamp, sample_id, p: None, max_sessions=len(sessions) + 1,
+                                max_records=sum(session.total_records for session in sessions))
+    for session in sessions:
+        scheduler.start(session)
+    while any(session.status == 'running' for session in sessions):
+        await asyncio.sleep(0.05)
+    lateness.append(scheduler.max_lag)
+    return scheduler.inference_calls
+
+def main():
+    """Run the benchmark"""
+    import xgboost as xgb
+
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    n_records = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    speed = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    rng = np.random.default_rng(0)
+    X_fit = rng.normal(size=(2000, N_FEATURES)).astype(np.float32)
+    model = xgb.XGBClassifier(n_estimators=100, max_depth=6, n_jobs=1)
+    model.fit(X_fit, (X_fit[:, 0] > 0).astype(int))
+
+    def scorer(X):
+        return model.predict_proba(X)[:, 1]
+
+    replay_seconds = (n_records - 1) / speed
+    print(f"Sessions: {n_sessions}, records each: {n_records}, speed: {speed} "
+          f"(ideal replay {replay_seconds:.1f} s)")
+    print(f"{'variant':>12} {'wall (s)':>10} {'inference calls':>16} {'max lag (ms)':>14}")
+
+    for name in ('task/session', 'scheduler'):
+        sessions = make_sessions(n_sessions, n_records, speed, scorer)
+        lateness = []
+        start = time.perf_counter()
+        if name == 'scheduler':
+            calls = asyncio.run(run_scheduler(sessions, lateness))
+        else:
+            calls = asyncio.run(run_baseline(sessions, lateness))
+        wall = time.perf_counter() - start
+        print(f"{name:>12} {wall:>10.2f} {calls:>16} {max(lateness) * 1000:>14.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark time from process start to liveness (/health) and readiness (/ready)
+
+Starts the service with uvicorn several times and reports the median of
+each. Pass a DATA_DIR holding a saved model (trained_model.json) to include model loading
+and warm-up in the readiness figure.
+
+Usage:
+    python benchmarks/bench_startup.py [runs] [port]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def wait_for(url: str, deadline: float) -> float:
+    """Poll url until it answers 200 and return the time it did"""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{url} did not become available")
+
+def measure(port: int) -> tuple:
+    """Start the service once and return seconds to liveness and readiness"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port)],
+        cwd=SERVICE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = start + 120
+        live = wait_for(f"http://127.0.0.1:{port}/health", deadline)
+        ready = wait_for(f"http://127.0.0.1:{port}/ready", deadline)
+        return live - start, ready - start
+    finally:
+        process.terminate()
+        process.wait()
+
+def main():
+    """Run the benchmark"""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+
+    results = [measure(port) for _ in range(runs)]
+    live = statistics.median(result[0] for result in results)
+    ready = statistics.median(result[1] for result in results)
+
+    print(f"Runs: {runs}")
+    print(f"Time to liveness:  {live * 1000:8.0f} ms")
+    print(f"Time to readiness: {ready * 1000:8.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark the compact station-aggregate model against the full-width model
+
+Trains the service's model on all 968 columns of a Bosch-shaped synthetic
+set and on station aggregates plus the most label-correlated raw columns,
+then compares training time, single-row and batch inference latency and
+test metrics. Also times aggregating a stored dataset cold and from the
+cache.
+
+Usage:
+    python benchmarks/bench_station_features.py [rows] [n_raw]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from models.compact_model import CompactFeatures, CompactModel
+from models.evaluation import ThresholdSweep, classification_metrics
+from utils.dataset_store import DatasetStore
+from utils.station_features import StationFeatureCache
+from utils.synthetic_data import SyntheticDataGenerator
+
+def timed(fn, *args, repeat: int = 1):
+    """Best wall time of fn over repeat calls, and its last result"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    """Run the benchmark"""
+    import xgboost as xgb
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_raw = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    generator = SyntheticDataGenerator(failure_rate=0.05)
+    data = generator.generate(n_rows)
+    # The service fills missing features with 0
+    X, y = np.nan_to_num(data['features']), data['responses'].astype(int)
+    split = n_rows // 2
+    X_train, y_train, X_test, y_test = X[:split], y[:split], X[split:], y[split:]
+
+    def fit(features):
+        model = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.1,
+                                  random_state=42, n_jobs=1)
+        return model.fit(features, y_train)
+
+    def fit_compact():
+        features = CompactFeatures.select(generator.feature_columns, X_train, y_train, n_raw)
+        return CompactModel(features, fit(features.transform(X_train)))
+
+    full_seconds, full = timed(fit, X_train)
+    compact_seconds, compact = timed(fit_compact)
+
+    print(f"Rows: {n_rows}, features: {X.shape[1]}, stations: {compact.features.station_map.n_stations}, "
+          f"fail rate: {1 - y.mean():.4f}")
+    print(f"{'model':>8} {'width':>6} {'train s':>8} {'1-row ms':>9} {'batch us/row':>13} "
+          f"{'acc':>7} {'f1':>7} {'auc':>7}")
+    for name, model, seconds in (('full', full, full_seconds), ('compact', compact, compact_seconds)):
+        single_seconds, _ = timed(model.predict_proba, X_test[:1], repeat=200)
+        batch_seconds, probabilities = timed(model.predict_proba, X_test, repeat=3)
+        pass_probabilities = probabilities[:, 1]
+        sweep = ThresholdSweep(y_test, pass_probabilities)
+        metrics = classification_metrics(y_test, pass_probabilities, sweep.best_threshold('f1'))
+        width = len(model.features.columns) if name == 'compact' else X.shape[1]
+        print(f"{name:>8} {width:>6} {seconds:>8.2f} {single_seconds * 1e3:>9.3f} "
+              f"{batch_seconds / len(X_test) * 1e6:>13.2f} {metrics['accuracy']:>7.4f} "
+              f"{metrics['f1_score']:>7.4f} {sweep.roc_auc():>7.4f}")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = DatasetStore(os.path.join(root, 'dataset'))
+        generator.save(store, n_rows)
+        cache = StationFeatureCache(os.path.join(root, 'station_features'))
+        station_map = compact.features.station_map
+        cold_seconds, _ = timed(cache.get, store, station_map)
+        warm_seconds, aggregates = timed(cache.get, store, station_map, repeat=5)
+        stored = np.nan_to_num(store.array('features'))
+        cached_seconds, _ = timed(compact.predict_proba, stored, aggregates, repeat=3)
+        uncached_seconds, _ = timed(compact.predict_proba, stored, repeat=3)
+        print(f"Aggregates of {n_rows} stored rows: {cold_seconds:.2f} s cold, {warm_seconds * 1e3:.2f} ms cached")
+        print(f"Compact scoring of the stored rows: {uncached_seconds:.2f} s aggregating, "
+              f"{cached_seconds:.2f} s from the cache")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark the synthetic workload generator against per-row generation
+
+Compares building rows one dict at a time, as the load test and sample
+data did, with the vectorized generator in memory and written chunk by
+chunk to a dataset store, and per-result sensor draws with block draws.
+
+Usage:
+    python benchmarks/bench_synthetic.py [rows] [n_features]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.dataset_store import DatasetStore
+from utils.synthetic_data import SENSOR_FIELDS, SensorReadings, SyntheticDataGenerator
+
+def timed(function) -> float:
+    """Seconds one call takes"""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def per_row(n_rows: int, n_features: int) -> None:
+    """One random row and one dict per part"""
+    rng = np.random.default_rng(42)
+    columns = [f"L0_S{j // 19}_F{j}" for j in range(n_features)]
+    for _ in range(n_rows):
+        dict(zip(columns, rng.normal(size=n_features).round(3).tolist()))
+
+def main():
+    """Run the benchmark"""
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_features = int(sys.argv[2]) if len(sys.argv) > 2 else 968
+
+    print(f"Rows: {n_rows}, features: {n_features}")
+    print(f"{'variant':>28} {'rows/s':>12} {'MB/s':>8}")
+
+    def report(name: str, rows: int, seconds: float) -> None:
+        print(f"{name:>28} {rows / seconds:>12,.0f} {rows * n_features * 4 / seconds / 1024 ** 2:>8.0f}")
+
+    baseline_rows = min(n_rows, 20_000)
+    report('per-row dicts', baseline_rows, timed(lambda: per_row(baseline_rows, n_features)))
+
+    for width in sorted({100, n_features}):
+        generator = SyntheticDataGenerator(n_features=width)
+        data = generator.generate(min(n_rows, 100_000))  # warm up the allocator
+        seconds = timed(lambda: generator.generate(n_rows))
+        print(f"{f'generate, {width} features':>28} {n_rows / seconds:>12,.0f} "
+              f"{n_rows * width * 4 / seconds / 1024 ** 2:>8.0f}")
+    print(f"Missing values: {np.isnan(data['features']).mean():.1%}, "
+          f"fail rate: {1 - data['responses'].mean():.2%}")
+    del data
+
+    generator = SyntheticDataGenerator(n_features=n_features)
+    reused = timed(lambda: [None for _ in generator.chunks(n_rows)])
+    report('chunks, reused buffers', n_rows, reused)
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = DatasetStore(os.path.join(data_dir, 'dataset'))
+        report('chunks to dataset store', n_rows, timed(lambda: generator.save(store, n_rows)))
+
+    n_readings = 100_000
+    rng = np.random.default_rng(42)
+    draws = timed(lambda: [
+        {name: round(rng.normal(mean, std), decimals) for name, (mean, std, decimals) in SENSOR_FIELDS.items()}
+        for _ in range(n_readings)
+    ])
+    readings = SensorReadings(seed=42)
+    blocks = timed(lambda: [readings.next() for _ in range(n_readings)])
+    print(f"Sensor readings: {draws / n_readings * 1e6:.2f} us per-row draws, "
+          f"{blocks / n_readings * 1e6:.2f} us from blocks")
+
+if __name__ == "__main__":
+    main()
@@ -30,18 +30,144 @@ class Config:
     SIMULATION_PARAMS = {
         'batch_size': int(os.getenv('SIMULATION_BATCH_SIZE', 100)),
         'delay_between_predictions': float(os.getenv('PREDICTION_DELAY', 0.1)),
-        'max_simulation_samples': int(os.getenv('MAX_SIMULATION_SAMPLES', 10000))
+        'max_simulation_samples': int(os.getenv('MAX_SIMULATION_SAMPLES', 10000)),
+        'replay_speed': float(os.getenv('SIMULATION_REPLAY_SPEED', 60)),  # recorded seconds per second
+        'max_sessions': int(os.getenv('SIMULATION_MAX_SESSIONS', 500)),
+        'max_retained_records': int(os.getenv('SIMULATION_MAX_RETAINED_RECORDS', 500000)),
+        'replay_batch_rows': int(os.getenv('SIMULATION_REPLAY_BATCH_ROWS', 4096)),
+        'replay_tick_ms': float(os.getenv('SIMULATION_REPLAY_TICK_MS', 10))
+    }
+    
+    # Memory budget parameters
+    MEMORY_PARAMS = {
+        'request_memory_budget_mb': int(os.getenv('REQUEST_MEMORY_BUDGET_MB', 1024)),
+        'training_memory_factor': float(os.getenv('TRAINING_MEMORY_FACTOR', 3.0)),
+        'track_requests': os.getenv('MEMORY_TRACK_REQUESTS', 'true').lower() == 'true',
+        'sample_interval_ms': float(os.getenv('MEMORY_SAMPLE_INTERVAL_MS', 5)),
+        'log_min_mb': float(os.getenv('MEMORY_LOG_MIN_MB', 10)),  # log requests peaking at least this much
+        'profile_max_requests': int(os.getenv('MEMORY_PROFILE_MAX_REQUESTS', 100))
+    }
+    
+    # CPU allocation parameters
+    RESOURCE_PARAMS = {
+        'total_cores': int(os.getenv('CPU_CORES', 0)),  # 0 = detect physical cores
+        'inference_core_share': float(os.getenv('INFERENCE_CORE_SHARE', 0.25)),
+        'max_job_threads': int(os.getenv('MAX_JOB_THREADS', 0))  # 0 = whole background pool
+    }
+    
+    # Drift monitoring parameters
+    DRIFT_PARAMS = {
+        'n_bins': int(os.getenv('DRIFT_N_BINS', 10)),
+        'sample_every': int(os.getenv('DRIFT_SAMPLE_EVERY', 32)),
+        'psi_alert_threshold': float(os.getenv('DRIFT_PSI_ALERT_THRESHOLD', 0.2)),
+        # Histogrammed rows needed before any feature is flagged as drifted
+        'min_samples': int(os.getenv('DRIFT_MIN_SAMPLES', 200))
+    }
+    
+    # Prediction index parameters
+    PREDICTION_INDEX_PARAMS = {
+        'enabled': os.getenv('PREDICTION_INDEX_ENABLED', 'true').lower() == 'true',
+        'batch_size': int(os.getenv('PREDICTION_INDEX_BATCH_SIZE', 10000))
+    }
+    
+    # WebSocket stream scoring parameters
+    STREAM_PARAMS = {
+        'batch_size': int(os.getenv('STREAM_BATCH_SIZE', 256)),
+        'max_batch_delay_ms': float(os.getenv('STREAM_MAX_BATCH_DELAY_MS', 10)),
+        'max_in_flight_rows': int(os.getenv('STREAM_MAX_IN_FLIGHT_ROWS', 4096))
+    }
+    
+    # Cascade inference parameters
+    CASCADE_PARAMS = {
+        'enabled': os.getenv('CASCADE_ENABLED', 'false').lower() == 'true',
+        'prefix_trees': int(os.getenv('CASCADE_PREFIX_TREES', 20)),
+        'margin_band': float(os.getenv('CASCADE_MARGIN_BAND', 2.0))  # log-odds around the threshold
+    }
+    
+    # Prediction explanation parameters
+    EXPLAIN_PARAMS = {
+        'default_top_k': int(os.getenv('EXPLAIN_TOP_K', 5)),
+        'max_top_k': int(os.getenv('EXPLAIN_MAX_TOP_K', 50)),
+        'cache_size': int(os.getenv('EXPLAIN_CACHE_SIZE', 20000)),  # rows
+        'max_rows': int(os.getenv('EXPLAIN_MAX_ROWS', 10000))
+    }
+    
+    # Bulk scoring parameters
+    BULK_SCORING_PARAMS = {
+        'chunk_rows': int(os.getenv('BULK_SCORING_CHUNK_ROWS', 50000)),
+        'max_workers': int(os.getenv('BULK_SCORING_MAX_WORKERS', 0)),  # 0 = one per allocated thread
+        'file_root': os.getenv('BULK_SCORING_ROOT', os.getenv('DATA_DIR', '/app/data'))
+    }
+    
+    # Admission control parameters
+    ADMISSION_PARAMS = {
+        'enabled': os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true',
+        'queue_timeout_seconds': float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 10)),
+        'predict_concurrency': int(os.getenv('ADMISSION_PREDICT_CONCURRENCY', 64)),
+        'predict_queue': int(os.getenv('ADMISSION_PREDICT_QUEUE', 256)),
+        'batch_concurrency': int(os.getenv('ADMISSION_BATCH_CONCURRENCY', 4)),  # simulate, explain, backtest
+        'batch_queue': int(os.getenv('ADMISSION_BATCH_QUEUE', 16)),
+        'batch_cost_mb': int(os.getenv('ADMISSION_BATCH_COST_MB', 2048)),  # estimated matrix MB in flight
+        'train_concurrency': int(os.getenv('ADMISSION_TRAIN_CONCURRENCY', 1)),
+        'train_queue': int(os.getenv('ADMISSION_TRAIN_QUEUE', 2))
+    }
+    
+    # Model evaluation parameters
+    EVALUATION_PARAMS = {
+        'threshold_metric': os.getenv('THRESHOLD_METRIC', 'f1'),  # f1, accuracy, youden or fixed
+        'default_threshold': float(os.getenv('DECISION_THRESHOLD', 0.5)),
+        'curve_points': int(os.getenv('EVALUATION_CURVE_POINTS', 101))
+    }
+    
+    # Feature set parameters
+    FEATURE_PARAMS = {
+        'feature_set': os.getenv('FEATURE_SET', 'full'),  # full or compact (station aggregates)
+        'compact_raw_features': int(os.getenv('COMPACT_RAW_FEATURES', 64))
+    }
+    
+    # Model compaction parameters
+    DISTILLATION_PARAMS = {
+        'enabled': os.getenv('DISTILLATION_ENABLED', 'true').lower() == 'true',
+        'max_accuracy_loss': float(os.getenv('DISTILLATION_MAX_ACCURACY_LOSS', 0.005)),
+        'tree_counts': [int(value) for value in os.getenv('DISTILLATION_TREE_COUNTS', '10,20,40').split(',')],
+        'max_depths': [int(value) for value in os.getenv('DISTILLATION_MAX_DEPTHS', '2,3,4').split(',')],
+        'learning_rate': float(os.getenv('DISTILLATION_LEARNING_RATE', 0.3)),
+        # Endpoints that serve the fast model when one exists: predict, simulate, stream
+        'fast_endpoints': [name.strip() for name in os.getenv('FAST_MODEL_ENDPOINTS', '').split(',') if name.strip()]
+    }
+    
+    # Training checkpoint parameters
+    CHECKPOINT_PARAMS = {
+        'enabled': os.getenv('TRAINING_CHECKPOINT_ENABLED', 'true').lower() == 'true',
+        'every_rounds': int(os.getenv('TRAINING_CHECKPOINT_ROUNDS', 10)),
+        'keep': int(os.getenv('TRAINING_CHECKPOINT_KEEP', 2)),
+        'max_age_hours': float(os.getenv('TRAINING_CHECKPOINT_MAX_AGE_HOURS', 24))
+    }
+    
+    # Result log parameters
+    RESULT_LOG_PARAMS = {
+        'enabled': os.getenv('RESULT_LOG_ENABLED', 'true').lower() == 'true',
+        'flush_rows': int(os.getenv('RESULT_LOG_FLUSH_ROWS', 10000)),
+        'flush_interval_seconds': float(os.getenv('RESULT_LOG_FLUSH_INTERVAL', 5)),
+        'compact_min_segments': int(os.getenv('RESULT_LOG_COMPACT_MIN_SEGMENTS', 8))
     }
     
     # File paths
-    MODEL_SAVE_PATH = os.getenv('MODEL_SAVE_PATH', '/app/data/trained_model.pkl')
+    MODEL_SAVE_PATH = os.getenv('MODEL_SAVE_PATH', '/app/data/trained_model.json')
+    MODEL_ARCHIVE_DIR = os.getenv('MODEL_ARCHIVE_DIR', '/app/data/models')
     DATA_DIR = os.getenv('DATA_DIR', '/app/data')
     
     # API settings
     API_SETTINGS = {
         'max_request_size': int(os.getenv('MAX_REQUEST_SIZE', 50 * 1024 * 1024)),  # 50MB
         'timeout_seconds': int(os.getenv('REQUEST_TIMEOUT', 300)),  # 5 minutes
-        'enable_cors': os.getenv('ENABLE_CORS', 'true').lower() == 'true'
+        'enable_cors': os.getenv('ENABLE_CORS', 'true').lower() == 'true',
+        # gzip/zstd request bodies and negotiated response compression
+        'enable_compression': os.getenv('ENABLE_COMPRESSION', 'true').lower() == 'true',
+        'max_decompressed_request_size': int(os.getenv('MAX_DECOMPRESSED_REQUEST_SIZE', 256 * 1024 * 1024)),  # 256MB
+        'compress_min_size': int(os.getenv('COMPRESS_MIN_SIZE', 1024)),  # bytes
+        'gzip_level': int(os.getenv('GZIP_LEVEL', 1)),
+        'zstd_level': int(os.getenv('ZSTD_LEVEL', 3))
     }
     
     # Logging settings
@@ -63,6 +189,81 @@ class Config:
         """Get simulation parameters"""
         return cls.SIMULATION_PARAMS.copy()
     
+    @classmethod
+    def get_memory_params(cls) -> Dict[str, Any]:
+        """Get memory budget parameters"""
+        return cls.MEMORY_PARAMS.copy()
+    
+    @classmethod
+    def get_resource_params(cls) -> Dict[str, Any]:
+        """Get CPU allocation parameters"""
+        return cls.RESOURCE_PARAMS.copy()
+    
+    @classmethod
+    def get_drift_params(cls) -> Dict[str, Any]:
+        """Get drift monitoring parameters"""
+        return cls.DRIFT_PARAMS.copy()
+    
+    @classmethod
+    def get_prediction_index_params(cls) -> Dict[str, Any]:
+        """Get prediction index parameters"""
+        return cls.PREDICTION_INDEX_PARAMS.copy()
+    
+    @classmethod
+    def get_stream_params(cls) -> Dict[str, Any]:
+        """Get WebSocket stream scoring parameters"""
+        return cls.STREAM_PARAMS.copy()
+    
+    @classmethod
+    def get_cascade_params(cls) -> Dict[str, Any]:
+        """Get cascade inference parameters"""
+        return cls.CASCADE_PARAMS.copy()
+    
+    @classmethod
+    def get_explain_params(cls) -> Dict[str, Any]:
+        """Get prediction explanation parameters"""
+        return cls.EXPLAIN_PARAMS.copy()
+    
+    @classmethod
+    def get_bulk_scoring_params(cls) -> Dict[str, Any]:
+        """Get bulk scoring parameters"""
+        return cls.BULK_SCORING_PARAMS.copy()
+    
+    @classmethod
+    def get_admission_params(cls) -> Dict[str, Any]:
+        """Get admission control parameters"""
+        return cls.ADMISSION_PARAMS.copy()
+    
+    @classmethod
+    def get_evaluation_params(cls) -> Dict[str, Any]:
+        """Get model evaluation parameters"""
+        return cls.EVALUATION_PARAMS.copy()
+    
+    @classmethod
+    def get_feature_params(cls) -> Dict[str, Any]:
+        """Get feature set parameters"""
+        return cls.FEATURE_PARAMS.copy()
+    
+    @classmethod
+    def get_distillation_params(cls) -> Dict[str, Any]:
+        """Get model compaction parameters"""
+        return cls.DISTILLATION_PARAMS.copy()
+    
+    @classmethod
+    def get_checkpoint_params(cls) -> Dict[str, Any]:
+        """Get training checkpoint parameters"""
+        return cls.CHECKPOINT_PARAMS.copy()
+    
+    @classmethod
+    def get_result_log_params(cls) -> Dict[str, Any]:
+        """Get result log parameters"""
+        return cls.RESULT_LOG_PARAMS.copy()
+    
+    @classmethod
+    def get_api_settings(cls) -> Dict[str, Any]:
+        """Get API settings"""
+        return cls.API_SETTINGS.copy()
+    
     @classmethod
     def validate_config(cls) -> bool:
         """Validate configuration settings"""
@@ -81,6 +282,94 @@ class Config:
             assert cls.SIMULATION_PARAMS['batch_size'] > 0
             assert cls.SIMULATION_PARAMS['delay_between_predictions'] >= 0
             assert cls.SIMULATION_PARAMS['max_simulation_samples'] > 0
+            assert cls.SIMULATION_PARAMS['replay_speed'] > 0
+            assert cls.SIMULATION_PARAMS['max_sessions'] > 0
+            assert cls.SIMULATION_PARAMS['max_retained_records'] >= cls.SIMULATION_PARAMS['max_simulation_samples']
+            assert cls.SIMULATION_PARAMS['replay_batch_rows'] > 0
+            assert cls.SIMULATION_PARAMS['replay_tick_ms'] >= 0
+            
+            # Validate memory budget parameters
+            assert cls.MEMORY_PARAMS['request_memory_budget_mb'] > 0
+            assert cls.MEMORY_PARAMS['training_memory_factor'] >= 1
+            assert cls.MEMORY_PARAMS['sample_interval_ms'] > 0
+            assert cls.MEMORY_PARAMS['log_min_mb'] >= 0
+            assert cls.MEMORY_PARAMS['profile_max_requests'] > 0
+            
+            # Validate CPU allocation parameters
+            assert cls.RESOURCE_PARAMS['total_cores'] >= 0
+            assert 0 < cls.RESOURCE_PARAMS['inference_core_share'] < 1
+            assert cls.RESOURCE_PARAMS['max_job_threads'] >= 0
+            
+            # Validate drift monitoring parameters
+            assert 2 <= cls.DRIFT_PARAMS['n_bins'] <= 255
+            assert cls.DRIFT_PARAMS['sample_every'] > 0
+            assert cls.DRIFT_PARAMS['psi_alert_threshold'] > 0
+            assert cls.DRIFT_PARAMS['min_samples'] >= 0
+            
+            # Validate prediction index parameters
+            assert cls.PREDICTION_INDEX_PARAMS['batch_size'] > 0
+            
+            # Validate stream scoring parameters
+            assert cls.STREAM_PARAMS['batch_size'] > 0
+            assert cls.STREAM_PARAMS['max_batch_delay_ms'] >= 0
+            assert cls.STREAM_PARAMS['max_in_flight_rows'] >= cls.STREAM_PARAMS['batch_size']
+            
+            # Validate cascade inference parameters
+            assert cls.CASCADE_PARAMS['prefix_trees'] > 0
+            assert cls.CASCADE_PARAMS['margin_band'] >= 0
+            
+            # Validate prediction explanation parameters
+            assert 0 < cls.EXPLAIN_PARAMS['default_top_k'] <= cls.EXPLAIN_PARAMS['max_top_k']
+            assert cls.EXPLAIN_PARAMS['cache_size'] >= 0
+            assert cls.EXPLAIN_PARAMS['max_rows'] > 0
+            
+            # Validate bulk scoring parameters
+            assert cls.BULK_SCORING_PARAMS['chunk_rows'] > 0
+            assert cls.BULK_SCORING_PARAMS['max_workers'] >= 0
+            
+            # Validate admission control parameters
+            assert cls.ADMISSION_PARAMS['queue_timeout_seconds'] >= 0
+            assert cls.ADMISSION_PARAMS['predict_concurrency'] > 0
+            assert cls.ADMISSION_PARAMS['predict_queue'] >= 0
+            assert cls.ADMISSION_PARAMS['batch_concurrency'] > 0
+            assert cls.ADMISSION_PARAMS['batch_queue'] >= 0
+            assert cls.ADMISSION_PARAMS['batch_cost_mb'] >= cls.MEMORY_PARAMS['request_memory_budget_mb']
+            assert cls.ADMISSION_PARAMS['train_concurrency'] > 0
+            assert cls.ADMISSION_PARAMS['train_queue'] >= 0
+            
+            # Validate model evaluation parameters
+            assert cls.EVALUATION_PARAMS['threshold_metric'] in ('f1', 'accuracy', 'youden', 'fixed')
+            assert 0 <= cls.EVALUATION_PARAMS['default_threshold'] < 1
+            assert cls.EVALUATION_PARAMS['curve_points'] >= 2
+            
+            # Validate feature set parameters
+            assert cls.FEATURE_PARAMS['feature_set'] in ('full', 'compact')
+            assert cls.FEATURE_PARAMS['compact_raw_features'] >= 0
+            
+            # Validate model compaction parameters
+            assert 0 <= cls.DISTILLATION_PARAMS['max_accuracy_loss'] < 1
+            assert all(trees > 0 for trees in cls.DISTILLATION_PARAMS['tree_counts'])
+            assert all(depth > 0 for depth in cls.DISTILLATION_PARAMS['max_depths'])
+            assert cls.DISTILLATION_PARAMS['learning_rate'] > 0
+            assert set(cls.DISTILLATION_PARAMS['fast_endpoints']) <= {'predict', 'simulate', 'stream'}
+            
+            # Validate training checkpoint parameters
+            assert cls.CHECKPOINT_PARAMS['every_rounds'] > 0
+            assert cls.CHECKPOINT_PARAMS['keep'] > 0
+            assert cls.CHECKPOINT_PARAMS['max_age_hours'] > 0
+            
+            # Validate result log parameters
+            assert cls.RESULT_LOG_PARAMS['flush_rows'] > 0
+            assert cls.RESULT_LOG_PARAMS['flush_interval_seconds'] > 0
+            assert cls.RESULT_LOG_PARAMS['compact_min_segments'] > 1
+            
+            # Validate API settings
+            assert cls.API_SETTINGS['max_request_size'] > 0
+            assert cls.API_SETTINGS['timeout_seconds'] > 0
+            assert cls.API_SETTINGS['max_decompressed_request_size'] > 0
+            assert cls.API_SETTINGS['compress_min_size'] >= 0
+            assert 1 <= cls.API_SETTINGS['gzip_level'] <= 9
+            assert 1 <= cls.API_SETTINGS['zstd_level'] <= 22
             
             return True
         except AssertionError:
@@ -0,0 +1,308 @@
+"""
+Concurrent load test for the ML service with SLO reporting
+
+Replays a weighted mix of /predict, /simulate and /simulation/stats requests
+at a fixed arrival rate and concurrency, optionally overlapping a /train run,
+then reports throughput, latency percentiles and error rates per endpoint.
+Latency is measured from each request's scheduled start, so time spent
+queued behind the concurrency limit counts against the service.
+
+Exits with 1 if any SLO is missed and 2 if the run could not be set up.
+
+Usage:
+    python load_test.py --start-service --duration 30 --rate 50 --concurrency 16
+    python load_test.py --url http://localhost:8000 --slo predict:p99=50 --train-at 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SERVICE_DIR)
+
+from utils.synthetic_data import SyntheticDataGenerator
+
+DEFAULT_MIX = 'predict=0.8,simulate=0.1,stats=0.1'
+
+# endpoint:metric=value; latency bounds in milliseconds
+DEFAULT_SLOS = [
+    'predict:p99=100',
+    'simulate:p99=2000',
+    'stats:p99=50',
+    'all:error_rate=0.01'
+]
+
+def make_points(n_rows: int, n_features: int, failure_rate: float, seed: int) -> List[Dict[str, Any]]:
+    """Bosch-shaped data points in timestamp order, missing stations left out"""
+    generator = SyntheticDataGenerator(n_features=n_features, failure_rate=failure_rate, seed=seed)
+    return generator.to_points(generator.generate(n_rows))
+
+def make_training_request(n_rows: int, n_features: int, failure_rate: float, seed: int) -> Dict[str, Any]:
+    """Training request with a 70/30 train/test split"""
+    points = make_points(n_rows, n_features, failure_rate, seed)
+    split = int(n_rows * 0.7)
+    return {
+        'trainStart': points[0]['timestamp'],
+        'trainEnd': points[split - 1]['timestamp'],
+        'testStart': points[split]['timestamp'],
+        'testEnd': points[-1]['timestamp'],
+        'trainingData': points[:split],
+        'testingData': points[split:]
+    }
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse endpoint weights such as predict=0.8,simulate=0.1,stats=0.1"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ('predict', 'simulate', 'stats'):
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+def parse_slo(spec: str) -> Tuple[str, str, float]:
+    """Parse an SLO such as predict:p99=50 or all:error_rate=0.01"""
+    target, _, bound = spec.partition('=')
+    endpoint, _, metric = target.partition(':')
+    if metric not in ('p50', 'p95', 'p99', 'error_rate', 'throughput'):
+        raise ValueError(f"Unknown SLO metric in {spec}")
+    return endpoint, metric, float(bound)
+
+class LoadTest:
+    """Open-loop load generator over one shared HTTP connection pool"""
+
+    def __init__(self, base_url: str, rate: float, concurrency: int, duration: float,
+                 mix: Dict[str, float], n_features: int, simulate_rows: int,
+                 train_at: Optional[float], train_rows: int, failure_rate: float, seed: int = 42):
+        self.base_url = base_url
+        self.rate = rate
+        self.concurrency = concurrency
+        self.duration = duration
+        self.mix = mix
+        self.n_features = n_features
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.simulate_rows = simulate_rows
+        self.train_at = train_at
+        self.train_rows = train_rows
+
+        self.random = random.Random(seed)
+        # Requests draw rows from one pre-generated pool
+        self.points = make_points(max(10_000, simulate_rows), n_features, failure_rate, seed)
+        self.samples = {name: [] for name in mix}
+        self.samples['train'] = []
+
+    async def _request(self, client: httpx.AsyncClient, name: str) -> None:
+        if name == 'predict':
+            return await client.post('/predict', json=self.random.choice(self.points)['features'])
+        if name == 'simulate':
+            start = self.random.randrange(len(self.points) - self.simulate_rows + 1)
+            return await client.post('/simulate', json={
+                'simulationStart': '2021-01-01T00:00',
+                'simulationEnd': '2021-01-02T00:00',
+                'data': self.points[start:start + self.simulate_rows]
+            })
+        if name == 'stats':
+            return await client.get('/simulation/stats')
+        return await client.post('/train', json=make_training_request(self.train_rows, self.n_features,
+                                                                       self.failure_rate, self.seed + 1))
+
+    async def _timed(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                     name: str, scheduled: float) -> None:
+        async with semaphore:
+            try:
+                response = await self._request(client, name)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+        self.samples[name].append((time.perf_counter() - scheduled, ok))
+
+    async def run(self) -> float:
+        """Generate load for the configured duration and return the elapsed seconds"""
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=self.concurrency + 1)
+
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=300, limits=limits) as client:
+            tasks = []
+            start = time.perf_counter()
+            if self.train_at is not None:
+                # Training bypasses the concurrency limit so it overlaps the mix
+                tasks.append(asyncio.create_task(self._delayed_train(client, start)))
+
+            sent = 0
+            while True:
+                scheduled = start + sent / self.rate
+                if scheduled - start >= self.duration:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                name = self.random.choices(names, weights)[0]
+                tasks.append(asyncio.create_task(self._timed(client, semaphore, name, scheduled)))
+                sent += 1
+
+            await asyncio.gather(*tasks)
+            return time.perf_counter() - start
+
+    async def _delayed_train(self, client: httpx.AsyncClient, start: float) -> None:
+        await asyncio.sleep(max(0.0, start + self.train_at - time.perf_counter()))
+        await self._timed(client, asyncio.Semaphore(1), 'train', start + self.train_at)
+
+    def summarize(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        """Throughput, latency percentiles and error rate per endpoint and overall"""
+        summary = {}
+        groups = dict(self.samples)
+        groups['all'] = [sample for name, samples in self.samples.items() if name != 'train' for sample in samples]
+        for name, samples in groups.items():
+            if not samples:
+                continue
+            latencies = np.array([latency for latency, _ in samples]) * 1000
+            errors = sum(1 for _, ok in samples if not ok)
+            summary[name] = {
+                'requests': len(samples),
+                'throughput': len(samples) / elapsed,
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'p99': float(np.percentile(latencies, 99)),
+                'max': float(latencies.max()),
+                'error_rate': errors / len(samples)
+            }
+        return summary
+
+def check_slos(summary: Dict[str, Dict[str, float]], slos: List[Tuple[str, str, float]]) -> List[Dict[str, Any]]:
+    """Evaluate each SLO; throughput is a lower bound, everything else an upper bound"""
+    results = []
+    for endpoint, metric, bound in slos:
+        observed = summary.get(endpoint, {}).get(metric)
+        if observed is None:
+            passed = False
+        elif metric == 'throughput':
+            passed = observed >= bound
+        else:
+            passed = observed <= bound
+        results.append({'endpoint': endpoint, 'metric': metric, 'bound': bound,
+                        'observed': observed, 'passed': passed})
+    return results
+
+def start_service(port: int, data_dir: str) -> subprocess.Popen:
+    """Start the service with uvicorn on a scratch data directory and wait for readiness"""
+    env = dict(os.environ, DATA_DIR=data_dir, MODEL_SAVE_PATH=os.path.join(data_dir, 'trained_model.json'),
+               MODEL_ARCHIVE_DIR=os.path.join(data_dir, 'models'))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port)],
+        cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Service exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Service did not become ready")
+
+def print_report(summary: Dict[str, Dict[str, float]], slo_results: List[Dict[str, Any]]) -> None:
+    """Print the per-endpoint table and SLO verdicts"""
+    print(f"{'endpoint':>10} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9} {'errors':>8}")
+    for name, stats in summary.items():
+        print(f"{name:>10} {stats['requests']:>9} {stats['throughput']:>8.1f} {stats['p50']:>9.1f} "
+              f"{stats['p95']:>9.1f} {stats['p99']:>9.1f} {stats['max']:>9.1f} {stats['error_rate']:>8.2%}")
+
+    print("\nSLOs:")
+    for result in slo_results:
+        observed = 'no data' if result['observed'] is None else f"{result['observed']:.4g}"
+        comparison = '>=' if result['metric'] == 'throughput' else '<='
+        print(f"  {'PASS' if result['passed'] else 'FAIL'}  {result['endpoint']}:{result['metric']} "
+              f"{observed} {comparison} {result['bound']:g}")
+
+def main() -> int:
+    """Run the load test and return the exit code"""
+    parser = argparse.ArgumentParser(description="Concurrent load test for the ML service")
+    parser.add_argument('--url', default='http://localhost:8000', help="Service to test")
+    parser.add_argument('--start-service', action='store_true',
+                        help="Start a local service on a scratch data directory instead of using --url")
+    parser.add_argument('--port', type=int, default=8799, help="Port for --start-service")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of load")
+    parser.add_argument('--rate', type=float, default=50, help="Requests per second across the mix")
+    parser.add_argument('--concurrency', type=int, default=16, help="Requests in flight at most")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="Endpoint weights")
+    parser.add_argument('--features', type=int, default=50, help="Features per row")
+    parser.add_argument('--failure-rate', type=float, default=0.0058, help="Fraction of synthetic parts that fail")
+    parser.add_argument('--simulate-rows', type=int, default=100, help="Rows per /simulate request")
+    parser.add_argument('--train-rows', type=int, default=2000, help="Rows per /train request")
+    parser.add_argument('--train-at', type=float, default=None,
+                        help="Seconds into the run at which a /train request overlaps the load")
+    parser.add_argument('--slo', action='append', default=None,
+                        help=f"endpoint:metric=bound, repeatable (default: {' '.join(DEFAULT_SLOS)})")
+    parser.add_argument('--report', default=None, help="Write the summary and SLO results as JSON")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+        slos = [parse_slo(spec) for spec in (args.slo or DEFAULT_SLOS)]
+    except ValueError as e:
+        print(f"Invalid arguments: {e}")
+        return 2
+
+    process = None
+    scratch = None
+    base_url = args.url
+    try:
+        if args.start_service:
+            scratch = tempfile.TemporaryDirectory(prefix='load-test-')
+            process = start_service(args.port, scratch.name)
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        # /predict and /simulate need a model before the load starts
+        setup = make_training_request(args.train_rows, args.features, args.failure_rate, 0)
+        response = httpx.post(f"{base_url}/train", json=setup, timeout=300)
+        if response.status_code != 200:
+            print(f"Setup training failed: {response.status_code} {response.text}")
+            return 2
+
+        print(f"Load: {args.rate:g} req/s, concurrency {args.concurrency}, {args.duration:g}s, mix {args.mix}"
+              + (f", /train at {args.train_at:g}s" if args.train_at is not None else ""))
+        load_test = LoadTest(base_url, args.rate, args.concurrency, args.duration, mix, args.features,
+                             args.simulate_rows, args.train_at, args.train_rows, args.failure_rate)
+        elapsed = asyncio.run(load_test.run())
+
+    except (httpx.HTTPError, RuntimeError) as e:
+        print(f"Load test could not run: {e}")
+        return 2
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if scratch is not None:
+            scratch.cleanup()
+
+    summary = load_test.summarize(elapsed)
+    slo_results = check_slos(summary, slos)
+    print_report(summary, slo_results)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'summary': summary, 'slos': slo_results}, f, indent=2)
+
+    return 0 if all(result['passed'] for result in slo_results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
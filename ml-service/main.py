@@ -3,21 +3,46 @@ IntelliInspect ML Service
 FastAPI service for machine learning model training and prediction
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, WebSocket, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-import pandas as pd
+from contextlib import asynccontextmanager
 import numpy as np
-import xgboost as xgb
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
-from sklearn.model_selection import train_test_split
-import joblib
 import os
 import json
+import asyncio
+import threading
+import time
 from datetime import datetime
 import logging
 
+from config import Config
+from utils.data_processor import DataProcessor
+from utils.drift_monitor import FeatureDriftMonitor
+from utils.dataset_store import DatasetStore
+from utils.prediction_index import PredictionIndex
+from utils.resource_manager import ResourceManager
+from utils.replay_scheduler import ReplaySession, ReplayScheduler
+from utils.stream_scoring import StreamScoringSession
+from utils.explainer import PredictionExplainer
+from utils.result_log import ResultLog
+from utils.station_features import StationFeatureCache
+from utils.memory_profiler import (MB, AllocationProfiler, MemoryTracker, MemoryTrackingMiddleware,
+                                   estimate_size, memory_stage)
+from utils.compression import CompressionMiddleware, available_encodings
+from utils.admission_control import AdmissionController, AdmissionRejected, RequestLimitMiddleware, check_deadline
+from models.backtesting import WalkForwardBacktester
+from models.bulk_scoring import BulkScoringJob, is_parquet
+from models.cascade import CascadeScorer
+from models.compact_model import CompactFeatures, CompactModel
+from models.distillation import ModelDistiller
+from models.model_store import (bundle_paths, copy_model_bundle, load_model_bundle, model_bundle_exists,
+                                read_bundle_metadata, remove_model_bundle, save_model_bundle)
+from models.checkpointing import TrainingCheckpointer, training_job_key
+from models.evaluation import ThresholdSweep, classification_metrics
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,6 +54,49 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Admission control: per-endpoint limits, set up in front of the endpoints below
+admission_params = Config.get_admission_params()
+api_settings = Config.get_api_settings()
+admission_controller = AdmissionController(queue_timeout=admission_params['queue_timeout_seconds'])
+admission_controller.add_limit('predict', admission_params['predict_concurrency'], admission_params['predict_queue'])
+for endpoint in ('simulate', 'explain', 'backtest'):
+    admission_controller.add_limit(endpoint, admission_params['batch_concurrency'], admission_params['batch_queue'],
+                                   max_cost=admission_params['batch_cost_mb'] * 1024 * 1024)
+admission_controller.add_limit('train', admission_params['train_concurrency'], admission_params['train_queue'])
+
+# Track each request's peak memory inside the deadline, so cancelled
+# requests are still accounted for
+memory_params = Config.get_memory_params()
+memory_tracker = MemoryTracker(sample_interval=memory_params['sample_interval_ms'] / 1000)
+allocation_profiler = AllocationProfiler()
+if memory_params['track_requests']:
+    app.add_middleware(
+        MemoryTrackingMiddleware,
+        tracker=memory_tracker,
+        profiler=allocation_profiler,
+        log_min_mb=memory_params['log_min_mb']
+    )
+
+# Decompress gzip/zstd request bodies as they stream in and compress large
+# responses; inside the size limit, which therefore counts compressed bytes
+if api_settings['enable_compression']:
+    app.add_middleware(
+        CompressionMiddleware,
+        max_decompressed_size=api_settings['max_decompressed_request_size'],
+        min_response_size=api_settings['compress_min_size'],
+        gzip_level=api_settings['gzip_level'],
+        zstd_level=api_settings['zstd_level']
+    )
+
+# Enforce the request size limit and deadline; added before CORS so that
+# refusals still carry CORS headers
+app.add_middleware(
+    RequestLimitMiddleware,
+    controller=admission_controller,
+    max_request_size=api_settings['max_request_size'],
+    timeout_seconds=api_settings['timeout_seconds']
+)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -38,11 +106,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# pandas, xgboost and sklearn are imported on first use or by the
+# background warm-up, so /health answers before they finish loading
+
+# XGBoost parameters for every model the service trains
+QUALITY_MODEL_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'random_state': 42,
+    'eval_metric': 'logloss'
+}
+
 # Global variables for model and data storage
 trained_model = None
+fast_model = None
+model_version = None
+feature_columns = []
 model_metrics = {}
-simulation_results = []
-simulation_stats = {}
+latest_simulation_id = None
+drift_monitor = None
+active_scorers = {}
+decision_threshold = Config.get_evaluation_params()['default_threshold']
+service_ready = threading.Event()
+warm_up_error = None
+resource_params = Config.get_resource_params()
+resource_manager = ResourceManager(
+    total_cores=resource_params['total_cores'],
+    inference_share=resource_params['inference_core_share'],
+    max_job_threads=resource_params['max_job_threads']
+)
+dataset_store = DatasetStore(os.path.join(Config.DATA_DIR, 'dataset'))
+station_feature_cache = StationFeatureCache(os.path.join(Config.DATA_DIR, 'station_features'))
+prediction_index = PredictionIndex(
+    os.path.join(Config.DATA_DIR, 'prediction_index'),
+    batch_size=Config.get_prediction_index_params()['batch_size'],
+    resource_manager=resource_manager,
+    feature_cache=station_feature_cache
+)
+bulk_scoring_jobs = {}
+explain_params = Config.get_explain_params()
+explainer = PredictionExplainer(max_top_k=explain_params['max_top_k'], cache_size=explain_params['cache_size'])
+result_log_params = Config.get_result_log_params()
+result_log = ResultLog(
+    os.path.join(Config.DATA_DIR, 'result_log'),
+    flush_rows=result_log_params['flush_rows'],
+    flush_interval=result_log_params['flush_interval_seconds'],
+    compact_min_segments=result_log_params['compact_min_segments']
+)
 
 # Pydantic models for request/response
 class TrainingDataPoint(BaseModel):
@@ -57,6 +168,9 @@ class TrainingRequest(BaseModel):
     testEnd: str
     trainingData: List[TrainingDataPoint]
     testingData: List[TrainingDataPoint]
+    threshold: Optional[float] = None
+    featureSet: Optional[str] = None
+    maxAccuracyLoss: Optional[float] = None
 
 class SimulationDataPoint(BaseModel):
     timestamp: str
@@ -67,8 +181,39 @@ class SimulationDataPoint(BaseModel):
 class SimulationRequest(BaseModel):
     simulationStart: str
     simulationEnd: str
+    data: List[SimulationDataPoint] = []
+    explain: bool = False
+    explainTopK: Optional[int] = None
+
+class SimulationSessionRequest(SimulationRequest):
+    speed: Optional[float] = None
+
+class ExplainRequest(BaseModel):
+    data: List[Dict[str, float]]
+    topK: Optional[int] = None
+    approximate: bool = False
+
+class DatasetRequest(BaseModel):
     data: List[SimulationDataPoint]
 
+class BacktestRequest(BaseModel):
+    trainDays: float
+    testDays: float
+    stepDays: float
+    maxWorkers: Optional[int] = None
+
+class MemoryProfileRequest(BaseModel):
+    requests: int = 10
+    topK: int = 20
+    frames: int = 1
+
+class BulkScoringRequest(BaseModel):
+    inputPath: str
+    outputPath: str
+    modelVersion: Optional[str] = None
+    chunkRows: Optional[int] = None
+    maxWorkers: Optional[int] = None
+
 class TrainingResult(BaseModel):
     accuracy: float
     precision: float
@@ -76,6 +221,8 @@ class TrainingResult(BaseModel):
     f1Score: float
     trainingChartData: Dict[str, Any]
     confusionMatrix: Dict[str, int]
+    threshold: float = 0.5
+    rocAuc: Optional[float] = None
 
 class SimulationResult(BaseModel):
     timestamp: str
@@ -85,6 +232,7 @@ class SimulationResult(BaseModel):
     temperature: float
     pressure: float
     humidity: float
+    explanation: Optional[Dict[str, Any]] = None
 
 class SimulationStats(BaseModel):
     totalPredictions: int
@@ -92,6 +240,445 @@ class SimulationStats(BaseModel):
     failCount: int
     averageConfidence: float
 
+def fit_quality_model(X_train: np.ndarray, y_train: np.ndarray, columns: List[str]):
+    """
+    Train a classifier on background threads, then hand it the inference share
+    
+    With checkpoints enabled the booster is saved every few rounds under
+    DATA_DIR, and training the same data again after an interruption, such
+    as a restart or a timed-out request, continues from the last checkpoint.
+    
+    Returns:
+        The fitted classifier and the boosting rounds restored from a checkpoint
+    """
+    import xgboost as xgb
+    
+    class DeadlineCallback(xgb.callback.TrainingCallback):
+        """Abort boosting once the request that asked for it has timed out"""
+        
+        def after_iteration(self, model, epoch, evals_log) -> bool:
+            check_deadline()
+            return False
+    
+    callbacks = [DeadlineCallback()]
+    total_rounds = QUALITY_MODEL_PARAMS['n_estimators']
+    checkpoint_params = Config.get_checkpoint_params()
+    checkpointer, resumed = None, None
+    if checkpoint_params['enabled']:
+        checkpointer = TrainingCheckpointer(
+            os.path.join(Config.DATA_DIR, 'checkpoints'),
+            training_job_key(X_train, y_train, columns, QUALITY_MODEL_PARAMS),
+            every_rounds=checkpoint_params['every_rounds'],
+            keep=checkpoint_params['keep'],
+            max_age_hours=checkpoint_params['max_age_hours']
+        )
+        checkpointer.remove_stale()
+        resumed = checkpointer.latest()
+        callbacks.append(checkpointer.callback(total_rounds))
+    
+    resumed_rounds, booster = resumed if resumed is not None else (0, None)
+    if resumed_rounds:
+        logger.info(f"Resuming training from the checkpoint at round {resumed_rounds} of {total_rounds}")
+    
+    with resource_manager.allocate('training') as n_threads:
+        model = xgb.XGBClassifier(**dict(QUALITY_MODEL_PARAMS, n_estimators=total_rounds - resumed_rounds),
+                                  n_jobs=n_threads, callbacks=callbacks)
+        model.fit(X_train, y_train, xgb_model=booster)
+    
+    # The callbacks only apply to the fit they were created for
+    model.set_params(callbacks=None, n_estimators=total_rounds)
+    if checkpointer is not None:
+        checkpointer.clear()
+    
+    model.set_params(n_jobs=resource_manager.inference_threads)
+    return model, resumed_rounds
+
+def distill_quality_model(model, X_train: np.ndarray, X_test: np.ndarray, y_test: np.ndarray,
+                          threshold: float, max_accuracy_loss: float):
+    """Compact a trained classifier on background threads, then hand it the inference share"""
+    params = Config.get_distillation_params()
+    with resource_manager.allocate('training') as n_threads:
+        distiller = ModelDistiller(max_accuracy_loss, params['tree_counts'], params['max_depths'],
+                                   params['learning_rate'], n_threads=n_threads)
+        compacted, report = distiller.compact(model, X_train, X_test, y_test, threshold)
+    
+    if compacted is not None:
+        compacted.set_params(n_jobs=resource_manager.inference_threads)
+    return compacted, report
+
+def request_cost(n_rows: int, n_features: int, factor: float = 1.0) -> float:
+    """
+    Admission cost of a request: the estimated bytes of its feature matrices,
+    capped at the request memory budget that chunked scoring stays within
+    """
+    budget_bytes = Config.get_memory_params()['request_memory_budget_mb'] * 1024 * 1024
+    return min(DataProcessor.estimate_matrix_bytes(n_rows, n_features) * factor, budget_bytes)
+
+def simulation_cost(request: SimulationRequest) -> float:
+    """Admission cost of a simulation over posted or stored rows"""
+    if request.data:
+        n_rows = len(request.data)
+    elif dataset_store.is_loaded:
+        rows = stored_simulation_rows(request)
+        n_rows = rows.stop - rows.start
+    else:
+        n_rows = 0
+    return request_cost(n_rows, len(feature_columns), 2.0 if request.explain else 1.0)
+
+@asynccontextmanager
+async def admission(endpoint: str, cost: float = 1.0):
+    """Hold a slot of an endpoint's admission limit while serving a request"""
+    if not admission_params['enabled']:
+        yield
+        return
+    
+    try:
+        ticket = await admission_controller.acquire(endpoint, cost)
+    except AdmissionRejected as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after is not None else None
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+    
+    try:
+        yield
+    finally:
+        admission_controller.release(ticket)
+
+def scoring_chunk_rows(n_features: int) -> int:
+    """Rows per scoring chunk that keep one feature matrix within the memory budget"""
+    budget_bytes = Config.get_memory_params()['request_memory_budget_mb'] * 1024 * 1024
+    return max(1, budget_bytes // max(1, DataProcessor.estimate_matrix_bytes(1, n_features)))
+
+def endpoint_variant(endpoint: str) -> str:
+    """Model variant an endpoint serves: 'fast' if configured and built, else 'full'"""
+    if fast_model is not None and endpoint in Config.get_distillation_params()['fast_endpoints']:
+        return 'fast'
+    return 'full'
+
+def variant_version(variant: str) -> Optional[str]:
+    """Version label that results scored by a model variant are logged under"""
+    if variant == 'fast' and model_version is not None:
+        return f"{model_version}-fast"
+    return model_version
+
+def snapshot_scorer(variant: str = 'full'):
+    """
+    Pass-probability function bound to the active model and drift monitor
+    
+    The same function is returned until the model changes, so callers that
+    batch by scorer can share one inference call. Each call holds one of the
+    resource manager's inference slots, so it must run off the event loop,
+    e.g. through asyncio.to_thread. With cascade inference
+    enabled, rows are scored through the model's CascadeScorer. Compact
+    models score station aggregates; drift is still tracked on raw rows.
+    
+    Args:
+        variant: 'full' for the trained model, 'fast' for its compacted one
+    """
+    served_model = fast_model if variant == 'fast' else trained_model
+    active_scorer = active_scorers.get(variant)
+    
+    if active_scorer is None or active_scorer[0] is not served_model:
+        model, monitor = served_model, drift_monitor
+        compact_features = None
+        if isinstance(model, CompactModel):
+            compact_features, model = model.features, model.model
+        cascade_params = Config.get_cascade_params()
+        cascade = None
+        if cascade_params['enabled']:
+            cascade = CascadeScorer(model, cascade_params['prefix_trees'], cascade_params['margin_band'],
+                                    threshold=decision_threshold)
+        
+        def score(X: np.ndarray) -> np.ndarray:
+            X_model = compact_features.transform(X) if compact_features is not None else X
+            with resource_manager.inference():
+                if cascade is not None:
+                    pass_probabilities = cascade.predict_pass_probability(X_model)
+                else:
+                    pass_probabilities = model.predict_proba(X_model)[:, 1]
+            if monitor is not None:
+                monitor.update(X)
+            return pass_probabilities
+        
+        active_scorer = (served_model, score, cascade)
+        active_scorers[variant] = active_scorer
+    
+    return active_scorer[1]
+
+def format_simulation_result(timestamp: str, sample_id: int, pass_probability: float,
+                             threshold: float = 0.5) -> SimulationResult:
+    """Build one simulation result with synthetic sensor readings"""
+    prediction = 1 if pass_probability > threshold else 0
+    confidence = float(pass_probability if prediction == 1 else 1 - pass_probability)
+    
+    # Synthetic sensor data (for demo purposes), drawn a block at a time
+    sensors = DataProcessor.generate_synthetic_sensor_data()
+    
+    return SimulationResult(
+        timestamp=timestamp,
+        sampleId=f"SAMPLE_{sample_id:04d}",
+        prediction="Pass" if prediction == 1 else "Fail",
+        confidence=confidence,
+        temperature=sensors['temperature'],
+        pressure=sensors['pressure'],
+        humidity=sensors['humidity']
+    )
+
+def log_predictions(source: str, version: Optional[str], timestamps, sample_ids,
+                    pass_probabilities: np.ndarray, threshold: float, session_id: str = '') -> None:
+    """Append scored rows to the result log; rows without timestamps log NaT"""
+    if not result_log_params['enabled']:
+        return
+    
+    pass_probabilities = np.asarray(pass_probabilities, dtype=np.float32)
+    n_rows = len(pass_probabilities)
+    passed = pass_probabilities > threshold
+    if timestamps is None:
+        record_times = np.full(n_rows, np.datetime64('NaT'), dtype='datetime64[s]')
+    else:
+        import pandas as pd
+        record_times = pd.to_datetime(timestamps, errors='coerce').values.astype('datetime64[s]')
+    result_log.append('predictions', version, {
+        'scored_at': np.full(n_rows, np.datetime64(datetime.utcnow(), 'ms')),
+        'record_time': record_times,
+        'sample_id': sample_ids,
+        'pass_probability': pass_probabilities,
+        'prediction': passed,
+        'confidence': np.where(passed, pass_probabilities, 1 - pass_probabilities),
+        'source': np.full(n_rows, source, dtype='S8'),
+        'session_id': np.full(n_rows, session_id, dtype='S32')
+    })
+
+def log_replayed(session: ReplaySession, start: int, pass_probabilities: np.ndarray) -> None:
+    """Append a batch replayed by a simulation session to the result log"""
+    end = start + len(pass_probabilities)
+    log_predictions('session', session.model_version, session.timestamps[start:end],
+                    session.sample_ids[start:end], pass_probabilities, session.threshold, session.session_id)
+
+def log_streamed(session: StreamScoringSession, ids: List[Any], pass_probabilities: np.ndarray) -> None:
+    """Append a batch scored over /ws/predict to the result log; rows without integer ids log -1"""
+    sample_ids = [sample_id if isinstance(sample_id, int) else -1 for sample_id in ids]
+    log_predictions('stream', session.model_version, None, sample_ids, pass_probabilities, session.threshold)
+
+simulation_params = Config.get_simulation_params()
+replay_scheduler = ReplayScheduler(
+    format_simulation_result,
+    max_sessions=simulation_params['max_sessions'],
+    max_records=simulation_params['max_retained_records'],
+    max_batch_rows=simulation_params['replay_batch_rows'],
+    tick_ms=simulation_params['replay_tick_ms'],
+    recorder=log_replayed
+)
+
+def archived_model_path(version: str) -> str:
+    """Path of the saved bundle for a model version"""
+    return os.path.join(Config.MODEL_ARCHIVE_DIR, f"model_{version}.json")
+
+def resolve_bulk_scoring_path(path: str) -> str:
+    """Resolve a bulk scoring path, which must lie inside the configured root"""
+    root = os.path.realpath(Config.get_bulk_scoring_params()['file_root'])
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise HTTPException(status_code=400, detail=f"Path {path} is outside {root}")
+    return resolved
+
+def refresh_prediction_index():
+    """Rebuild the prediction index for the active model and stored dataset"""
+    if trained_model is None or not Config.get_prediction_index_params()['enabled']:
+        prediction_index.invalidate()
+        return
+    
+    prediction_index.build_async(trained_model, model_version, feature_columns, dataset_store)
+
+def lookup_indexed_simulation(request: SimulationRequest):
+    """
+    Serve a stored-range simulation from the prediction index
+    
+    Posted rows are always scored: their features may differ from the
+    stored rows with the same ids, e.g. in what-if requests.
+    
+    Returns (timestamps, ids, pass probabilities), or None if the request
+    has to be scored
+    """
+    if request.data or not prediction_index.is_ready(model_version, dataset_store.fingerprint):
+        return None
+    
+    rows = stored_simulation_rows(request)
+    stored_ids = dataset_store.array('ids')[rows]
+    timestamps = np.datetime_as_string(dataset_store.array('timestamps')[rows], unit='s').tolist()
+    return timestamps, stored_ids.tolist(), prediction_index.lookup(rows)
+
+def stored_simulation_rows(request: SimulationRequest) -> slice:
+    """Rows of the stored dataset inside the request's simulation range"""
+    import pandas as pd
+    
+    # Date-only ends cover the whole day, matching the backend's range filters
+    end = pd.Timestamp(request.simulationEnd)
+    date_only = len(request.simulationEnd) == 10
+    return dataset_store.range_slice(
+        request.simulationStart,
+        end + pd.Timedelta(days=1) if date_only else end,
+        end_inclusive=not date_only
+    )
+
+def check_simulation_size(request: SimulationRequest) -> None:
+    """Refuse simulations over more records, or a larger feature matrix, than configured"""
+    if request.data:
+        n_records = len(request.data)
+    elif dataset_store.is_loaded:
+        rows = stored_simulation_rows(request)
+        n_records = rows.stop - rows.start
+    else:
+        return
+    
+    max_records = Config.get_simulation_params()['max_simulation_samples']
+    if n_records > max_records:
+        raise HTTPException(status_code=400, detail=f"Simulation exceeds {max_records} records")
+    budget_bytes = Config.get_memory_params()['request_memory_budget_mb'] * 1024 * 1024
+    if DataProcessor.estimate_matrix_bytes(n_records, len(feature_columns)) > budget_bytes:
+        raise HTTPException(status_code=413, detail="Simulation exceeds the request memory budget")
+
+def build_replay_session(request: SimulationSessionRequest) -> ReplaySession:
+    """
+    Resolve a session's records from the prediction index, the request rows
+    or the stored dataset, in that order of preference
+    """
+    import pandas as pd
+    
+    speed = request.speed or Config.get_simulation_params()['replay_speed']
+    check_simulation_size(request)
+    
+    indexed = lookup_indexed_simulation(request)
+    if indexed is not None:
+        timestamps, sample_ids, pass_probabilities = indexed
+        return ReplaySession(timestamps, sample_ids, pd.to_datetime(timestamps).values, speed,
+                             pass_probabilities=pass_probabilities, model_version=model_version,
+                             threshold=decision_threshold)
+    
+    variant = endpoint_variant('simulate')
+    if request.data:
+        # Replay needs records in time order
+        replay_times = pd.to_datetime([point.timestamp for point in request.data]).values
+        order = np.argsort(replay_times, kind='stable')
+        points = [request.data[i] for i in order]
+        X = DataProcessor.build_feature_matrix([point.features for point in points], feature_columns)
+        return ReplaySession([point.timestamp for point in points], [point.id for point in points],
+                             replay_times[order], speed, features=X, scorer=snapshot_scorer(variant),
+                             model_version=variant_version(variant), threshold=decision_threshold)
+    
+    if not dataset_store.is_loaded:
+        raise HTTPException(status_code=400, detail="No simulation data posted and no dataset stored")
+    
+    rows = stored_simulation_rows(request)
+    replay_times = dataset_store.array('timestamps')[rows]
+    return ReplaySession(np.datetime_as_string(replay_times, unit='s').tolist(),
+                         dataset_store.array('ids')[rows].tolist(), replay_times, speed,
+                         features=stored_features(rows), scorer=snapshot_scorer(variant),
+                         model_version=variant_version(variant), threshold=decision_threshold)
+
+def stored_features(rows) -> np.ndarray:
+    """Stored feature rows aligned to the active model's columns; missing columns are zero"""
+    features = dataset_store.array('features')[rows]
+    if dataset_store.feature_columns == feature_columns:
+        return features
+    
+    positions = {column: i for i, column in enumerate(dataset_store.feature_columns)}
+    aligned = np.zeros((len(features), len(feature_columns)), dtype=np.float32)
+    for j, column in enumerate(feature_columns):
+        if column in positions:
+            aligned[:, j] = features[:, positions[column]]
+    return aligned
+
+def explain_rows(X: np.ndarray, top_k: Optional[int], approximate: bool = False) -> List[Dict[str, Any]]:
+    """Explain rows of the active model's feature matrix"""
+    model, columns = trained_model, feature_columns
+    if isinstance(model, CompactModel):
+        # Contributions are over the columns the compact model actually reads
+        model, columns, X = model.model, model.features.columns, model.features.transform(X)
+    return explainer.explain(
+        model, model_version, columns, X,
+        top_k=top_k or Config.get_explain_params()['default_top_k'],
+        approximate=approximate,
+        threshold=decision_threshold,
+        chunk_rows=scoring_chunk_rows(len(feature_columns))
+    )
+
+def restore_model_metrics():
+    """Recover the active model's metrics from its logged training run"""
+    global model_metrics
+    
+    runs = result_log.training_runs(model_version=model_version)
+    if runs:
+        run = runs[-1]
+        model_metrics = {
+            "accuracy": run['accuracy'],
+            "precision": run['precision'],
+            "recall": run['recall'],
+            "f1_score": run['f1_score'],
+            "confusion_matrix": {key: run[key] for key in ('tn', 'fp', 'fn', 'tp')}
+        }
+
+def warm_up():
+    """Import heavy libraries, load the saved model and run a warm-up prediction"""
+    global trained_model, fast_model, model_version, feature_columns, decision_threshold, model_metrics, warm_up_error
+    
+    try:
+        import pandas  # noqa: F401
+        import xgboost  # noqa: F401
+        
+        model_path = Config.MODEL_SAVE_PATH
+        if trained_model is None and model_bundle_exists(model_path):
+            # Legacy joblib pickles are migrated to the native format here
+            model_data = load_model_bundle(model_path)
+            model = model_data['model']
+            columns = model_data['feature_columns']
+            version = model_data['model_version']
+            threshold = model_data['threshold']
+            if threshold is None:
+                threshold = Config.get_evaluation_params()['default_threshold']
+            fast = model_data['fast_model']
+            metrics = model_data['metrics']
+            
+            if len(columns) != model.n_features_in_:
+                raise ValueError(f"Saved model at {model_path} does not record its feature columns")
+            saved_at = os.path.getmtime(bundle_paths(model_path)[0])
+            version = version or datetime.utcfromtimestamp(saved_at).strftime('%Y%m%d%H%M%S%f')
+            model.set_params(n_jobs=resource_manager.inference_threads)
+            
+            # First prediction pays for lazy booster setup before traffic does
+            model.predict_proba(np.zeros((1, len(columns)), dtype=np.float32))
+            if fast is not None:
+                fast.set_params(n_jobs=resource_manager.inference_threads)
+                fast.predict_proba(np.zeros((1, len(columns)), dtype=np.float32))
+            
+            if trained_model is None:
+                trained_model, feature_columns, model_version = model, columns, version
+                fast_model = fast
+                decision_threshold = threshold
+                restore_model_metrics()
+                if metrics is not None:
+                    model_metrics = dict(model_metrics, **metrics)
+                refresh_prediction_index()
+                logger.info(f"Loaded model version {model_version} from {model_path}")
+        
+        service_ready.set()
+        logger.info("ML service is ready")
+        
+    except Exception as e:
+        warm_up_error = str(e)
+        logger.error(f"Error during warm-up: {str(e)}")
+
+@app.on_event("startup")
+async def start_warm_up():
+    """Warm up on a background thread so liveness is reached immediately"""
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    if result_log_params['enabled']:
+        result_log.start()
+
+@app.on_event("shutdown")
+async def flush_result_log():
+    """Write rows still buffered for the result log"""
+    result_log.flush()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -102,6 +689,17 @@ async def health():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+@app.get("/ready")
+async def ready():
+    """Readiness check endpoint"""
+    if not service_ready.is_set():
+        return JSONResponse(
+            status_code=503,
+            content={"status": "starting", "error": warm_up_error, "timestamp": datetime.utcnow().isoformat()}
+        )
+    
+    return {"status": "ready", "modelLoaded": trained_model is not None, "timestamp": datetime.utcnow().isoformat()}
+
 @app.post("/train", response_model=TrainingResult)
 async def train_model(request: TrainingRequest):
     """
@@ -109,65 +707,106 @@ async def train_model(request: TrainingRequest):
     """
     try:
         logger.info(f"Starting model training with {len(request.trainingData)} training samples")
+        memory_stage('parse')
         
-        # Convert training data to DataFrame
-        train_df = pd.DataFrame([
-            {
-                **point.features,
-                'response': point.response
-            }
-            for point in request.trainingData
-        ])
-        
-        # Convert testing data to DataFrame
-        test_df = pd.DataFrame([
-            {
-                **point.features,
-                'response': point.response
-            }
-            for point in request.testingData
-        ])
+        train_rows = [point.features for point in request.trainingData]
+        test_rows = [point.features for point in request.testingData]
         
-        if train_df.empty or test_df.empty:
+        if not train_rows or not test_rows:
             raise HTTPException(status_code=400, detail="Training or testing data is empty")
+        if request.threshold is not None and not 0 < request.threshold < 1:
+            raise HTTPException(status_code=400, detail="threshold must be in (0, 1)")
+        feature_params = Config.get_feature_params()
+        feature_set = request.featureSet or feature_params['feature_set']
+        if feature_set not in ('full', 'compact'):
+            raise HTTPException(status_code=400, detail="featureSet must be 'full' or 'compact'")
+        if request.maxAccuracyLoss is not None and not 0 <= request.maxAccuracyLoss < 1:
+            raise HTTPException(status_code=400, detail="maxAccuracyLoss must be in [0, 1)")
+        
+        global trained_model, fast_model, model_version, feature_columns, decision_threshold
         
         # Prepare features and target
-        feature_columns = [col for col in train_df.columns if col != 'response']
-        X_train = train_df[feature_columns]
-        y_train = train_df['response']
-        X_test = test_df[feature_columns]
-        y_test = test_df['response']
-        
-        # Handle missing values
-        X_train = X_train.fillna(0)
-        X_test = X_test.fillna(0)
-        
-        # Train XGBoost model
-        global trained_model
-        trained_model = xgb.XGBClassifier(
-            n_estimators=100,
-            max_depth=6,
-            learning_rate=0.1,
-            random_state=42,
-            eval_metric='logloss'
-        )
+        columns = DataProcessor.get_feature_columns(train_rows)
         
-        # Train the model
-        trained_model.fit(X_train, y_train)
+        # Refuse requests whose matrices would not fit the memory budget
+        memory_params = Config.get_memory_params()
+        required_bytes = DataProcessor.estimate_matrix_bytes(
+            len(train_rows) + len(test_rows), len(columns)
+        ) * memory_params['training_memory_factor']
+        budget_bytes = memory_params['request_memory_budget_mb'] * 1024 * 1024
+        if required_bytes > budget_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Training data needs about {required_bytes / 1024 ** 2:.0f} MB, "
+                       f"over the {memory_params['request_memory_budget_mb']} MB request memory budget"
+            )
         
-        # Make predictions
-        y_pred = trained_model.predict(X_test)
-        y_pred_proba = trained_model.predict_proba(X_test)[:, 1]
+        # Build and train under the training admission limit
+        async with admission('train', required_bytes):
+            # Build float32 matrices directly; missing features are filled with 0
+            X_train = DataProcessor.build_feature_matrix(train_rows, columns)
+            y_train = np.fromiter((point.response for point in request.trainingData), dtype=np.int32, count=len(train_rows))
+            X_test = DataProcessor.build_feature_matrix(test_rows, columns)
+            y_test = np.fromiter((point.response for point in request.testingData), dtype=np.int32, count=len(test_rows))
+            memory_stage('features')
+            
+            # The compact feature set trains on station aggregates plus the
+            # raw columns most correlated with the label
+            training_started = time.perf_counter()
+            compact_features = None
+            X_train_model, X_test_model = X_train, X_test
+            if feature_set == 'compact':
+                try:
+                    compact_features = await asyncio.to_thread(
+                        CompactFeatures.select, columns, X_train, y_train, feature_params['compact_raw_features']
+                    )
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                X_train_model = await asyncio.to_thread(compact_features.transform, X_train)
+                X_test_model = await asyncio.to_thread(compact_features.transform, X_test)
+            
+            # Train on a worker thread with a bounded thread count, so requests
+            # served meanwhile keep their reserved cores and the current model
+            model_columns = compact_features.columns if compact_features is not None else columns
+            classifier, resumed_rounds = await asyncio.to_thread(fit_quality_model, X_train_model, y_train, model_columns)
+            training_seconds = time.perf_counter() - training_started
+            memory_stage('fit')
+        fast_model = None
+        trained_model = CompactModel(compact_features, classifier) if compact_features is not None else classifier
+        feature_columns = columns
+        
+        # Build drift reference histograms from the training window
+        global drift_monitor
+        drift_params = Config.get_drift_params()
+        drift_monitor = FeatureDriftMonitor(
+            feature_columns,
+            n_bins=drift_params['n_bins'],
+            sample_every=drift_params['sample_every']
+        )
+        drift_monitor.fit(X_train)
         
-        # Calculate metrics
-        accuracy = accuracy_score(y_test, y_pred)
-        precision = precision_score(y_test, y_pred, zero_division=0)
-        recall = recall_score(y_test, y_pred, zero_division=0)
-        f1 = f1_score(y_test, y_pred, zero_division=0)
+        # Score the test window once; every metric and curve derives from it
+        y_pred_proba = classifier.predict_proba(X_test_model)[:, 1]
         
-        # Confusion matrix
-        cm = confusion_matrix(y_test, y_pred)
-        tn, fp, fn, tp = cm.ravel()
+        # Sweep all thresholds and pick the operating one
+        evaluation_params = Config.get_evaluation_params()
+        sweep = ThresholdSweep(y_test, y_pred_proba)
+        if request.threshold is not None:
+            threshold, selected_by = request.threshold, 'request'
+        elif evaluation_params['threshold_metric'] == 'fixed':
+            threshold, selected_by = evaluation_params['default_threshold'], 'fixed'
+        else:
+            threshold = sweep.best_threshold(evaluation_params['threshold_metric'])
+            selected_by = evaluation_params['threshold_metric']
+        
+        # Calculate metrics at the operating threshold in one pass
+        test_metrics = classification_metrics(y_test, y_pred_proba, threshold)
+        accuracy = test_metrics['accuracy']
+        precision = test_metrics['precision']
+        recall = test_metrics['recall']
+        f1 = test_metrics['f1_score']
+        tn, fp, fn, tp = (test_metrics['confusion_matrix'][key] for key in ('tn', 'fp', 'fn', 'tp'))
+        roc_auc = sweep.roc_auc()
         
         # Generate training chart data (simulated for demo)
         training_chart_data = {
@@ -195,15 +834,74 @@ async def train_model(request: TrainingRequest):
             "precision": precision,
             "recall": recall,
             "f1_score": f1,
-            "confusion_matrix": {"tn": int(tn), "fp": int(fp), "fn": int(fn), "tp": int(tp)}
+            "confusion_matrix": {"tn": int(tn), "fp": int(fp), "fn": int(fn), "tp": int(tp)},
+            "threshold": threshold,
+            "threshold_selected_by": selected_by,
+            "roc_auc": roc_auc,
+            "average_precision": sweep.average_precision(),
+            "curves": sweep.curves(evaluation_params['curve_points']),
+            "feature_set": feature_set,
+            "model_features": X_train_model.shape[1],
+            "training_seconds": training_seconds,
+            "resumed_rounds": resumed_rounds
         }
         
-        # Save model
-        model_path = "/app/data/trained_model.pkl"
-        os.makedirs(os.path.dirname(model_path), exist_ok=True)
-        joblib.dump(trained_model, model_path)
+        # Report what cascade inference would trade on the test window
+        if len(X_test):
+            cascade_params = Config.get_cascade_params()
+            cascade = CascadeScorer(classifier, cascade_params['prefix_trees'], cascade_params['margin_band'],
+                                    threshold=threshold)
+            model_metrics["cascade"] = dict(cascade.evaluate(X_test_model, y_test), enabled=cascade_params['enabled'])
+        
+        memory_stage('evaluate')
+        
+        # Build the latency-optimized model served next to the full one
+        distillation_params = Config.get_distillation_params()
+        if distillation_params['enabled'] and len(X_test):
+            max_accuracy_loss = request.maxAccuracyLoss
+            if max_accuracy_loss is None:
+                max_accuracy_loss = distillation_params['max_accuracy_loss']
+            fast_classifier, model_metrics["fast_model"] = await asyncio.to_thread(
+                distill_quality_model, classifier, X_train_model, X_test_model, y_test, threshold, max_accuracy_loss
+            )
+            if fast_classifier is not None:
+                fast_model = (CompactModel(compact_features, fast_classifier) if compact_features is not None
+                              else fast_classifier)
+        
+        memory_stage('distill')
+        
+        # Activate the new version and save it with its feature layout and threshold
+        model_version = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+        decision_threshold = threshold
+        model_path = Config.MODEL_SAVE_PATH
+        save_model_bundle(model_path, trained_model, feature_columns, model_version=model_version,
+                          threshold=threshold, fast_model=fast_model, metrics=model_metrics)
+        
+        # Keep every version for bulk scoring against older models
+        copy_model_bundle(model_path, archived_model_path(model_version))
+        
+        if result_log_params['enabled']:
+            result_log.append('training_runs', model_version, {
+                'trained_at': [np.datetime64(datetime.utcnow(), 'ms')],
+                'train_rows': [len(X_train)],
+                'test_rows': [len(X_test)],
+                'n_features': [len(feature_columns)],
+                'accuracy': [accuracy],
+                'precision': [precision],
+                'recall': [recall],
+                'f1_score': [f1],
+                'tn': [tn],
+                'fp': [fp],
+                'fn': [fn],
+                'tp': [tp],
+                'training_seconds': [training_seconds]
+            })
+        
+        # Precompute predictions for the new version
+        refresh_prediction_index()
+        service_ready.set()
         
-        logger.info(f"Model training completed. Accuracy: {accuracy:.3f}")
+        logger.info(f"Model training completed. Accuracy: {accuracy:.3f} at threshold {threshold:.3f}")
         
         return TrainingResult(
             accuracy=accuracy,
@@ -216,93 +914,123 @@ async def train_model(request: TrainingRequest):
                 "trueNegatives": int(tn),
                 "falsePositives": int(fp),
                 "falseNegatives": int(fn)
-            }
+            },
+            threshold=threshold,
+            rocAuc=roc_auc
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error training model: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Model training failed: {str(e)}")
 
-@app.post("/simulate", response_model=List[SimulationResult])
-async def simulate_predictions(request: SimulationRequest):
+@app.post("/simulate", response_model=List[SimulationResult], response_model_exclude_none=True)
+async def simulate_predictions(request: SimulationRequest, response: Response):
     """
     Run simulation with real-time predictions
+    
+    The results are kept as a completed simulation session whose id is
+    returned in the X-Simulation-Session header. With explain set, every
+    Fail result carries its top feature and station contributions.
     """
     try:
-        global trained_model, simulation_results, simulation_stats
+        global latest_simulation_id
         
         if trained_model is None:
             raise HTTPException(status_code=400, detail="No trained model available. Please train a model first.")
         
         logger.info(f"Starting simulation with {len(request.data)} data points")
+        memory_stage('parse')
+        check_simulation_size(request)
         
-        simulation_results = []
-        pass_count = 0
-        fail_count = 0
-        total_confidence = 0
-        
-        # Process each data point
-        for i, point in enumerate(request.data):
-            # Prepare features
-            features_df = pd.DataFrame([point.features])
-            features_df = features_df.fillna(0)
-            
-            # Make prediction
-            prediction_proba = trained_model.predict_proba(features_df)[0]
-            prediction = 1 if prediction_proba[1] > 0.5 else 0
-            confidence = float(prediction_proba[1] if prediction == 1 else prediction_proba[0])
-            
-            # Generate synthetic sensor data (for demo purposes)
-            temperature = 20 + np.random.normal(0, 5)  # 20°C ± 5°C
-            pressure = 1000 + np.random.normal(0, 50)  # 1000 hPa ± 50 hPa
-            humidity = 50 + np.random.normal(0, 15)    # 50% ± 15%
-            
-            # Create simulation result
-            result = SimulationResult(
-                timestamp=point.timestamp,
-                sampleId=f"SAMPLE_{point.id:04d}",
-                prediction="Pass" if prediction == 1 else "Fail",
-                confidence=confidence,
-                temperature=round(temperature, 1),
-                pressure=round(pressure, 0),
-                humidity=round(humidity, 1)
-            )
+        async with admission('simulate', simulation_cost(request)):
+            indexed = lookup_indexed_simulation(request)
+            if indexed is not None:
+                # Replay of stored rows: probabilities are already precomputed
+                timestamps, sample_ids, pass_probabilities = indexed
+            elif request.data:
+                # Score the whole batch in one call
+                timestamps = [point.timestamp for point in request.data]
+                sample_ids = [point.id for point in request.data]
+                pass_probabilities = np.empty(len(request.data), dtype=np.float32)
+                variant = endpoint_variant('simulate')
+                score = snapshot_scorer(variant)
+                
+                # Chunk so that no feature matrix exceeds the memory budget
+                chunk_rows = scoring_chunk_rows(len(feature_columns))
+                for start in range(0, len(request.data), chunk_rows):
+                    chunk = request.data[start:start + chunk_rows]
+                    X = DataProcessor.build_feature_matrix([point.features for point in chunk], feature_columns)
+                    # Off the event loop, so queued and timed-out requests are answered meanwhile
+                    pass_probabilities[start:start + len(chunk)] = await asyncio.to_thread(score, X)
+            elif dataset_store.is_loaded:
+                # Stored range the prediction index cannot serve (disabled, building or failed)
+                rows = stored_simulation_rows(request)
+                timestamps = np.datetime_as_string(dataset_store.array('timestamps')[rows], unit='s').tolist()
+                sample_ids = dataset_store.array('ids')[rows].tolist()
+                pass_probabilities = np.empty(len(sample_ids), dtype=np.float32)
+                variant = endpoint_variant('simulate')
+                score = snapshot_scorer(variant)
+                
+                chunk_rows = scoring_chunk_rows(len(feature_columns))
+                for start in range(rows.start, rows.stop, chunk_rows):
+                    stop = min(start + chunk_rows, rows.stop)
+                    X = stored_features(slice(start, stop))
+                    pass_probabilities[start - rows.start:stop - rows.start] = await asyncio.to_thread(score, X)
+            else:
+                raise HTTPException(status_code=400, detail="No simulation data posted and no dataset stored")
+            memory_stage('score')
             
-            simulation_results.append(result)
+            session = ReplaySession(timestamps, sample_ids, pass_probabilities=pass_probabilities,
+                                    model_version=model_version if indexed is not None else variant_version(variant),
+                                    threshold=decision_threshold)
+            session.record(pass_probabilities, format_simulation_result)
+            log_predictions('simulate', session.model_version, timestamps, sample_ids, pass_probabilities,
+                            session.threshold, session.session_id)
+            memory_stage('results')
             
-            # Update statistics
-            if prediction == 1:
-                pass_count += 1
-            else:
-                fail_count += 1
-            total_confidence += confidence
-        
-        # Calculate final statistics
-        avg_confidence = total_confidence / len(request.data) if request.data else 0
+            if request.explain:
+                failed = np.flatnonzero(np.asarray(pass_probabilities) <= session.threshold)
+                if request.data:
+                    X = DataProcessor.build_feature_matrix([request.data[i].features for i in failed], feature_columns)
+                else:
+                    X = stored_features(stored_simulation_rows(request))[failed]
+                explanations = await asyncio.to_thread(explain_rows, X, request.explainTopK)
+                for i, explanation in zip(failed, explanations):
+                    session.results[i].explanation = explanation
         
-        simulation_stats = {
-            "totalPredictions": len(request.data),
-            "passCount": pass_count,
-            "failCount": fail_count,
-            "averageConfidence": avg_confidence
-        }
+        replay_scheduler.register(session)
+        latest_simulation_id = session.session_id
+        response.headers["X-Simulation-Session"] = session.session_id
         
-        logger.info(f"Simulation completed. Pass: {pass_count}, Fail: {fail_count}, Avg Confidence: {avg_confidence:.3f}")
+        stats = session.get_stats()
+        logger.info(f"Simulation completed. Pass: {stats['passCount']}, Fail: {stats['failCount']}, "
+                    f"Avg Confidence: {stats['averageConfidence']:.3f}")
         
-        return simulation_results
+        return session.results
         
+    except HTTPException:
+        raise
+    except OverflowError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         logger.error(f"Error in simulation: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Simulation failed: {str(e)}")
 
 @app.get("/simulation/stats", response_model=SimulationStats)
-async def get_simulation_stats():
+async def get_simulation_stats(sessionId: Optional[str] = None):
     """
     Get simulation statistics
+    
+    Defaults to the most recent /simulate call
     """
-    global simulation_stats
+    session_id = sessionId or latest_simulation_id
+    session = replay_scheduler.get(session_id) if session_id else None
     
-    if not simulation_stats:
+    if session is None:
+        if sessionId:
+            raise HTTPException(status_code=404, detail=f"Simulation session {sessionId} not found")
         return SimulationStats(
             totalPredictions=0,
             passCount=0,
@@ -310,14 +1038,90 @@ async def get_simulation_stats():
             averageConfidence=0.0
         )
     
-    return SimulationStats(**simulation_stats)
+    return SimulationStats(**session.get_stats())
+
+@app.post("/simulation/sessions")
+async def start_simulation_session(request: SimulationSessionRequest):
+    """
+    Start a simulation session that replays records at their recorded
+    timestamps, accelerated by the requested speed
+    """
+    if trained_model is None:
+        raise HTTPException(status_code=400, detail="No trained model available. Please train a model first.")
+    if request.speed is not None and request.speed <= 0:
+        raise HTTPException(status_code=400, detail="speed must be positive")
+    if request.explain:
+        raise HTTPException(status_code=400, detail="explain is supported by /simulate and /predict/explain")
+    
+    try:
+        async with admission('simulate', simulation_cost(request)):
+            session = build_replay_session(request)
+        replay_scheduler.start(session)
+        return session.get_summary()
+        
+    except HTTPException:
+        raise
+    except OverflowError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error starting simulation session: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Simulation session failed: {str(e)}")
+
+@app.get("/simulation/sessions")
+async def list_simulation_sessions():
+    """
+    List simulation sessions
+    """
+    return {"sessions": [session.get_summary() for session in replay_scheduler.list_sessions()]}
+
+@app.get("/simulation/sessions/{session_id}")
+async def get_simulation_session(session_id: str):
+    """
+    Get a simulation session's state and statistics
+    """
+    session = replay_scheduler.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Simulation session {session_id} not found")
+    
+    return session.get_summary()
+
+@app.get("/simulation/sessions/{session_id}/results")
+async def get_simulation_session_results(session_id: str, offset: int = 0, limit: Optional[int] = None):
+    """
+    Get a simulation session's results produced so far
+    
+    Poll with offset set to the previous call's nextOffset to receive only
+    new results.
+    """
+    session = replay_scheduler.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Simulation session {session_id} not found")
+    
+    offset = max(0, offset)
+    results = session.results[offset:offset + limit if limit is not None else None]
+    return {
+        "sessionId": session_id,
+        "status": session.status,
+        "results": results,
+        "nextOffset": offset + len(results)
+    }
+
+@app.delete("/simulation/sessions/{session_id}")
+async def delete_simulation_session(session_id: str):
+    """
+    Stop a simulation session and discard its results
+    """
+    if not replay_scheduler.cancel(session_id):
+        raise HTTPException(status_code=404, detail=f"Simulation session {session_id} not found")
+    
+    return {"message": f"Simulation session {session_id} deleted"}
 
 @app.get("/model/info")
 async def get_model_info():
     """
     Get information about the trained model
     """
-    global trained_model, model_metrics
+    global trained_model, model_version, model_metrics
     
     if trained_model is None:
         return {"status": "No model trained", "metrics": None}
@@ -325,8 +1129,152 @@ async def get_model_info():
     return {
         "status": "Model trained",
         "model_type": "XGBoost Classifier",
+        "model_version": model_version,
+        "threshold": decision_threshold,
         "metrics": model_metrics,
-        "feature_importance": trained_model.feature_importances_.tolist() if hasattr(trained_model, 'feature_importances_') else []
+        "fast_model": model_metrics.get("fast_model", {}).get("selected") if fast_model is not None else None,
+        "fast_model_endpoints": [endpoint for endpoint in ('predict', 'simulate', 'stream')
+                                 if endpoint_variant(endpoint) == 'fast'],
+        "feature_importance": model_feature_importance(trained_model)
+    }
+
+def model_feature_importance(model) -> Dict[str, float]:
+    """Importance per column the model scores; compact models score their own columns"""
+    if not hasattr(model, 'feature_importances_'):
+        return {}
+    columns = model.features.columns if isinstance(model, CompactModel) else feature_columns
+    return {column: float(importance) for column, importance in zip(columns, model.feature_importances_)}
+
+def state_memory() -> Dict[str, float]:
+    """Approximate MB held by long-lived service state"""
+    components = {
+        'model': trained_model,
+        'fast_model': fast_model,
+        'drift_monitor': drift_monitor,
+        'explain_cache': explainer,
+        'simulation_sessions': replay_scheduler,
+        'result_log_buffers': result_log,
+        'bulk_scoring_jobs': bulk_scoring_jobs,
+        'model_metrics': model_metrics
+    }
+    return {name: estimate_size(component) / MB for name, component in components.items()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Get service resource metrics
+    """
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "resources": resource_manager.get_allocation(),
+        "replay": replay_scheduler.get_status(),
+        "explain_cache": explainer.get_status(),
+        "admission": admission_controller.get_status(),
+        "result_log": result_log.get_status(),
+        "station_features": station_feature_cache.get_status(),
+        "memory": dict(memory_tracker.get_status(), state_mb=state_memory()),
+        "compression": {
+            "enabled": api_settings['enable_compression'],
+            "encodings": available_encodings()
+        },
+        "cascade": active_scorers['full'][2].get_status() if active_scorers.get('full') and active_scorers['full'][2] else None
+    }
+
+@app.get("/admin/memory")
+async def get_memory():
+    """
+    Get process memory, memory held by long-lived state and the peaks of recent requests
+    """
+    return dict(
+        memory_tracker.get_status(),
+        state_mb=state_memory(),
+        recent_requests=[record.summary() for record in list(memory_tracker.recent)]
+    )
+
+@app.post("/admin/memory/profile")
+async def start_memory_profile(request: MemoryProfileRequest):
+    """
+    Capture tracemalloc snapshot diffs around the next requests
+    
+    The next `requests` requests outside /admin are each bracketed by two
+    snapshots; GET /admin/memory/profile reports their top allocation
+    sites. Tracing slows the service down until the last one finishes.
+    """
+    max_requests = Config.get_memory_params()['profile_max_requests']
+    if not 0 < request.requests <= max_requests:
+        raise HTTPException(status_code=400, detail=f"requests must be between 1 and {max_requests}")
+    if request.topK <= 0 or request.frames <= 0:
+        raise HTTPException(status_code=400, detail="topK and frames must be positive")
+    if not Config.get_memory_params()['track_requests']:
+        raise HTTPException(status_code=409, detail="Request memory tracking is disabled")
+    
+    allocation_profiler.arm(request.requests, request.topK, request.frames)
+    logger.info(f"Allocation profiling armed for the next {request.requests} requests")
+    return allocation_profiler.get_status()
+
+@app.get("/admin/memory/profile")
+async def get_memory_profile():
+    """
+    Get the allocation reports of profiled requests
+    """
+    return allocation_profiler.get_status()
+
+@app.get("/history/predictions")
+async def get_prediction_history(start: Optional[str] = None, end: Optional[str] = None,
+                                 modelVersion: Optional[str] = None, source: Optional[str] = None,
+                                 groupBy: str = 'day'):
+    """
+    Get the pass rate and confidence of logged predictions
+    
+    Predictions from /predict, /simulate and simulation sessions are logged
+    by scoring time and model version. Only the partitions in the requested
+    range and the columns the grouping needs are read.
+    """
+    try:
+        return await asyncio.to_thread(result_log.query_predictions, start, end, modelVersion, source, groupBy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error querying prediction history: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"History query failed: {str(e)}")
+
+@app.get("/history/training")
+async def get_training_history(start: Optional[str] = None, end: Optional[str] = None,
+                               modelVersion: Optional[str] = None):
+    """
+    Get logged training runs with their metrics
+    """
+    try:
+        runs = await asyncio.to_thread(result_log.training_runs, start, end, modelVersion)
+        return {"runs": runs}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error querying training history: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"History query failed: {str(e)}")
+
+@app.get("/model/drift")
+async def get_model_drift(limit: Optional[int] = None):
+    """
+    Get per-feature drift of scored data against the training window
+    """
+    global drift_monitor
+    
+    if drift_monitor is None:
+        return {"status": "No model trained", "drift": None}
+    
+    drift_params = Config.get_drift_params()
+    drift = drift_monitor.compute_drift(
+        limit=limit,
+        psi_threshold=drift_params['psi_alert_threshold'],
+        min_samples=drift_params['min_samples']
+    )
+    
+    return {
+        "status": "Drift computed" if drift['sufficient_samples'] else "Collecting samples",
+        "min_samples": drift_params['min_samples'],
+        "psi_alert_threshold": drift_params['psi_alert_threshold'],
+        "drift": drift
     }
 
 @app.post("/predict")
@@ -334,50 +1282,280 @@ async def predict_single(data: Dict[str, float]):
     """
     Make a single prediction
     """
-    global trained_model
+    global trained_model, feature_columns
     
     if trained_model is None:
         raise HTTPException(status_code=400, detail="No trained model available")
+    # Missing features score as 0, but a row with none of them is a malformed request
+    if not any(name in data for name in feature_columns):
+        raise HTTPException(status_code=400, detail="Request has none of the model's feature columns")
     
     try:
-        # Prepare features
-        features_df = pd.DataFrame([data])
-        features_df = features_df.fillna(0)
+        async with admission('predict'):
+            # Prepare features
+            X = DataProcessor.build_feature_matrix([data], feature_columns)
+            
+            # Make prediction
+            threshold = decision_threshold
+            variant = endpoint_variant('predict')
+            pass_probability = float((await asyncio.to_thread(snapshot_scorer(variant), X))[0])
+        log_predictions('predict', variant_version(variant), None, [-1], [pass_probability], threshold)
         
-        # Make prediction
-        prediction_proba = trained_model.predict_proba(features_df)[0]
-        prediction = 1 if prediction_proba[1] > 0.5 else 0
-        confidence = float(prediction_proba[1] if prediction == 1 else prediction_proba[0])
+        prediction = 1 if pass_probability > threshold else 0
+        confidence = pass_probability if prediction == 1 else 1 - pass_probability
         
         return {
             "prediction": "Pass" if prediction == 1 else "Fail",
             "confidence": confidence,
             "probability": {
-                "pass": float(prediction_proba[1]),
-                "fail": float(prediction_proba[0])
+                "pass": pass_probability,
+                "fail": 1 - pass_probability
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error making prediction: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict/explain")
+async def explain_predictions(request: ExplainRequest):
+    """
+    Make predictions with per-row feature contributions
+    
+    Contributions are log-odds towards Pass; the most negative ones are the
+    sensors and stations that pushed a row towards Fail.
+    """
+    if trained_model is None:
+        raise HTTPException(status_code=400, detail="No trained model available")
+    
+    max_rows = Config.get_explain_params()['max_rows']
+    if len(request.data) > max_rows:
+        raise HTTPException(status_code=400, detail=f"At most {max_rows} rows can be explained per request")
+    if request.topK is not None and request.topK <= 0:
+        raise HTTPException(status_code=400, detail="topK must be positive")
+    
+    try:
+        # The contribution matrix is about as large as the feature matrix
+        async with admission('explain', request_cost(len(request.data), len(feature_columns), 2.0)):
+            X = DataProcessor.build_feature_matrix(request.data, feature_columns)
+            explanations = await asyncio.to_thread(explain_rows, X, request.topK, request.approximate)
+        
+        if drift_monitor is not None:
+            drift_monitor.update(X)
+        log_predictions('explain', model_version, None, [-1] * len(explanations),
+                        [explanation['passProbability'] for explanation in explanations], decision_threshold)
+        
+        return {
+            "modelVersion": model_version,
+            "approximate": request.approximate,
+            "explanations": explanations
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error explaining predictions: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Explanation failed: {str(e)}")
+
+@app.websocket("/ws/predict")
+async def stream_predictions(websocket: WebSocket):
+    """
+    Score a stream of readings over one WebSocket connection
+    
+    The connection keeps the model that was active when it opened, so the
+    feature order announced in the ready message stays valid throughout.
+    """
+    await websocket.accept()
+    
+    if trained_model is None:
+        await websocket.send_json({"type": "error", "detail": "No trained model available"})
+        await websocket.close(code=1013)
+        return
+    
+    variant = endpoint_variant('stream')
+    session = StreamScoringSession(websocket, snapshot_scorer(variant), list(feature_columns), variant_version(variant),
+                                   threshold=decision_threshold, recorder=log_streamed,
+                                   **Config.get_stream_params())
+    logger.info(f"Stream scoring session opened for model {model_version}")
+    await session.run()
+    logger.info("Stream scoring session closed")
+
+@app.post("/dataset")
+async def store_dataset(request: DatasetRequest):
+    """
+    Store the dataset that simulations are replayed from
+    """
+    try:
+        if not request.data:
+            raise HTTPException(status_code=400, detail="Dataset is empty")
+        
+        fingerprint = dataset_store.save(
+            timestamps=[point.timestamp for point in request.data],
+            ids=[point.id for point in request.data],
+            responses=[point.response for point in request.data],
+            feature_rows=[point.features for point in request.data]
+        )
+        refresh_prediction_index()
+        
+        return {"message": "Dataset stored successfully", "rows": dataset_store.n_rows, "fingerprint": fingerprint}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error storing dataset: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Dataset storage failed: {str(e)}")
+
+@app.get("/dataset")
+async def get_dataset_info():
+    """
+    Get information about the stored dataset and its prediction index
+    """
+    if not dataset_store.is_loaded:
+        return {"status": "No dataset stored", "prediction_index": prediction_index.get_status()}
+    
+    return {
+        "status": "Dataset stored",
+        "rows": dataset_store.n_rows,
+        "features": len(dataset_store.feature_columns),
+        "fingerprint": dataset_store.fingerprint,
+        "start": dataset_store.metadata['start'],
+        "end": dataset_store.metadata['end'],
+        "prediction_index": prediction_index.get_status()
+    }
+
+@app.post("/backtest")
+async def run_backtest(request: BacktestRequest):
+    """
+    Run a walk-forward backtest over the stored dataset
+    """
+    if not dataset_store.is_loaded:
+        raise HTTPException(status_code=400, detail="No dataset stored. Please store a dataset first.")
+    
+    if min(request.trainDays, request.testDays, request.stepDays) <= 0:
+        raise HTTPException(status_code=400, detail="Window spans and step must be positive")
+    
+    try:
+        cost = request_cost(dataset_store.n_rows, len(dataset_store.feature_columns),
+                            Config.get_memory_params()['training_memory_factor'])
+        async with admission('backtest', cost):
+            backtester = WalkForwardBacktester(dataset_store, QUALITY_MODEL_PARAMS, resource_manager)
+            result = await asyncio.to_thread(
+                backtester.run, request.trainDays, request.testDays, request.stepDays, request.maxWorkers
+            )
+        
+        logger.info(f"Backtest completed over {len(result['folds'])} folds in {result['seconds']:.1f}s")
+        return result
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error running backtest: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Backtest failed: {str(e)}")
+
+@app.post("/bulk-score")
+async def start_bulk_scoring(request: BulkScoringRequest):
+    """
+    Score a local CSV or Parquet file in the background
+    
+    Submitting the same input, output, model version and chunk size again
+    resumes an interrupted job from its last finished chunk.
+    """
+    input_path = resolve_bulk_scoring_path(request.inputPath)
+    output_path = resolve_bulk_scoring_path(request.outputPath)
+    if not os.path.isfile(input_path):
+        raise HTTPException(status_code=404, detail=f"Input file {request.inputPath} not found")
+    if not (is_parquet(output_path) or output_path.lower().endswith('.csv')):
+        raise HTTPException(status_code=400, detail="Output must be a .csv or .parquet file")
+    
+    version = request.modelVersion or model_version
+    if version is None:
+        raise HTTPException(status_code=400, detail="No trained model available. Please train a model first.")
+    
+    model_path = archived_model_path(version)
+    if not model_bundle_exists(model_path) and version == model_version and model_bundle_exists(Config.MODEL_SAVE_PATH):
+        # Active model loaded from before versions were archived
+        copy_model_bundle(Config.MODEL_SAVE_PATH, model_path)
+    if not model_bundle_exists(model_path):
+        raise HTTPException(status_code=404, detail=f"Model version {version} not found")
+    
+    try:
+        if version == model_version:
+            columns, threshold = list(feature_columns), decision_threshold
+        else:
+            # Older archived versions may still be pickles, migrated here
+            metadata = await asyncio.to_thread(read_bundle_metadata, model_path)
+            columns = metadata['feature_columns']
+            threshold = metadata.get('threshold')
+            if threshold is None:
+                threshold = Config.get_evaluation_params()['default_threshold']
+        
+        params = Config.get_bulk_scoring_params()
+        job = BulkScoringJob(
+            input_path, output_path, model_path, version, columns,
+            os.path.join(Config.DATA_DIR, 'bulk_jobs'),
+            chunk_rows=request.chunkRows or params['chunk_rows'],
+            resource_manager=resource_manager,
+            max_workers=request.maxWorkers or params['max_workers'] or None,
+            threshold=threshold
+        )
+        
+        existing = bulk_scoring_jobs.get(job.job_id)
+        if existing is not None and existing.status in ('queued', 'running'):
+            return existing.get_status()
+        
+        bulk_scoring_jobs[job.job_id] = job
+        threading.Thread(target=job.run, name=f"bulk-scoring-{job.job_id}", daemon=True).start()
+        logger.info(f"Started bulk scoring job {job.job_id} for {input_path} with model {version}")
+        return job.get_status()
+        
+    except Exception as e:
+        logger.error(f"Error starting bulk scoring: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Bulk scoring failed: {str(e)}")
+
+@app.get("/bulk-score")
+async def list_bulk_scoring_jobs():
+    """
+    List bulk scoring jobs started since the service started
+    """
+    return {"jobs": [job.get_status() for job in bulk_scoring_jobs.values()]}
+
+@app.get("/bulk-score/{job_id}")
+async def get_bulk_scoring_job(job_id: str):
+    """
+    Get a bulk scoring job's progress and throughput
+    """
+    job = bulk_scoring_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Bulk scoring job {job_id} not found")
+    
+    return job.get_status()
+
 @app.delete("/model")
 async def delete_model():
     """
     Delete the trained model
     """
-    global trained_model, model_metrics, simulation_results, simulation_stats
+    global trained_model, model_version, feature_columns, model_metrics, latest_simulation_id, drift_monitor
+    global decision_threshold, fast_model
     
     trained_model = None
+    fast_model = None
+    model_version = None
+    decision_threshold = Config.get_evaluation_params()['default_threshold']
+    feature_columns = []
     model_metrics = {}
-    simulation_results = []
-    simulation_stats = {}
+    drift_monitor = None
+    latest_simulation_id = None
+    replay_scheduler.clear()
+    explainer.clear()
+    prediction_index.invalidate()
     
-    # Remove model file
-    model_path = "/app/data/trained_model.pkl"
-    if os.path.exists(model_path):
-        os.remove(model_path)
+    # Remove model files
+    remove_model_bundle(Config.MODEL_SAVE_PATH)
     
     return {"message": "Model deleted successfully"}
 
@@ -0,0 +1,203 @@
+"""
+Parallel walk-forward backtesting over a stored dataset
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional
+import multiprocessing
+import time
+import logging
+
+from models.evaluation import classification_metrics
+from utils.dataset_store import DatasetStore
+from utils.resource_manager import ResourceManager
+
+logger = logging.getLogger(__name__)
+
+# Read-only memory maps opened once per worker process
+_worker_arrays = {}
+
+def _init_worker(features_path: str, responses_path: str) -> None:
+    _worker_arrays['features'] = np.load(features_path, mmap_mode='r')
+    _worker_arrays['responses'] = np.load(responses_path, mmap_mode='r')
+
+def _run_fold(fold: Dict[str, Any], model_params: Dict[str, Any], n_threads: int) -> Dict[str, Any]:
+    """
+    Train and evaluate one fold inside a worker process
+
+    Fold windows are contiguous row ranges of the timestamp-sorted dataset,
+    so the slices below are views of the shared memory map, not copies.
+    """
+    import xgboost as xgb
+
+    features = _worker_arrays['features']
+    responses = _worker_arrays['responses']
+    train_rows = slice(*fold['train_rows'])
+    test_rows = slice(*fold['test_rows'])
+    y_train = responses[train_rows]
+    y_test = responses[test_rows]
+
+    result = dict(fold)
+    try:
+        start = time.perf_counter()
+        model = xgb.XGBClassifier(**model_params, n_jobs=n_threads)
+        model.fit(features[train_rows], y_train)
+        pass_probabilities = model.predict_proba(features[test_rows])[:, 1]
+
+        result.update(classification_metrics(y_test, pass_probabilities))
+        result['seconds'] = time.perf_counter() - start
+    except Exception as e:
+        result['error'] = str(e)
+
+    return result
+
+class WalkForwardBacktester:
+    """
+    Rolling train/test evaluation of the quality model over a stored dataset
+
+    Every fold trains a fresh model on its training window and scores the
+    window that follows it. Folds run in parallel worker processes that all
+    memory-map the same feature file read-only, and the worker and thread
+    counts come from the resource manager's background pool.
+    """
+
+    def __init__(self, store: DatasetStore, model_params: Dict[str, Any],
+                 resource_manager: Optional[ResourceManager] = None):
+        """
+        Initialize the backtester
+
+        Args:
+            store: Dataset store holding the rows to backtest
+            model_params: XGBClassifier parameters for every fold
+            resource_manager: Optional manager that limits worker threads
+        """
+        self.store = store
+        self.model_params = model_params
+        self.resource_manager = resource_manager
+
+    def generate_folds(self, train_days: float, test_days: float, step_days: float) -> List[Dict[str, Any]]:
+        """
+        Lay rolling windows over the dataset's time span
+
+        Args:
+            train_days: Length of each training window in days
+            test_days: Length of each test window in days
+            step_days: Offset between consecutive folds in days
+
+        Returns:
+            List of folds with window bounds and row ranges
+        """
+        timestamps = self.store.array('timestamps')
+        if len(timestamps) == 0:
+            return []
+
+        train_span, test_span, step = (
+            np.timedelta64(int(round(days * 86400000)), 'ms')
+            for days in (train_days, test_days, step_days)
+        )
+
+        folds = []
+        fold_start = timestamps[0]
+        while fold_start + train_span < timestamps[-1]:
+            boundaries = np.array([fold_start, fold_start + train_span, fold_start + train_span + test_span])
+            lo, mid, hi = np.searchsorted(timestamps, boundaries, side='left')
+            if mid > lo and hi > mid:
+                folds.append({
+                    'fold': len(folds),
+                    'train_start': str(boundaries[0]),
+                    'train_end': str(boundaries[1]),
+                    'test_end': str(boundaries[2]),
+                    'train_rows': (int(lo), int(mid)),
+                    'test_rows': (int(mid), int(hi))
+                })
+            fold_start = fold_start + step
+
+        return folds
+
+    def run(self, train_days: float, test_days: float, step_days: float,
+            max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run the backtest
+
+        Args:
+            train_days: Length of each training window in days
+            test_days: Length of each test window in days
+            step_days: Offset between consecutive folds in days
+            max_workers: Optional cap on worker processes
+
+        Returns:
+            Dictionary with per-fold metrics and their aggregate
+        """
+        folds = self.generate_folds(train_days, test_days, step_days)
+        if not folds:
+            raise ValueError("The dataset does not span a single train and test window")
+
+        start = time.perf_counter()
+        allocation = (self.resource_manager.allocate('backtest')
+                      if self.resource_manager else nullcontext(multiprocessing.cpu_count()))
+        with allocation as n_threads:
+            n_workers = max(1, min(len(folds), n_threads, max_workers or len(folds)))
+            threads_per_worker = max(1, n_threads // n_workers)
+
+            logger.info(f"Backtesting {len(folds)} folds on {n_workers} workers "
+                        f"with {threads_per_worker} threads each")
+
+            # Spawned workers avoid inheriting OpenMP state from this process
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.store.array_path('features'), self.store.array_path('responses'))
+            ) as executor:
+                results = list(executor.map(
+                    _run_fold, folds,
+                    [self.model_params] * len(folds),
+                    [threads_per_worker] * len(folds)
+                ))
+
+        return {
+            'folds': results,
+            'aggregate': self.aggregate(results),
+            'workers': n_workers,
+            'threads_per_worker': threads_per_worker,
+            'seconds': time.perf_counter() - start
+        }
+
+    @staticmethod
+    def aggregate(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Combine fold metrics
+
+        Args:
+            results: Per-fold results
+
+        Returns:
+            Mean and standard deviation of each metric, plus metrics of the
+            pooled confusion matrix across all folds
+        """
+        completed = [result for result in results if 'error' not in result]
+        aggregate = {'folds': len(results), 'completed_folds': len(completed)}
+        if not completed:
+            return aggregate
+
+        for metric in ('accuracy', 'precision', 'recall', 'f1_score'):
+            values = np.array([result[metric] for result in completed])
+            aggregate[f"mean_{metric}"] = float(values.mean())
+            aggregate[f"std_{metric}"] = float(values.std())
+
+        pooled = {key: sum(result['confusion_matrix'][key] for result in completed)
+                  for key in ('tn', 'fp', 'fn', 'tp')}
+        total = sum(pooled.values())
+        precision = pooled['tp'] / (pooled['tp'] + pooled['fp']) if pooled['tp'] + pooled['fp'] else 0.0
+        recall = pooled['tp'] / (pooled['tp'] + pooled['fn']) if pooled['tp'] + pooled['fn'] else 0.0
+        aggregate['pooled'] = {
+            'accuracy': (pooled['tp'] + pooled['tn']) / total if total else 0.0,
+            'precision': precision,
+            'recall': recall,
+            'f1_score': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            'confusion_matrix': pooled
+        }
+
+        return aggregate
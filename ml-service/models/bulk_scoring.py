@@ -0,0 +1,403 @@
+"""
+Chunked, parallel, resumable scoring of large CSV or Parquet files
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import logging
+
+from utils.resource_manager import ResourceManager
+
+logger = logging.getLogger(__name__)
+
+ID_COLUMNS = ('Id', 'id', 'ID')
+
+# Model loaded once per worker process
+_worker_model = {}
+
+def _init_worker(model_path: str) -> None:
+    from models.model_store import load_model_bundle
+
+    _worker_model['model'] = load_model_bundle(model_path)['model']
+
+def _score_chunk(index: int, ids: np.ndarray, X: np.ndarray, part_path: str,
+                 n_threads: int) -> Tuple[int, int]:
+    """Score one chunk inside a worker process and write its part file atomically"""
+    model = _worker_model['model']
+    model.set_params(n_jobs=n_threads)
+    pass_probabilities = model.predict_proba(X)[:, 1].astype(np.float32)
+
+    tmp_path = f"{part_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, ids=ids, pass_probability=pass_probabilities)
+    os.replace(tmp_path, part_path)
+    return index, len(X)
+
+def is_parquet(path: str) -> bool:
+    """Whether a path names a Parquet file"""
+    return path.lower().endswith(('.parquet', '.pq'))
+
+def require_pyarrow() -> None:
+    """Raise a ValueError if Parquet support is not installed"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ValueError("Reading or writing Parquet files requires pyarrow")
+
+class BulkScoringJob:
+    """
+    Scores a local file chunk by chunk and writes predictions to an output file
+
+    The parent process reads the input in chunks and aligns each to the
+    model's feature columns as float32. Worker processes score the chunks and
+    write one part file each. A manifest in the job directory records the
+    finished chunks, so running the same job again after an interruption
+    skips them. The parts are merged into the output once all are done.
+    """
+
+    def __init__(self, input_path: str, output_path: str, model_path: str,
+                 model_version: str, feature_columns: List[str], jobs_dir: str,
+                 chunk_rows: int = 50000, resource_manager: Optional[ResourceManager] = None,
+                 max_workers: Optional[int] = None, threshold: float = 0.5):
+        """
+        Initialize the job
+
+        Args:
+            input_path: CSV (optionally compressed) or Parquet file to score
+            output_path: CSV or Parquet file to write predictions to
+            model_path: Saved model bundle of the version to score with
+            model_version: Version of that model
+            feature_columns: Feature columns the model expects, in order
+            jobs_dir: Directory holding per-job manifests and part files
+            chunk_rows: Rows per chunk
+            resource_manager: Optional manager that limits worker threads
+            max_workers: Optional cap on worker processes
+            threshold: Pass probability above which a row is predicted Pass
+        """
+        self.input_path = os.path.abspath(input_path)
+        self.output_path = os.path.abspath(output_path)
+        self.model_path = model_path
+        self.model_version = model_version
+        self.feature_columns = feature_columns
+        self.chunk_rows = chunk_rows
+        self.resource_manager = resource_manager
+        self.max_workers = max_workers
+        self.threshold = threshold
+
+        # The same input, output, model, threshold and chunking always map to the same job
+        key = '|'.join([self.input_path, self.output_path, str(model_version), str(chunk_rows), str(threshold)])
+        self.job_id = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        self.job_dir = os.path.join(jobs_dir, self.job_id)
+
+        self.status = 'queued'
+        self.error = None
+        self.total_rows = None
+        self.rows_scored = 0
+        self.rows_resumed = 0
+        self.chunks_completed = 0
+        self.cores = 0
+        self.started_at = None
+        self.finished_at = None
+        self._scoring_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _input_fingerprint(self) -> Dict[str, Any]:
+        stat = os.stat(self.input_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.job_dir, 'manifest.json')
+
+    def _part_path(self, index: int) -> str:
+        return os.path.join(self.job_dir, f"part-{index:06d}.npz")
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Completed chunks from an earlier run of this job, or a fresh manifest"""
+        manifest = {
+            'input_path': self.input_path,
+            'output_path': self.output_path,
+            'model_version': self.model_version,
+            'chunk_rows': self.chunk_rows,
+            'input': self._input_fingerprint(),
+            'completed_chunks': {}
+        }
+
+        try:
+            with open(self._manifest_path()) as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = None
+
+        if previous is not None and previous.get('input') == manifest['input']:
+            completed = {
+                index: rows for index, rows in previous['completed_chunks'].items()
+                if os.path.exists(self._part_path(int(index)))
+            }
+            manifest['completed_chunks'] = completed
+            if completed:
+                logger.info(f"Resuming bulk scoring job {self.job_id} after {len(completed)} chunks")
+        else:
+            # Input changed or no usable manifest: start over
+            shutil.rmtree(self.job_dir, ignore_errors=True)
+
+        os.makedirs(self.job_dir, exist_ok=True)
+        return manifest
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = f"{self._manifest_path()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _count_rows(self) -> int:
+        """Rows in the input, from Parquet metadata or by counting CSV lines"""
+        if is_parquet(self.input_path):
+            import pyarrow.parquet as pq
+            return pq.ParquetFile(self.input_path).metadata.num_rows
+
+        import pandas as pd
+
+        compression = pd.io.common.infer_compression(self.input_path, 'infer')
+        with pd.io.common.get_handle(self.input_path, 'rb', compression=compression, is_text=False) as handle:
+            lines = sum(block.count(b'\n') for block in iter(lambda: handle.handle.read(1 << 20), b''))
+        return max(0, lines - 1)
+
+    def _iter_chunks(self) -> Iterator[Any]:
+        """Yield the input as DataFrames of at most chunk_rows rows"""
+        import pandas as pd
+
+        if is_parquet(self.input_path):
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(self.input_path)
+            columns = [name for name in parquet_file.schema_arrow.names
+                       if name in self.feature_columns or name in ID_COLUMNS]
+            for batch in parquet_file.iter_batches(batch_size=self.chunk_rows, columns=columns):
+                yield batch.to_pandas()
+            return
+
+        # Parse only the id and feature columns, features straight to float32
+        header = pd.read_csv(self.input_path, nrows=0).columns
+        wanted = set(self.feature_columns)
+        yield from pd.read_csv(
+            self.input_path,
+            usecols=[name for name in header if name in wanted or name in ID_COLUMNS],
+            dtype={name: np.float32 for name in header if name in wanted},
+            chunksize=self.chunk_rows
+        )
+
+    def _prepare_chunk(self, chunk, row_offset: int) -> Tuple[np.ndarray, np.ndarray]:
+        id_column = next((name for name in ID_COLUMNS if name in chunk.columns), None)
+        if id_column is not None:
+            ids = chunk[id_column].to_numpy(dtype=np.int64)
+        else:
+            ids = np.arange(row_offset, row_offset + len(chunk), dtype=np.int64)
+
+        X = chunk.reindex(columns=self.feature_columns).to_numpy(dtype=np.float32)
+        # Non-finite readings are treated as missing, as in the API
+        X[~np.isfinite(X)] = 0.0
+        return ids, X
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Run the job to completion
+
+        Returns:
+            Final job status
+        """
+        with self._lock:
+            self.status = 'running'
+            self.started_at = datetime.utcnow().isoformat()
+
+        try:
+            if is_parquet(self.input_path) or is_parquet(self.output_path):
+                require_pyarrow()
+            manifest = self._load_manifest()
+            completed = manifest['completed_chunks']
+            self.total_rows = self._count_rows()
+            self.rows_resumed = sum(completed.values())
+            self.chunks_completed = len(completed)
+
+            allocation = (self.resource_manager.allocate('bulk_scoring')
+                          if self.resource_manager else nullcontext(multiprocessing.cpu_count()))
+            with allocation as n_threads:
+                n_workers = max(1, min(n_threads, self.max_workers or n_threads))
+                threads_per_worker = max(1, n_threads // n_workers)
+                self.cores = n_workers * threads_per_worker
+                logger.info(f"Bulk scoring {self.input_path} on {n_workers} workers "
+                            f"with {threads_per_worker} threads each")
+
+                start = time.perf_counter()
+                # Spawned workers avoid inheriting OpenMP state from this process
+                with ProcessPoolExecutor(
+                    max_workers=n_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.model_path,)
+                ) as executor:
+                    pending = set()
+                    row_offset = 0
+                    for index, chunk in enumerate(self._iter_chunks()):
+                        chunk_offset, row_offset = row_offset, row_offset + len(chunk)
+                        if str(index) in completed:
+                            continue
+
+                        ids, X = self._prepare_chunk(chunk, chunk_offset)
+                        pending.add(executor.submit(_score_chunk, index, ids, X,
+                                                    self._part_path(index), threads_per_worker))
+
+                        # Bound the chunks held in memory to two per worker
+                        if len(pending) >= 2 * n_workers:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            self._record_done(done, manifest, start)
+
+                    done, _ = wait(pending)
+                    self._record_done(done, manifest, start)
+
+            self._write_output(len(manifest['completed_chunks']))
+            shutil.rmtree(self.job_dir, ignore_errors=True)
+
+            with self._lock:
+                self.status = 'completed'
+            logger.info(f"Bulk scoring job {self.job_id} completed: {self.get_status()['rows_per_second']:.0f} rows/s")
+
+        except Exception as e:
+            with self._lock:
+                self.status = 'failed'
+                self.error = str(e)
+            logger.error(f"Bulk scoring job {self.job_id} failed: {str(e)}")
+
+        finally:
+            self.finished_at = datetime.utcnow().isoformat()
+
+        return self.get_status()
+
+    def _record_done(self, done, manifest: Dict[str, Any], start: float) -> None:
+        for future in done:
+            index, rows = future.result()
+            manifest['completed_chunks'][str(index)] = rows
+            with self._lock:
+                self.rows_scored += rows
+                self.chunks_completed += 1
+                self._scoring_seconds = time.perf_counter() - start
+        if done:
+            self._save_manifest(manifest)
+
+    def _write_output(self, n_chunks: int) -> None:
+        """Merge the part files, in chunk order, into the output file"""
+        import pandas as pd
+
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        tmp_path = f"{self.output_path}.tmp"
+        if n_chunks == 0:
+            empty = pd.DataFrame({
+                'id': np.empty(0, dtype=np.int64),
+                'prediction': np.empty(0, dtype=object),
+                'pass_probability': np.empty(0, dtype=np.float32)
+            })
+            if is_parquet(self.output_path):
+                empty.to_parquet(tmp_path, index=False)
+            else:
+                empty.to_csv(tmp_path, index=False)
+        writer = None
+        try:
+            for index in range(n_chunks):
+                with np.load(self._part_path(index)) as part:
+                    pass_probability = part['pass_probability']
+                    frame = pd.DataFrame({
+                        'id': part['ids'],
+                        'prediction': np.where(pass_probability > self.threshold, 'Pass', 'Fail'),
+                        'pass_probability': pass_probability
+                    })
+
+                if is_parquet(self.output_path):
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+                    table = pa.Table.from_pandas(frame, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp_path, table.schema)
+                    writer.write_table(table)
+                else:
+                    frame.to_csv(tmp_path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        os.replace(tmp_path, self.output_path)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get job progress and throughput
+
+        Returns:
+            Dictionary with progress, rows per second and rows per second per core
+        """
+        with self._lock:
+            rows_done = self.rows_resumed + self.rows_scored
+            rows_per_second = self.rows_scored / self._scoring_seconds if self._scoring_seconds else 0.0
+            return {
+                'job_id': self.job_id,
+                'status': self.status,
+                'input_path': self.input_path,
+                'output_path': self.output_path,
+                'model_version': self.model_version,
+                'total_rows': self.total_rows,
+                'rows_done': rows_done,
+                'rows_resumed': self.rows_resumed,
+                'progress': rows_done / self.total_rows if self.total_rows else 0.0,
+                'chunks_completed': self.chunks_completed,
+                'cores': self.cores,
+                'rows_per_second': rows_per_second,
+                'rows_per_second_per_core': rows_per_second / self.cores if self.cores else 0.0,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'error': self.error
+            }
+
+def main():
+    """Score a file from the command line with a saved model bundle"""
+    import argparse
+    from models.model_store import read_bundle_metadata
+
+    parser = argparse.ArgumentParser(description="Bulk score a CSV or Parquet file")
+    parser.add_argument('input_path')
+    parser.add_argument('output_path')
+    parser.add_argument('--model', default=os.getenv('MODEL_SAVE_PATH', '/app/data/trained_model.json'))
+    parser.add_argument('--jobs-dir', default=os.path.join(os.getenv('DATA_DIR', '/app/data'), 'bulk_jobs'))
+    parser.add_argument('--chunk-rows', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    metadata = read_bundle_metadata(args.model)
+    # Label at the model's operating threshold, as /bulk-score does
+    threshold = metadata.get('threshold')
+    if threshold is None:
+        threshold = float(os.getenv('DECISION_THRESHOLD', 0.5))
+    job = BulkScoringJob(
+        args.input_path, args.output_path, args.model, metadata['model_version'],
+        metadata['feature_columns'], args.jobs_dir, chunk_rows=args.chunk_rows, max_workers=args.workers,
+        threshold=threshold
+    )
+
+    thread = threading.Thread(target=job.run)
+    thread.start()
+    while thread.is_alive():
+        thread.join(timeout=2)
+        status = job.get_status()
+        print(f"{status['rows_done']}/{status['total_rows']} rows, "
+              f"{status['rows_per_second_per_core']:.0f} rows/s/core", flush=True)
+
+    print(json.dumps(job.get_status(), indent=2))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
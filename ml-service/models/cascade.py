@@ -0,0 +1,151 @@
+"""
+Confidence-gated cascade inference over a prefix of the ensemble
+"""
+
+import numpy as np
+from typing import Dict, Any, Tuple
+import math
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CascadeScorer:
+    """
+    Scores with the first trees of a boosted ensemble and escalates only
+    rows near the decision threshold to the full model
+
+    A row's margin after the prefix trees decides it when it lies outside
+    the band of margin_band log-odds around the threshold; otherwise the row
+    is rescored with every tree. Rows that are not escalated get their
+    probability from the prefix margin.
+    """
+
+    def __init__(self, model, prefix_trees: int = 20, margin_band: float = 2.0, threshold: float = 0.5):
+        """
+        Initialize the cascade
+
+        Args:
+            model: Fitted XGBClassifier
+            prefix_trees: Boosting rounds in the first stage
+            margin_band: Half-width of the escalation band in log-odds
+            threshold: Pass probability above which a row is predicted Pass
+        """
+        self.model = model
+        self.booster = model.get_booster()
+        self.total_trees = self.booster.num_boosted_rounds()
+        self.prefix_trees = min(prefix_trees, self.total_trees)
+        self.margin_band = margin_band
+        # Clipped so a swept threshold of 0 or 1 gives a finite margin
+        threshold = min(max(threshold, 1e-7), 1 - 1e-7)
+        self.threshold_margin = math.log(threshold / (1 - threshold))
+
+        self.rows_scored = 0
+        self.rows_escalated = 0
+        self._lock = threading.Lock()
+
+    def _margin(self, X: np.ndarray, trees: int) -> np.ndarray:
+        return self.booster.inplace_predict(X, iteration_range=(0, trees), predict_type='margin')
+
+    def predict_margin(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score a batch through the cascade
+
+        Args:
+            X: Feature matrix
+
+        Returns:
+            Margins, and a mask of the rows that were escalated
+        """
+        margins = np.asarray(self._margin(X, self.prefix_trees), dtype=np.float32)
+        escalated = np.abs(margins - self.threshold_margin) < self.margin_band
+        if self.prefix_trees < self.total_trees and escalated.any():
+            margins[escalated] = self._margin(X[escalated], self.total_trees)
+
+        with self._lock:
+            self.rows_scored += len(X)
+            self.rows_escalated += int(escalated.sum())
+
+        return margins, escalated
+
+    def predict_pass_probability(self, X: np.ndarray) -> np.ndarray:
+        """
+        Pass probabilities of a batch scored through the cascade
+
+        Args:
+            X: Feature matrix
+
+        Returns:
+            Pass probability per row
+        """
+        margins, _ = self.predict_margin(X)
+        return 1 / (1 + np.exp(-margins.astype(np.float64)))
+
+    def evaluate(self, X: np.ndarray, y: np.ndarray, repeats: int = 3) -> Dict[str, Any]:
+        """
+        Compare the cascade with full scoring on a labelled window
+
+        Args:
+            X: Feature matrix
+            y: Labels, 1 for Pass
+            repeats: Timing runs per variant; the fastest counts
+
+        Returns:
+            Fraction escalated, accuracy of both, agreement and throughput gain
+
+        Raises:
+            ValueError: If X has no rows
+        """
+        if len(X) == 0:
+            raise ValueError("No rows to evaluate the cascade on")
+
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        full_times, cascade_times = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            full_margins = self._margin(X, self.total_trees)
+            full_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            cascade_margins, escalated = self.predict_margin(X)
+            cascade_times.append(time.perf_counter() - start)
+
+        full_predictions = full_margins > self.threshold_margin
+        cascade_predictions = cascade_margins > self.threshold_margin
+        labels = np.asarray(y) == 1
+        full_accuracy = float((full_predictions == labels).mean())
+        cascade_accuracy = float((cascade_predictions == labels).mean())
+        full_seconds, cascade_seconds = min(full_times), min(cascade_times)
+
+        return {
+            'prefix_trees': self.prefix_trees,
+            'total_trees': self.total_trees,
+            'margin_band': self.margin_band,
+            'rows': len(X),
+            'escalated_fraction': float(escalated.mean()),
+            'full_accuracy': full_accuracy,
+            'cascade_accuracy': cascade_accuracy,
+            'accuracy_difference': cascade_accuracy - full_accuracy,
+            'agreement': float((full_predictions == cascade_predictions).mean()),
+            'full_rows_per_second': len(X) / full_seconds,
+            'cascade_rows_per_second': len(X) / cascade_seconds,
+            'throughput_gain': full_seconds / cascade_seconds
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get live escalation counts
+
+        Returns:
+            Dictionary with rows scored and the fraction escalated
+        """
+        with self._lock:
+            return {
+                'prefix_trees': self.prefix_trees,
+                'total_trees': self.total_trees,
+                'margin_band': self.margin_band,
+                'rows_scored': self.rows_scored,
+                'rows_escalated': self.rows_escalated,
+                'escalated_fraction': self.rows_escalated / self.rows_scored if self.rows_scored else 0.0
+            }
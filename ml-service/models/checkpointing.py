@@ -0,0 +1,192 @@
+"""
+Atomic boosting-round checkpoints for resuming interrupted training
+"""
+
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+def training_job_key(X_train: np.ndarray, y_train: np.ndarray, feature_columns: List[str],
+                     params: Dict[str, Any]) -> str:
+    """
+    Identity of a training job: the same data and parameters give the same key
+
+    Args:
+        X_train: Training feature matrix
+        y_train: Training labels
+        feature_columns: Feature order of X_train
+        params: Model parameters
+
+    Returns:
+        Hex digest of the data, columns and parameters
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([feature_columns, params, list(X_train.shape)], sort_keys=True, default=str).encode())
+    # Blockwise, so the whole matrix is never copied at once
+    for start in range(0, len(X_train), 65536):
+        digest.update(np.ascontiguousarray(X_train[start:start + 65536]).tobytes())
+    digest.update(np.ascontiguousarray(y_train).tobytes())
+    return digest.hexdigest()
+
+def _fsync_directory(path: str) -> None:
+    """Make renames inside a directory durable; a no-op where directories cannot be opened"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path or '.', os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Write a file so readers see either the old or the complete new contents, even after a crash"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    # The rename itself is only durable once the directory entry is synced
+    _fsync_directory(os.path.dirname(path))
+
+class TrainingCheckpointer:
+    """
+    Booster checkpoints of one training job, saved every few boosting rounds
+
+    Each checkpoint is the booster in UBJSON, which carries the trees, the
+    learned base score and the training parameters, so boosting can continue
+    from it as if it had never stopped. A manifest names the latest complete
+    checkpoint. Both are written to a temporary file, synced and renamed, so a
+    crash mid-write leaves the previous checkpoint in place. Older
+    checkpoints of the job are removed as new ones are written, the job's
+    directory once training finishes, and directories of other jobs once they
+    have not been touched for max_age_hours.
+    """
+
+    def __init__(self, checkpoint_dir: str, job_key: str, every_rounds: int = 10,
+                 keep: int = 2, max_age_hours: float = 24.0):
+        """
+        Initialize the checkpointer
+
+        Args:
+            checkpoint_dir: Directory holding one subdirectory per job
+            job_key: Identity of the job, e.g. from training_job_key
+            every_rounds: Boosting rounds between checkpoints
+            keep: Checkpoints kept per job
+            max_age_hours: Age after which other jobs' checkpoints are removed
+        """
+        self.checkpoint_dir = checkpoint_dir
+        self.job_key = job_key
+        self.job_dir = os.path.join(checkpoint_dir, job_key)
+        self.every_rounds = every_rounds
+        self.keep = keep
+        self.max_age_hours = max_age_hours
+        self.checkpoints_written = 0
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.job_dir, 'manifest.json')
+
+    def _checkpoint_path(self, rounds: int) -> str:
+        return os.path.join(self.job_dir, f"rounds-{rounds:06d}.ubj")
+
+    def latest(self) -> Optional[Tuple[int, Any]]:
+        """
+        Latest complete checkpoint of this job
+
+        Returns:
+            Boosting rounds done and the booster, or None without a usable
+            checkpoint
+        """
+        import xgboost as xgb
+
+        try:
+            with open(self._manifest_path()) as f:
+                manifest = json.load(f)
+            booster = xgb.Booster()
+            booster.load_model(self._checkpoint_path(manifest['rounds']))
+        except (OSError, ValueError, KeyError, xgb.core.XGBoostError) as e:
+            if os.path.exists(self.job_dir):
+                logger.warning(f"Ignoring unreadable checkpoint of training job {self.job_key}: {str(e)}")
+            return None
+
+        rounds = booster.num_boosted_rounds()
+        if rounds != manifest['rounds']:
+            return None
+        return rounds, booster
+
+    def save(self, booster, total_rounds: int) -> None:
+        """
+        Write a checkpoint of a booster and drop the oldest ones beyond keep
+
+        Args:
+            booster: Booster after its latest round
+            total_rounds: Rounds the job trains in total
+        """
+        rounds = booster.num_boosted_rounds()
+        os.makedirs(self.job_dir, exist_ok=True)
+        _write_atomic(self._checkpoint_path(rounds), bytes(booster.save_raw('ubj')))
+        _write_atomic(self._manifest_path(), json.dumps({
+            'rounds': rounds,
+            'total_rounds': total_rounds,
+            'saved_at': time.time()
+        }).encode())
+        self.checkpoints_written += 1
+
+        checkpoints = sorted(glob.glob(os.path.join(self.job_dir, 'rounds-*.ubj')))
+        for path in checkpoints[:-self.keep]:
+            os.remove(path)
+
+    def clear(self) -> None:
+        """Remove every checkpoint of this job"""
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    def remove_stale(self) -> List[str]:
+        """
+        Remove checkpoint directories of other jobs that are older than max_age_hours
+
+        Returns:
+            Keys of the removed jobs
+        """
+        cutoff = time.time() - self.max_age_hours * 3600
+        removed = []
+        for job_dir in glob.glob(os.path.join(self.checkpoint_dir, '*')):
+            if job_dir == self.job_dir or not os.path.isdir(job_dir):
+                continue
+            try:
+                if os.path.getmtime(job_dir) < cutoff:
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                    removed.append(os.path.basename(job_dir))
+            except OSError:
+                pass
+        return removed
+
+    def callback(self, total_rounds: int):
+        """
+        XGBoost training callback that checkpoints every every_rounds rounds
+
+        Args:
+            total_rounds: Rounds the job trains in total, counting rounds
+                restored from a checkpoint
+        """
+        import xgboost as xgb
+
+        checkpointer = self
+
+        class CheckpointCallback(xgb.callback.TrainingCallback):
+            """Save the booster every few rounds; epochs restart at 0 on resume, rounds do not"""
+
+            def after_iteration(self, model, epoch, evals_log) -> bool:
+                rounds = model.num_boosted_rounds()
+                if rounds % checkpointer.every_rounds == 0 and rounds < total_rounds:
+                    checkpointer.save(model, total_rounds)
+                return False
+
+        return CheckpointCallback()
@@ -0,0 +1,132 @@
+"""
+Compact quality model on station aggregates and a few selected raw features
+"""
+
+import numpy as np
+from typing import List, Optional
+import logging
+
+from utils.station_features import StationMap
+
+logger = logging.getLogger(__name__)
+
+class CompactFeatures:
+    """
+    Maps full-width feature matrices to station aggregates plus selected raw columns
+
+    Raw columns are ranked by their absolute correlation with the label on
+    the training window, one matrix-vector product for all columns, and
+    the top ones are kept next to the aggregates.
+    """
+
+    def __init__(self, feature_columns: List[str], raw_indices: np.ndarray,
+                 missing_value: Optional[float] = 0.0):
+        """
+        Initialize the mapping
+
+        Args:
+            feature_columns: Full-width feature order the mapping reads
+            raw_indices: Positions of the raw columns to keep
+            missing_value: Value that marks a missing feature besides NaN
+        """
+        self.station_map = StationMap(feature_columns)
+        self.raw_indices = np.asarray(raw_indices, dtype=np.intp)
+        self.missing_value = missing_value
+        self.columns = self.station_map.aggregate_columns + [feature_columns[j] for j in self.raw_indices]
+
+    @classmethod
+    def select(cls, feature_columns: List[str], X: np.ndarray, y: np.ndarray, n_raw: int,
+               missing_value: Optional[float] = 0.0) -> 'CompactFeatures':
+        """
+        Choose the raw columns to keep from a training window
+
+        Args:
+            feature_columns: Full-width feature order of X
+            X: Training feature matrix
+            y: Training labels
+            n_raw: Raw columns to keep
+            missing_value: Value that marks a missing feature besides NaN
+
+        Returns:
+            Fitted mapping
+        """
+        X = np.nan_to_num(np.asarray(X, dtype=np.float32))
+        y = np.asarray(y, dtype=np.float32)
+        centered = y - y.mean()
+        stds = X.std(axis=0)
+        # Centered labels sum to zero, so centered @ X is the covariance times n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores = np.abs((centered @ X) / len(X)) / (stds * centered.std())
+        scores = np.where(stds > 0, np.nan_to_num(scores), -1.0)
+
+        n_raw = min(n_raw, int((stds > 0).sum()))
+        raw_indices = np.sort(np.argsort(-scores, kind='stable')[:n_raw])
+        return cls(feature_columns, raw_indices, missing_value)
+
+    def transform(self, X: np.ndarray, aggregates: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Compact matrix of a full-width feature matrix
+
+        Args:
+            X: Feature matrix in the full-width order
+            aggregates: Precomputed station aggregates of X, e.g. from the cache
+
+        Returns:
+            C-contiguous float32 matrix in the order of columns
+        """
+        if aggregates is None:
+            aggregates = self.station_map.aggregate(X, self.missing_value)
+        compact = np.empty((len(X), len(self.columns)), dtype=np.float32)
+        n_aggregates = aggregates.shape[1]
+        compact[:, :n_aggregates] = aggregates
+        compact[:, n_aggregates:] = X[:, self.raw_indices]
+        return compact
+
+class CompactModel:
+    """
+    Classifier trained on CompactFeatures that scores full-width matrices
+
+    Exposes predict_proba over the full-width feature order, so callers
+    that only score (the prediction index, bulk scoring) need no changes.
+    Callers that work with the booster itself, such as cascade inference
+    and explanations, transform with features and use model directly.
+    """
+
+    def __init__(self, features: CompactFeatures, model):
+        """
+        Initialize the compact model
+
+        Args:
+            features: Mapping from the full-width order to the model's inputs
+            model: Classifier fitted on features.transform output
+        """
+        self.features = features
+        self.model = model
+
+    @property
+    def n_features_in_(self) -> int:
+        """Width of the full feature order the model scores"""
+        return len(self.features.station_map.feature_columns)
+
+    @property
+    def feature_importances_(self) -> np.ndarray:
+        """Importances of the compact columns"""
+        return self.model.feature_importances_
+
+    def set_params(self, **params) -> 'CompactModel':
+        """Set parameters of the wrapped classifier"""
+        self.model.set_params(**params)
+        return self
+
+    def predict_proba(self, X: np.ndarray, aggregates: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Class probabilities of full-width feature rows
+
+        Args:
+            X: Feature matrix in the full-width order
+            aggregates: Precomputed station aggregates of X
+
+        Returns:
+            Array of shape (rows, 2) with Fail and Pass probabilities
+        """
+        return self.model.predict_proba(self.features.transform(X, aggregates))
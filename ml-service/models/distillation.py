@@ -0,0 +1,156 @@
+"""
+Ensemble compaction: smaller, shallower models within an accuracy-loss limit
+"""
+
+import numpy as np
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import time
+import logging
+
+from models.evaluation import classification_metrics
+
+logger = logging.getLogger(__name__)
+
+def _classifier_from_booster(booster):
+    """Wrap a native booster in an XGBClassifier so every scoring path can use it"""
+    import xgboost as xgb
+
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    return model
+
+class ModelDistiller:
+    """
+    Finds the cheapest small ensemble that stays within an accuracy-loss limit
+
+    Two kinds of candidates are tried, cheapest first, where the cost of an
+    ensemble is its number of trees times their depth:
+
+    - pruned: the first trees of the full model. Boosting fits each tree to
+      what the earlier ones left over, so the trailing trees carry the least
+      gain and are the ones dropped.
+    - distilled: a new shallow ensemble fitted to the full model's
+      probabilities on the training window (soft labels under the logistic
+      loss), so it learns the full model's decision surface rather than the
+      noisier labels. One ensemble of the largest size is fitted per depth
+      and the smaller sizes are its first trees.
+
+    Accuracy is compared with the full model's on the test window at the
+    operating threshold; the first candidate whose loss is within the limit
+    wins. Distilled candidates are only fitted when every cheaper one failed.
+    """
+
+    def __init__(self, max_accuracy_loss: float = 0.005, tree_counts: Sequence[int] = (10, 20, 40),
+                 max_depths: Sequence[int] = (2, 3, 4), learning_rate: float = 0.3,
+                 n_threads: int = 1, random_state: int = 42):
+        """
+        Initialize the distiller
+
+        Args:
+            max_accuracy_loss: Largest accepted drop in test accuracy
+            tree_counts: Ensemble sizes to try
+            max_depths: Tree depths to try for distilled ensembles
+            learning_rate: Shrinkage of distilled ensembles, higher than the
+                full model's because they have far fewer trees
+            n_threads: Threads used to fit and score candidates
+            random_state: Seed of the distilled ensembles
+        """
+        self.max_accuracy_loss = max_accuracy_loss
+        self.tree_counts = sorted(set(tree_counts))
+        self.max_depths = sorted(set(max_depths))
+        self.learning_rate = learning_rate
+        self.n_threads = n_threads
+        self.random_state = random_state
+
+    def _candidates(self, total_trees: int, depth: int) -> List[Tuple[int, str, int, int]]:
+        """(cost, kind, trees, depth) of every candidate, cheapest first"""
+        candidates = [(trees * depth, 'pruned', trees, depth)
+                      for trees in self.tree_counts if trees < total_trees]
+        candidates += [(trees * max_depth, 'distilled', trees, max_depth)
+                       for trees in self.tree_counts for max_depth in self.max_depths
+                       if trees * max_depth < total_trees * depth]
+        return sorted(candidates)
+
+    def _distil(self, X_train: np.ndarray, soft_labels: np.ndarray, max_depth: int):
+        import xgboost as xgb
+
+        params = {
+            'objective': 'binary:logistic',
+            'max_depth': max_depth,
+            'eta': self.learning_rate,
+            'nthread': self.n_threads,
+            'seed': self.random_state
+        }
+        return xgb.train(params, xgb.DMatrix(X_train, label=soft_labels), self.tree_counts[-1])
+
+    def compact(self, model, X_train: np.ndarray, X_test: np.ndarray, y_test: np.ndarray,
+                threshold: float = 0.5) -> Tuple[Optional[Any], Dict[str, Any]]:
+        """
+        Compact a fitted classifier
+
+        Args:
+            model: Fitted XGBClassifier
+            X_train: Training window the full model was fitted on
+            X_test: Test window
+            y_test: Test labels, 1 for Pass
+            threshold: Pass probability above which a row is predicted Pass
+
+        Returns:
+            The smaller XGBClassifier, or None if no candidate stays within
+            the limit, and a report of every candidate tried
+        """
+        booster = model.get_booster()
+        total_trees = booster.num_boosted_rounds()
+        depth = int(model.get_params().get('max_depth') or 6)
+
+        full_probabilities = model.predict_proba(X_test)[:, 1]
+        full_accuracy = classification_metrics(y_test, full_probabilities, threshold)['accuracy']
+        full_predictions = full_probabilities > threshold
+        soft_labels = None
+        students = {}
+
+        tried = []
+        selected = None
+        for cost, kind, trees, max_depth in self._candidates(total_trees, depth):
+            started = time.perf_counter()
+            if kind == 'pruned':
+                candidate = _classifier_from_booster(booster[:trees])
+            else:
+                if soft_labels is None:
+                    soft_labels = model.predict_proba(X_train)[:, 1]
+                if max_depth not in students:
+                    students[max_depth] = self._distil(X_train, soft_labels, max_depth)
+                candidate = _classifier_from_booster(students[max_depth][:trees])
+            candidate.set_params(n_jobs=self.n_threads)
+            probabilities = candidate.predict_proba(X_test)[:, 1]
+            accuracy = classification_metrics(y_test, probabilities, threshold)['accuracy']
+
+            tried.append({
+                'kind': kind,
+                'trees': trees,
+                'max_depth': max_depth,
+                'accuracy': accuracy,
+                'accuracy_loss': full_accuracy - accuracy,
+                'agreement': float(np.mean((probabilities > threshold) == full_predictions)),
+                'seconds': time.perf_counter() - started
+            })
+            if full_accuracy - accuracy <= self.max_accuracy_loss:
+                selected = candidate
+                break
+
+        report = {
+            'max_accuracy_loss': self.max_accuracy_loss,
+            'full_accuracy': full_accuracy,
+            'full_trees': total_trees,
+            'full_max_depth': depth,
+            'selected': tried[-1] if selected is not None else None,
+            'candidates': tried
+        }
+        if selected is None:
+            logger.info(f"No compact model within {self.max_accuracy_loss:.4f} accuracy loss "
+                        f"after {len(tried)} candidates")
+        else:
+            logger.info(f"Compacted {total_trees} trees of depth {depth} to {tried[-1]['kind']} "
+                        f"{tried[-1]['trees']} trees of depth {tried[-1]['max_depth']}, "
+                        f"accuracy loss {tried[-1]['accuracy_loss']:.4f}")
+        return selected, report
@@ -0,0 +1,186 @@
+"""
+Vectorized binary classification metrics, curves and threshold sweeps
+"""
+
+import numpy as np
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+THRESHOLD_METRICS = ('f1', 'accuracy', 'youden')
+
+def confusion_counts(y_true: np.ndarray, y_pred: np.ndarray) -> Tuple[int, int, int, int]:
+    """
+    Confusion matrix of binary labels in one bincount pass
+
+    Args:
+        y_true: Labels, 1 for Pass
+        y_pred: Predicted labels, 1 for Pass
+
+    Returns:
+        tn, fp, fn, tp
+    """
+    codes = 2 * np.asarray(y_true, dtype=np.intp) + np.asarray(y_pred, dtype=np.intp)
+    tn, fp, fn, tp = np.bincount(codes, minlength=4)[:4].tolist()
+    return tn, fp, fn, tp
+
+def metrics_from_counts(tn, fp, fn, tp) -> Dict[str, Any]:
+    """
+    Accuracy, precision, recall and F1 from confusion counts
+
+    Pass is the positive class. Undefined ratios are 0, as with sklearn's
+    zero_division=0. Counts may be scalars or arrays of equal shape.
+
+    Returns:
+        Dictionary with accuracy, precision, recall and f1_score
+    """
+    tn, fp, fn, tp = (np.asarray(count, dtype=np.float64) for count in (tn, fp, fn, tp))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        accuracy = np.where(tn + fp + fn + tp > 0, (tp + tn) / (tn + fp + fn + tp), 0.0)
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+    metrics = {'accuracy': accuracy, 'precision': precision, 'recall': recall, 'f1_score': f1}
+    if accuracy.ndim == 0:
+        return {name: float(value) for name, value in metrics.items()}
+    return metrics
+
+def classification_metrics(y_true: np.ndarray, pass_probabilities: np.ndarray,
+                           threshold: float = 0.5) -> Dict[str, Any]:
+    """
+    All confusion-matrix metrics at one threshold
+
+    Args:
+        y_true: Labels, 1 for Pass
+        pass_probabilities: Predicted pass probabilities
+        threshold: Probability above which a row is predicted Pass
+
+    Returns:
+        Dictionary with accuracy, precision, recall, f1_score and confusion_matrix
+    """
+    tn, fp, fn, tp = confusion_counts(y_true, np.asarray(pass_probabilities) > threshold)
+    metrics = metrics_from_counts(tn, fp, fn, tp)
+    metrics['confusion_matrix'] = {'tn': tn, 'fp': fp, 'fn': fn, 'tp': tp}
+    return metrics
+
+class ThresholdSweep:
+    """
+    Metrics at every distinct threshold of a scored test window
+
+    One descending sort of the probabilities and a cumulative sum of the
+    labels give the confusion counts of every cut at once: the k-th cut
+    predicts Pass for the k highest distinct probabilities. Each cut's
+    threshold lies halfway between its lowest probability and the next one,
+    so "probability > threshold" reproduces the cut. The first cut predicts
+    nothing as Pass.
+    """
+
+    def __init__(self, y_true: np.ndarray, pass_probabilities: np.ndarray):
+        """
+        Sweep a test window
+
+        Args:
+            y_true: Labels, 1 for Pass
+            pass_probabilities: Predicted pass probabilities
+
+        Raises:
+            ValueError: If the window is empty or the lengths differ
+        """
+        y_true = np.asarray(y_true, dtype=np.int64)
+        scores = np.asarray(pass_probabilities, dtype=np.float64)
+        if len(y_true) == 0 or len(y_true) != len(scores):
+            raise ValueError("Labels and probabilities must be non-empty and of equal length")
+
+        order = np.argsort(-scores, kind='stable')
+        scores = scores[order]
+        y_sorted = y_true[order]
+
+        # Last row of each block of equal probabilities
+        ends = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+        tp = np.r_[0, np.cumsum(y_sorted)[ends]]
+        fp = np.r_[0, ends + 1] - tp
+
+        self.positives = int(tp[-1])
+        self.negatives = int(fp[-1])
+        self.tp, self.fp = tp, fp
+        self.fn = self.positives - tp
+        self.tn = self.negatives - fp
+
+        distinct = scores[ends]
+        lower = np.r_[distinct[1:], np.nextafter(distinct[-1], -np.inf)]
+        self.thresholds = np.r_[distinct[0], (distinct + lower) / 2]
+        # Halfway can round onto a neighbour for probabilities one ulp apart
+        self.thresholds[1:] = np.where(self.thresholds[1:] < distinct, self.thresholds[1:], lower)
+
+        metrics = metrics_from_counts(self.tn, self.fp, self.fn, self.tp)
+        self.accuracy = metrics['accuracy']
+        self.precision = metrics['precision']
+        self.recall = metrics['recall']
+        self.f1 = metrics['f1_score']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.fpr = self.fp / self.negatives if self.negatives else np.zeros(len(self.fp))
+
+    def roc_auc(self) -> Optional[float]:
+        """Area under the ROC curve, or None if the window has only one class"""
+        if not self.positives or not self.negatives:
+            return None
+        # Trapezoids; np.trapz is deprecated in newer numpy
+        return float(np.sum(np.diff(self.fpr) * (self.recall[1:] + self.recall[:-1]) / 2))
+
+    def average_precision(self) -> Optional[float]:
+        """Precision averaged over recall steps, or None without Pass rows"""
+        if not self.positives:
+            return None
+        return float(np.sum(np.diff(self.recall) * self.precision[1:]))
+
+    def best_threshold(self, metric: str = 'f1') -> float:
+        """
+        Threshold that maximizes a metric; ties go to the highest threshold
+
+        Args:
+            metric: f1, accuracy, or youden (recall minus false positive rate)
+
+        Returns:
+            Probability above which a row is predicted Pass
+
+        Raises:
+            ValueError: If the metric is unknown
+        """
+        if metric == 'f1':
+            values = self.f1
+        elif metric == 'accuracy':
+            values = self.accuracy
+        elif metric == 'youden':
+            values = self.recall - self.fpr
+        else:
+            raise ValueError(f"Threshold metric must be one of {', '.join(THRESHOLD_METRICS)}")
+        return float(self.thresholds[int(np.argmax(values))])
+
+    def curves(self, max_points: int = 101) -> Dict[str, Any]:
+        """
+        ROC, PR and metric-by-threshold curves, thinned to at most max_points
+
+        Args:
+            max_points: Points kept per curve, evenly spaced over the cuts
+
+        Returns:
+            Dictionary of lists keyed by curve and quantity
+        """
+        n_cuts = len(self.thresholds)
+        points = np.unique(np.linspace(0, n_cuts - 1, min(max_points, n_cuts)).round().astype(np.intp))
+
+        def pick(values: np.ndarray) -> list:
+            return values[points].astype(np.float64).tolist()
+
+        return {
+            'roc': {'fpr': pick(self.fpr), 'tpr': pick(self.recall)},
+            'pr': {'recall': pick(self.recall), 'precision': pick(self.precision)},
+            'thresholds': {
+                'threshold': pick(self.thresholds),
+                'accuracy': pick(self.accuracy),
+                'precision': pick(self.precision),
+                'recall': pick(self.recall),
+                'f1_score': pick(self.f1)
+            }
+        }
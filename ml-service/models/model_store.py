@@ -0,0 +1,242 @@
+"""
+Native model bundles: UBJSON boosters next to a JSON metadata file
+"""
+
+import numpy as np
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+import logging
+
+from models.checkpointing import _write_atomic
+from models.compact_model import CompactFeatures, CompactModel
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+def bundle_paths(path: str) -> Tuple[str, str]:
+    """
+    Files of the bundle saved at a path, whatever its extension
+
+    Returns:
+        Metadata path (<stem>.json) and legacy joblib path (<stem>.pkl)
+    """
+    stem = os.path.splitext(path)[0]
+    return f"{stem}.json", f"{stem}.pkl"
+
+def model_bundle_exists(path: str) -> bool:
+    """Whether a native bundle or a legacy pickle to migrate exists at a path"""
+    return any(os.path.exists(bundle_path) for bundle_path in bundle_paths(path))
+
+def _booster_files(metadata_path: str) -> list:
+    return glob.glob(f"{os.path.splitext(metadata_path)[0]}.*.ubj")
+
+def _json_value(value):
+    """JSON form of numpy scalars and arrays found in metrics"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _save_model(model, metadata_path: str, kind: str) -> Dict[str, Any]:
+    """Write one classifier's booster and return its metadata entry"""
+    classifier = model.model if isinstance(model, CompactModel) else model
+    raw = bytes(classifier.get_booster().save_raw('ubj'))
+    # Named by content, so a new version never overwrites the files the
+    # current metadata points to
+    file_name = (f"{os.path.basename(os.path.splitext(metadata_path)[0])}."
+                 f"{kind}-{hashlib.blake2b(raw, digest_size=8).hexdigest()}.ubj")
+    _write_atomic(os.path.join(os.path.dirname(metadata_path), file_name), raw)
+
+    entry = {
+        'file': file_name,
+        'params': {key: value for key, value in classifier.get_params().items()
+                   if isinstance(value, (bool, int, float, str)) or value is None}
+    }
+    if isinstance(model, CompactModel):
+        entry['compact'] = {
+            'raw_indices': model.features.raw_indices.tolist(),
+            'missing_value': model.features.missing_value
+        }
+    return entry
+
+def _load_model(entry: Dict[str, Any], metadata_path: str, feature_columns: list):
+    """Rebuild a classifier, or a compact model, from its metadata entry"""
+    import xgboost as xgb
+
+    booster_path = os.path.join(os.path.dirname(metadata_path), entry['file'])
+    if os.path.getsize(booster_path) == 0:
+        raise ValueError(f"Booster file {booster_path} is empty")
+    classifier = xgb.XGBClassifier(**entry['params'])
+    # XGBoost reads the file itself, picking UBJSON from the .ubj extension
+    classifier.load_model(booster_path)
+
+    compact = entry.get('compact')
+    if compact is None:
+        return classifier
+    features = CompactFeatures(feature_columns, np.asarray(compact['raw_indices']), compact['missing_value'])
+    return CompactModel(features, classifier)
+
+def save_model_bundle(path: str, model, feature_columns: list, model_version: Optional[str] = None,
+                      threshold: Optional[float] = None, fast_model=None,
+                      metrics: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Save a model with its feature layout, threshold and metrics
+
+    Each booster is written in XGBoost's UBJSON format, which loads across
+    XGBoost versions, and the metadata file naming them is written last,
+    so readers see either the previous bundle or the complete new one.
+    Booster files no longer named by the metadata are removed afterwards.
+
+    Args:
+        path: Bundle path; the metadata goes to <stem>.json
+        model: Classifier or CompactModel
+        feature_columns: Feature order the model scores
+        model_version: Version of the model
+        threshold: Decision threshold on the Pass probability
+        fast_model: Optional compacted model served to fast endpoints
+        metrics: Training metrics of the model
+
+    Returns:
+        Path of the metadata file
+    """
+    import xgboost as xgb
+
+    metadata_path = bundle_paths(path)[0]
+    os.makedirs(os.path.dirname(metadata_path) or '.', exist_ok=True)
+    metadata = {
+        'format_version': FORMAT_VERSION,
+        'xgboost_version': xgb.__version__,
+        'saved_at': time.time(),
+        'model_version': model_version,
+        'threshold': threshold,
+        'feature_columns': list(feature_columns),
+        'metrics': metrics,
+        'model': _save_model(model, metadata_path, 'model'),
+        'fast_model': _save_model(fast_model, metadata_path, 'fast') if fast_model is not None else None
+    }
+    _write_atomic(metadata_path, json.dumps(metadata, default=_json_value).encode())
+
+    current = {metadata['model']['file']}
+    if metadata['fast_model'] is not None:
+        current.add(metadata['fast_model']['file'])
+    for booster_path in _booster_files(metadata_path):
+        if os.path.basename(booster_path) not in current:
+            os.remove(booster_path)
+    return metadata_path
+
+def _load_legacy_bundle(legacy_path: str) -> Dict[str, Any]:
+    """Read a joblib pickle written by earlier versions of the service"""
+    import joblib
+
+    model_data = joblib.load(legacy_path)
+    if not isinstance(model_data, dict):
+        # Bare classifier saved before bundles recorded their layout
+        model_data = {
+            'model': model_data,
+            'feature_columns': [str(name) for name in getattr(model_data, 'feature_names_in_', [])]
+        }
+    return {
+        'model': model_data['model'],
+        'feature_columns': model_data['feature_columns'],
+        # Versionless pickles were versioned by modification time; keep that version
+        'model_version': model_data.get('model_version') or
+                         datetime.utcfromtimestamp(os.path.getmtime(legacy_path)).strftime('%Y%m%d%H%M%S%f'),
+        'threshold': model_data.get('threshold'),
+        'fast_model': model_data.get('fast_model'),
+        'metrics': ({'fast_model': model_data['fast_model_report']}
+                    if model_data.get('fast_model_report') is not None else None)
+    }
+
+def load_model_bundle(path: str, migrate: bool = True) -> Dict[str, Any]:
+    """
+    Load a saved model bundle, migrating a legacy pickle on first load
+
+    Args:
+        path: Bundle path as given to save_model_bundle
+        migrate: Rewrite a legacy <stem>.pkl as a native bundle and remove it
+
+    Returns:
+        Dictionary with model, feature_columns, model_version, threshold,
+        fast_model and metrics; missing entries are None
+    """
+    metadata_path, legacy_path = bundle_paths(path)
+
+    if not os.path.exists(metadata_path):
+        if not os.path.exists(legacy_path):
+            raise FileNotFoundError(f"Model file not found: {metadata_path}")
+        bundle = _load_legacy_bundle(legacy_path)
+        if migrate:
+            try:
+                save_model_bundle(metadata_path, **bundle)
+                os.remove(legacy_path)
+                logger.info(f"Migrated {legacy_path} to native model bundle {metadata_path}")
+            except Exception as e:
+                logger.warning(f"Could not migrate {legacy_path}: {str(e)}")
+        return bundle
+
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    if metadata.get('format_version', 0) > FORMAT_VERSION:
+        raise ValueError(f"Model bundle {metadata_path} has unsupported format version {metadata['format_version']}")
+
+    feature_columns = metadata['feature_columns']
+    return {
+        'model': _load_model(metadata['model'], metadata_path, feature_columns),
+        'feature_columns': feature_columns,
+        'model_version': metadata.get('model_version'),
+        'threshold': metadata.get('threshold'),
+        'fast_model': (_load_model(metadata['fast_model'], metadata_path, feature_columns)
+                       if metadata.get('fast_model') else None),
+        'metrics': metadata.get('metrics')
+    }
+
+def read_bundle_metadata(path: str) -> Dict[str, Any]:
+    """
+    Metadata of a bundle without loading its boosters
+
+    A legacy pickle is migrated first, as it has no separate metadata.
+    """
+    metadata_path = bundle_paths(path)[0]
+    if not os.path.exists(metadata_path):
+        load_model_bundle(path)
+    with open(metadata_path) as f:
+        return json.load(f)
+
+def copy_model_bundle(source: str, destination: str) -> str:
+    """
+    Copy a native bundle under another path, e.g. into the version archive
+
+    Returns:
+        Metadata path of the copy
+    """
+    source_metadata = bundle_paths(source)[0]
+    destination_metadata = bundle_paths(destination)[0]
+    os.makedirs(os.path.dirname(destination_metadata) or '.', exist_ok=True)
+    with open(source_metadata) as f:
+        metadata = json.load(f)
+
+    source_stem = os.path.basename(os.path.splitext(source_metadata)[0])
+    destination_stem = os.path.basename(os.path.splitext(destination_metadata)[0])
+    for key in ('model', 'fast_model'):
+        if metadata.get(key):
+            file_name = destination_stem + metadata[key]['file'][len(source_stem):]
+            shutil.copyfile(os.path.join(os.path.dirname(source_metadata), metadata[key]['file']),
+                            os.path.join(os.path.dirname(destination_metadata), file_name))
+            metadata[key]['file'] = file_name
+    _write_atomic(destination_metadata, json.dumps(metadata).encode())
+    return destination_metadata
+
+def remove_model_bundle(path: str) -> None:
+    """Remove a bundle's metadata, booster files and any legacy pickle"""
+    metadata_path, legacy_path = bundle_paths(path)
+    for bundle_path in _booster_files(metadata_path) + [metadata_path, legacy_path]:
+        if os.path.exists(bundle_path):
+            os.remove(bundle_path)
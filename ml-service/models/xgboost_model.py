@@ -3,14 +3,15 @@ XGBoost model implementation for quality control prediction
 """
 
 import xgboost as xgb
-import pandas as pd
 import numpy as np
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
-import joblib
-import os
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 import logging
 
+from utils.data_processor import DataProcessor
+from models.distillation import ModelDistiller
+from models.model_store import load_model_bundle, model_bundle_exists, save_model_bundle
+
 logger = logging.getLogger(__name__)
 
 class XGBoostQualityModel:
@@ -42,36 +43,33 @@ class XGBoostQualityModel:
         self.feature_columns = None
         self.is_trained = False
         self.training_history = []
+        self.fast_model = None
         
-    def prepare_data(self, data: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.Series]:
+    def prepare_data(self, data: List[Dict[str, Any]]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
         """
         Prepare data for training/prediction
         
+        Features are built straight into a float32 matrix in the stored
+        column order, which XGBoost consumes without another conversion.
+        
         Args:
             data: List of data points with features and response
             
         Returns:
-            Tuple of (features_df, target_series)
+            Tuple of (float32 feature matrix, target array or None)
         """
-        df = pd.DataFrame(data)
-        
-        # Separate features and target
-        if 'response' in df.columns:
-            target = df['response']
-            features = df.drop('response', axis=1)
-        else:
-            target = None
-            features = df
-        
-        # Handle missing values
-        features = features.fillna(0)
-        
         # Store feature columns for consistency
         if self.feature_columns is None:
-            self.feature_columns = features.columns.tolist()
+            self.feature_columns = DataProcessor.get_feature_columns(data, exclude=('response',))
+        
+        # Missing features are filled with 0 and extra keys, including the target, are ignored
+        features = DataProcessor.build_feature_matrix(data, self.feature_columns)
+        
+        # Separate target
+        if data and 'response' in data[0]:
+            target = np.fromiter((point.get('response', 0) for point in data), dtype=np.int32, count=len(data))
         else:
-            # Ensure consistent feature order
-            features = features.reindex(columns=self.feature_columns, fill_value=0)
+            target = None
         
         return features, target
     
@@ -129,12 +127,38 @@ class XGBoostQualityModel:
             logger.error(f"Error training model: {str(e)}")
             raise
     
-    def predict(self, data: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    def compact(self, train_data: List[Dict[str, Any]], test_data: List[Dict[str, Any]],
+                max_accuracy_loss: float = 0.005, threshold: float = 0.5) -> Dict[str, Any]:
+        """
+        Build a smaller, latency-optimized model next to the trained one
+        
+        Args:
+            train_data: Training data the model was trained on
+            test_data: Test data the accuracy loss is measured on
+            max_accuracy_loss: Largest accepted drop in test accuracy
+            threshold: Pass probability above which a row is predicted Pass
+            
+        Returns:
+            Report of the candidates tried; fast_model is None if none
+            stayed within the limit
+        """
+        if not self.is_trained:
+            raise ValueError("Model must be trained before it can be compacted")
+        
+        X_train, _ = self.prepare_data(train_data)
+        X_test, y_test = self.prepare_data(test_data)
+        self.fast_model, report = ModelDistiller(max_accuracy_loss).compact(
+            self.model, X_train, X_test, y_test, threshold
+        )
+        return report
+    
+    def predict(self, data: List[Dict[str, Any]], fast: bool = False) -> Tuple[np.ndarray, np.ndarray]:
         """
         Make predictions on new data
         
         Args:
             data: List of data points to predict
+            fast: Use the compacted model when one was built
             
         Returns:
             Tuple of (predictions, probabilities)
@@ -142,9 +166,10 @@ class XGBoostQualityModel:
         if not self.is_trained:
             raise ValueError("Model must be trained before making predictions")
         
+        model = self.fast_model if fast and self.fast_model is not None else self.model
         X, _ = self.prepare_data(data)
-        predictions = self.model.predict(X)
-        probabilities = self.model.predict_proba(X)
+        predictions = model.predict(X)
+        probabilities = model.predict_proba(X)
         
         return predictions, probabilities
     
@@ -163,37 +188,34 @@ class XGBoostQualityModel:
     
     def save_model(self, filepath: str) -> None:
         """
-        Save the trained model to disk
+        Save the trained model to disk as a native bundle
         
         Args:
-            filepath: Path to save the model
+            filepath: Path to save the model; the metadata goes to
+                <stem>.json with the boosters next to it
         """
         if not self.is_trained:
             raise ValueError("No trained model to save")
         
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        joblib.dump({
-            'model': self.model,
-            'feature_columns': self.feature_columns,
-            'is_trained': self.is_trained
-        }, filepath)
+        filepath = save_model_bundle(filepath, self.model, self.feature_columns, fast_model=self.fast_model)
         
         logger.info(f"Model saved to {filepath}")
     
     def load_model(self, filepath: str) -> None:
         """
-        Load a trained model from disk
+        Load a trained model from disk, migrating a legacy pickle
         
         Args:
             filepath: Path to the saved model
         """
-        if not os.path.exists(filepath):
+        if not model_bundle_exists(filepath):
             raise FileNotFoundError(f"Model file not found: {filepath}")
         
-        model_data = joblib.load(filepath)
+        model_data = load_model_bundle(filepath)
         self.model = model_data['model']
         self.feature_columns = model_data['feature_columns']
-        self.is_trained = model_data['is_trained']
+        self.is_trained = True
+        self.fast_model = model_data['fast_model']
         
         logger.info(f"Model loaded from {filepath}")
     
@@ -7,9 +7,18 @@ import json
 import time
 from typing import Dict, Any, List
 
+from utils.synthetic_data import SyntheticDataGenerator
+
 # Service URL
 BASE_URL = "http://localhost:8000"
 
+# Bosch-shaped sample parts: 100 to train and test on, 30 more to predict
+SAMPLE_GENERATOR = SyntheticDataGenerator(n_features=40, failure_rate=0.2, seed=42)
+
+def sample_points() -> List[Dict[str, Any]]:
+    """Sample data points in timestamp order, missing stations left out"""
+    return SAMPLE_GENERATOR.to_points(SAMPLE_GENERATOR.generate(130))
+
 def test_health():
     """Test health endpoint"""
     print("Testing health endpoint...")
@@ -19,41 +28,15 @@ def test_health():
 
 def create_sample_data() -> Dict[str, Any]:
     """Create sample training data"""
-    import random
-    
-    # Generate sample training data
-    training_data = []
-    testing_data = []
-    
-    for i in range(100):
-        # Generate random features
-        features = {
-            'feature1': random.uniform(0, 1),
-            'feature2': random.uniform(0, 1),
-            'feature3': random.uniform(0, 1),
-            'feature4': random.uniform(0, 1),
-            'feature5': random.uniform(0, 1)
-        }
-        
-        # Generate response based on features (simple rule)
-        response = 1 if (features['feature1'] + features['feature2']) > 1.0 else 0
-        
-        data_point = {
-            'timestamp': f"2021-01-01T{12 + i//60:02d}:{i%60:02d}:00",
-            'response': response,
-            'features': features
-        }
-        
-        if i < 70:
-            training_data.append(data_point)
-        else:
-            testing_data.append(data_point)
+    points = sample_points()
+    training_data = points[:70]
+    testing_data = points[70:100]
     
     return {
-        'trainStart': '2021-01-01T12:00:00',
-        'trainEnd': '2021-01-01T13:10:00',
-        'testStart': '2021-01-01T13:10:00',
-        'testEnd': '2021-01-01T13:30:00',
+        'trainStart': training_data[0]['timestamp'],
+        'trainEnd': training_data[-1]['timestamp'],
+        'testStart': testing_data[0]['timestamp'],
+        'testEnd': testing_data[-1]['timestamp'],
         'trainingData': training_data,
         'testingData': testing_data
     }
@@ -87,13 +70,7 @@ def test_single_prediction():
     """Test single prediction"""
     print("\nTesting single prediction...")
     
-    sample_features = {
-        'feature1': 0.8,
-        'feature2': 0.6,
-        'feature3': 0.4,
-        'feature4': 0.2,
-        'feature5': 0.9
-    }
+    sample_features = sample_points()[100]['features']
     
     response = requests.post(
         f"{BASE_URL}/predict",
@@ -111,31 +88,34 @@ def test_single_prediction():
         print(f"Prediction failed: {response.text}")
         return False
 
+def test_prediction_explain():
+    """Test prediction explanations"""
+    print("\nTesting prediction explanations...")
+    
+    rows = [point['features'] for point in sample_points()[100:102]]
+    
+    response = requests.post(f"{BASE_URL}/predict/explain", json={'data': rows, 'topK': 3})
+    
+    print(f"Explanation response: {response.status_code}")
+    if response.status_code == 200:
+        for explanation in response.json()['explanations']:
+            top = ", ".join(f"{c['feature']} {c['contribution']:+.3f}" for c in explanation['contributions'])
+            print(f"  {explanation['prediction']} ({explanation['confidence']:.3f}): {top}")
+        return True
+    else:
+        print(f"Explanation failed: {response.text}")
+        return False
+
 def test_simulation():
     """Test simulation"""
     print("\nTesting simulation...")
     
     # Create simulation data
-    simulation_data = []
-    for i in range(20):
-        features = {
-            'feature1': 0.5 + (i * 0.02),
-            'feature2': 0.3 + (i * 0.01),
-            'feature3': 0.7 - (i * 0.01),
-            'feature4': 0.2 + (i * 0.02),
-            'feature5': 0.8 - (i * 0.01)
-        }
-        
-        simulation_data.append({
-            'timestamp': f"2021-01-01T{14 + i//60:02d}:{i%60:02d}:00",
-            'id': i + 1,
-            'response': 1 if i % 3 == 0 else 0,
-            'features': features
-        })
+    simulation_data = sample_points()[100:120]
     
     request_data = {
-        'simulationStart': '2021-01-01T14:00:00',
-        'simulationEnd': '2021-01-01T14:20:00',
+        'simulationStart': simulation_data[0]['timestamp'],
+        'simulationEnd': simulation_data[-1]['timestamp'],
         'data': simulation_data
     }
     
@@ -159,6 +139,43 @@ def test_simulation():
         print(f"Simulation failed: {response.text}")
         return False
 
+def test_simulation_session():
+    """Test accelerated replay simulation session"""
+    print("\nTesting simulation session...")
+    
+    simulation_data = sample_points()[100:120]
+    
+    # Parts arrive about a second apart: 20 recorded seconds replayed in about 2
+    response = requests.post(
+        f"{BASE_URL}/simulation/sessions",
+        json={
+            'simulationStart': simulation_data[0]['timestamp'],
+            'simulationEnd': simulation_data[-1]['timestamp'],
+            'data': simulation_data,
+            'speed': 10
+        }
+    )
+    
+    print(f"Simulation session response: {response.status_code}")
+    if response.status_code != 200:
+        print(f"Simulation session failed: {response.text}")
+        return False
+    
+    session_id = response.json()['sessionId']
+    offset = 0
+    status = 'running'
+    while status == 'running':
+        time.sleep(0.5)
+        page = requests.get(f"{BASE_URL}/simulation/sessions/{session_id}/results", params={'offset': offset}).json()
+        status = page['status']
+        offset = page['nextOffset']
+        print(f"  {status}: {offset} results")
+    
+    summary = requests.get(f"{BASE_URL}/simulation/sessions/{session_id}").json()
+    print(f"Session stats: {summary['stats']}")
+    requests.delete(f"{BASE_URL}/simulation/sessions/{session_id}")
+    return status == 'completed'
+
 def test_simulation_stats():
     """Test simulation statistics"""
     print("\nTesting simulation statistics...")
@@ -194,6 +211,55 @@ def test_model_info():
         print(f"Model info failed: {response.text}")
         return False
 
+def test_model_drift():
+    """Test model drift endpoint"""
+    print("\nTesting model drift...")
+    
+    response = requests.get(f"{BASE_URL}/model/drift", params={'limit': 5})
+    
+    print(f"Model drift response: {response.status_code}")
+    if response.status_code == 200:
+        drift = response.json()['drift']
+        print(f"Rows scored: {drift['rows_scored']}")
+        print(f"Max PSI: {drift['summary']['max_psi']:.3f}")
+        for feature in drift['features']:
+            print(f"  {feature['feature']}: PSI {feature['psi']:.3f}, KS {feature['ks']:.3f}")
+        return True
+    else:
+        print(f"Model drift failed: {response.text}")
+        return False
+
+def test_stream_predictions():
+    """Test WebSocket stream scoring"""
+    print("\nTesting stream predictions...")
+    
+    from websockets.sync.client import connect
+    
+    with connect(BASE_URL.replace("http", "ws", 1) + "/ws/predict") as websocket:
+        ready = json.loads(websocket.recv())
+        if ready['type'] != 'ready':
+            print(f"Stream predictions failed: {ready}")
+            return False
+        print(f"Credits: {ready['credits']}, features: {len(ready['features'])}")
+        
+        readings = [
+            {'id': point['id'], 'features': point['features']}
+            for point in sample_points()[100:110]
+        ]
+        websocket.send(json.dumps({'readings': readings}))
+        
+        results = []
+        while len(results) < len(readings):
+            message = json.loads(websocket.recv())
+            if message['type'] != 'predictions':
+                print(f"Stream predictions failed: {message}")
+                return False
+            results.extend(message['results'])
+    
+    for result in results[:3]:
+        print(f"  Reading {result['id']}: {result['prediction']} ({result['confidence']:.3f})")
+    return True
+
 def main():
     """Run all tests"""
     print("🧪 Testing IntelliInspect ML Service")
@@ -203,9 +269,13 @@ def main():
         ("Health Check", test_health),
         ("Model Training", test_training),
         ("Single Prediction", test_single_prediction),
+        ("Prediction Explanations", test_prediction_explain),
         ("Simulation", test_simulation),
+        ("Simulation Session", test_simulation_session),
         ("Simulation Stats", test_simulation_stats),
-        ("Model Info", test_model_info)
+        ("Model Info", test_model_info),
+        ("Model Drift", test_model_drift),
+        ("Stream Predictions", test_stream_predictions)
     ]
     
     results = []
@@ -0,0 +1,309 @@
+"""
+Admission control, request deadlines and request size limits
+"""
+
+import asyncio
+import contextvars
+import json
+import math
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Monotonic deadline of the request being served, visible to worker threads
+# started with asyncio.to_thread since they inherit the context
+request_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+class AdmissionRejected(Exception):
+    """A request was refused admission"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class DeadlineExceeded(TimeoutError):
+    """The request being served passed its deadline"""
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one"""
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def check_deadline() -> None:
+    """
+    Stop work for a request that passed its deadline
+
+    Raises:
+        DeadlineExceeded: If the current request's deadline has passed
+    """
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+class EndpointLimiter:
+    """Concurrency and cost limit of one endpoint, with a bounded FIFO wait queue"""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_cost: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_cost = max_cost
+
+        self.in_flight = 0
+        self.cost_in_flight = 0.0
+        self.waiters = deque()
+        self.service_seconds = None  # moving average
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def fits(self, cost: float) -> bool:
+        """Whether a request of this cost can start now"""
+        return self.in_flight < self.max_concurrent and self.cost_in_flight + cost <= self.max_cost
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog has likely drained"""
+        per_request = self.service_seconds if self.service_seconds is not None else 1.0
+        backlog = self.in_flight + len(self.waiters)
+        return max(1, math.ceil(per_request * backlog / self.max_concurrent))
+
+class AdmissionController:
+    """
+    Admits requests per endpoint against a concurrency limit and a cost budget
+
+    Each endpoint has its own limiter, so expensive requests never hold up
+    cheap ones. A request's cost is its estimated feature matrix bytes;
+    requests start while both the in-flight count and the summed cost are
+    within the endpoint's limits, and otherwise wait in a FIFO queue. A full
+    queue answers 429 at once and a wait that outlives the queue timeout or
+    the request deadline answers 503, both with a Retry-After estimated from
+    recent service times. A request costing more than the whole budget can
+    never run and answers 413.
+
+    All methods run on the event loop.
+    """
+
+    def __init__(self, queue_timeout: float = 10.0):
+        """
+        Initialize the admission controller
+
+        Args:
+            queue_timeout: Longest wait for admission in seconds
+        """
+        self.queue_timeout = queue_timeout
+        self.limiters = {}
+        self.deadlines_exceeded = 0
+
+    def add_limit(self, name: str, max_concurrent: int, max_queue: int,
+                  max_cost: float = math.inf) -> None:
+        """
+        Add the limiter for an endpoint
+
+        Args:
+            name: Endpoint name used by acquire
+            max_concurrent: Requests served at once
+            max_queue: Requests waiting at most
+            max_cost: Summed cost of the requests served at once
+        """
+        self.limiters[name] = EndpointLimiter(name, max_concurrent, max_queue, max_cost)
+
+    async def acquire(self, name: str, cost: float = 1.0) -> Tuple[EndpointLimiter, float, float]:
+        """
+        Wait for admission to an endpoint
+
+        Args:
+            name: Endpoint name
+            cost: Estimated cost of the request
+
+        Returns:
+            Ticket to pass to release once the request is served
+
+        Raises:
+            AdmissionRejected: With status 413, 429 or 503
+        """
+        limiter = self.limiters[name]
+        if cost > limiter.max_cost:
+            limiter.rejected += 1
+            raise AdmissionRejected(
+                413, f"Request cost {cost / 1024 ** 2:.0f} MB exceeds the {name} capacity "
+                     f"of {limiter.max_cost / 1024 ** 2:.0f} MB"
+            )
+
+        if not limiter.waiters and limiter.fits(cost):
+            self._grant(limiter, cost)
+            return limiter, cost, time.monotonic()
+
+        if len(limiter.waiters) >= limiter.max_queue:
+            limiter.rejected += 1
+            raise AdmissionRejected(429, f"Too many {name} requests waiting", limiter.retry_after())
+
+        timeout = self.queue_timeout
+        remaining = remaining_time()
+        if remaining is not None:
+            timeout = max(0.0, min(timeout, remaining))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, cost)
+        limiter.waiters.append(entry)
+        limiter.queued += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Granted while the wait was being cancelled
+                self._return(limiter, cost)
+            else:
+                limiter.waiters.remove(entry)
+                self._wake(limiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            limiter.timed_out += 1
+            raise AdmissionRejected(503, f"Timed out waiting for {name} capacity", limiter.retry_after())
+
+        return limiter, cost, time.monotonic()
+
+    def release(self, ticket: Tuple[EndpointLimiter, float, float]) -> None:
+        """
+        Return an admitted request's capacity
+
+        Args:
+            ticket: Ticket returned by acquire
+        """
+        limiter, cost, started = ticket
+        elapsed = time.monotonic() - started
+        limiter.service_seconds = elapsed if limiter.service_seconds is None else \
+            0.8 * limiter.service_seconds + 0.2 * elapsed
+        self._return(limiter, cost)
+
+    def _grant(self, limiter: EndpointLimiter, cost: float) -> None:
+        limiter.in_flight += 1
+        limiter.cost_in_flight += cost
+        limiter.admitted += 1
+
+    def _return(self, limiter: EndpointLimiter, cost: float) -> None:
+        limiter.in_flight -= 1
+        limiter.cost_in_flight -= cost
+        self._wake(limiter)
+
+    def _wake(self, limiter: EndpointLimiter) -> None:
+        """Start queued requests in order while the head of the queue fits"""
+        while limiter.waiters and limiter.fits(limiter.waiters[0][1]):
+            future, cost = limiter.waiters.popleft()
+            if future.done():
+                continue
+            self._grant(limiter, cost)
+            future.set_result(None)
+
+    def retry_after(self) -> int:
+        """Retry-After for requests refused outside a single endpoint"""
+        return max([limiter.retry_after() for limiter in self.limiters.values()], default=1)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get per-endpoint admission counts
+
+        Returns:
+            Dictionary with in-flight, queued and refused requests per endpoint
+        """
+        return {
+            'queue_timeout_seconds': self.queue_timeout,
+            'deadlines_exceeded': self.deadlines_exceeded,
+            'endpoints': {
+                name: {
+                    'in_flight': limiter.in_flight,
+                    'waiting': len(limiter.waiters),
+                    'max_concurrent': limiter.max_concurrent,
+                    'max_queue': limiter.max_queue,
+                    'cost_in_flight_mb': limiter.cost_in_flight / 1024 ** 2,
+                    'max_cost_mb': None if math.isinf(limiter.max_cost) else limiter.max_cost / 1024 ** 2,
+                    'admitted': limiter.admitted,
+                    'queued': limiter.queued,
+                    'rejected': limiter.rejected,
+                    'timed_out': limiter.timed_out,
+                    'average_service_seconds': limiter.service_seconds
+                }
+                for name, limiter in self.limiters.items()
+            }
+        }
+
+class RequestLimitMiddleware:
+    """
+    ASGI middleware enforcing a request body size limit and a deadline
+
+    Bodies over max_request_size are refused with 413, from Content-Length
+    when given and otherwise as the body streams in, in which case the
+    handler sees the client disconnect. Each HTTP request runs
+    under a deadline of timeout_seconds: when it passes, the handler is
+    cancelled and 503 is returned if no response has started. Work running
+    in worker threads stops at its next check_deadline call.
+    WebSocket connections are long-lived and pass through unchanged.
+    """
+
+    def __init__(self, app, controller: AdmissionController, max_request_size: int, timeout_seconds: float):
+        self.app = app
+        self.controller = controller
+        self.max_request_size = max_request_size
+        self.timeout_seconds = timeout_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        for key, value in scope.get('headers', []):
+            if key == b'content-length' and value.isdigit() and int(value) > self.max_request_size:
+                await self._error(send, 413, f"Request body exceeds {self.max_request_size} bytes")
+                return
+
+        received = 0
+        response_started = False
+        refused = False
+
+        async def limited_receive():
+            nonlocal received, response_started, refused
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_request_size and not response_started:
+                    response_started = refused = True
+                    await self._error(send, 413, f"Request body exceeds {self.max_request_size} bytes")
+                    return {'type': 'http.disconnect'}
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if refused:
+                return
+            if message['type'] == 'http.response.start':
+                response_started = True
+            await send(message)
+
+        deadline = time.monotonic() + self.timeout_seconds
+        token = request_deadline.set(deadline)
+        try:
+            await asyncio.wait_for(self.app(scope, limited_receive, tracked_send), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            if time.monotonic() < deadline:
+                raise
+            self.controller.deadlines_exceeded += 1
+            logger.warning(f"{scope['method']} {scope['path']} exceeded its {self.timeout_seconds}s deadline")
+            if not response_started:
+                await self._error(send, 503, f"Request exceeded the {self.timeout_seconds}s deadline",
+                                  self.controller.retry_after())
+        finally:
+            request_deadline.reset(token)
+
+    @staticmethod
+    async def _error(send, status_code: int, detail: str, retry_after: Optional[int] = None) -> None:
+        body = json.dumps({'detail': detail}).encode()
+        headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        if retry_after is not None:
+            headers.append((b'retry-after', str(retry_after).encode()))
+        await send({'type': 'http.response.start', 'status': status_code, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,269 @@
+"""
+Streaming request decompression and negotiated response compression
+"""
+
+from typing import List, Optional
+import json
+import zlib
+import logging
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Server preference when a client accepts several encodings equally
+ENCODINGS = ('zstd', 'gzip')
+COMPRESSIBLE_TYPES = (b'application/json', b'text/')
+
+def available_encodings() -> List[str]:
+    """Encodings this process can decode and encode; zstd needs zstandard"""
+    return [encoding for encoding in ENCODINGS if encoding != 'zstd' or zstandard is not None]
+
+def make_decompressor(encoding: str):
+    """Incremental decompressor with decompress(chunk) and an eof flag"""
+    if encoding == 'gzip':
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    return zstandard.ZstdDecompressor().decompressobj()
+
+class BoundedDecoder:
+    """
+    Incremental gzip or zstd decoder whose output per call is capped
+
+    gzip is capped exactly with zlib's max_length, keeping the held-back
+    input for the next call. zstd has no output cap, so input is fed in
+    slices whose worst-case expansion fits the cap: a zstd block decodes to
+    at most 128 KB and takes at least 4 bytes, so one input byte yields at
+    most 32 KB. Concatenated gzip members and zstd frames are decoded in
+    turn, and input left over at the cap is kept rather than dropped.
+    """
+
+    ZSTD_MAX_EXPANSION = 32 * 1024
+    ZSTD_MIN_SLICE = 64
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self._decompressor = make_decompressor(encoding)
+        self._pending = b''
+
+    @property
+    def eof(self) -> bool:
+        """Whether the input so far ends exactly at the end of a member or frame"""
+        return self._decompressor.eof and not self._pending
+
+    def decompress(self, data: bytes, limit: int) -> bytes:
+        """
+        Decode the next chunk of input
+
+        Args:
+            data: Compressed bytes
+            limit: Most bytes to return; zstd may exceed it by at most
+                ZSTD_MIN_SLICE * ZSTD_MAX_EXPANSION bytes
+
+        Returns:
+            Decoded bytes; reaching limit leaves the rest of the input pending
+        """
+        data = self._pending + data
+        pieces, produced = [], 0
+        while data and produced < limit:
+            if self._decompressor.eof:
+                # The next gzip member or zstd frame follows
+                self._decompressor = make_decompressor(self.encoding)
+            decompressor = self._decompressor
+            if self.encoding == 'gzip':
+                piece = decompressor.decompress(data, limit - produced)
+                data = decompressor.unused_data if decompressor.eof else decompressor.unconsumed_tail
+            else:
+                size = max(self.ZSTD_MIN_SLICE, (limit - produced) // self.ZSTD_MAX_EXPANSION)
+                piece = decompressor.decompress(data[:size])
+                data = (decompressor.unused_data if decompressor.eof else b'') + data[size:]
+            pieces.append(piece)
+            produced += len(piece)
+        self._pending = data
+        return b''.join(pieces)
+
+def make_compressor(encoding: str, level: int):
+    """Incremental compressor with compress(chunk) and flush()"""
+    if encoding == 'gzip':
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+def negotiate_encoding(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """
+    Response encoding for an Accept-Encoding header
+
+    Args:
+        accept_encoding: Header value, e.g. "gzip;q=0.8, zstd"
+        available: Encodings the server can produce, most preferred first
+
+    Returns:
+        The accepted encoding with the highest quality, ties going to the
+        server's preference, or None for an uncompressed response
+    """
+    qualities = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            qualities[name.strip().lower()] = quality
+
+    wildcard = qualities.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+class CompressionMiddleware:
+    """
+    ASGI middleware for gzip- and zstd-encoded bodies
+
+    Requests with Content-Encoding gzip or zstd are decompressed chunk by
+    chunk as the body arrives, so the compressed body is never held
+    whole. The handler sees the plain body without Content-Encoding or
+    Content-Length. Decompressed bodies over max_decompressed_size are
+    refused with 413. Corrupt or truncated ones get 400, and unknown
+    encodings get 415.
+
+    JSON and text responses of at least min_response_size bytes are
+    compressed with the encoding negotiated from Accept-Encoding. Streamed
+    responses are compressed chunk by chunk. WebSocket connections pass
+    through unchanged.
+    """
+
+    def __init__(self, app, max_decompressed_size: int, min_response_size: int = 1024,
+                 gzip_level: int = 1, zstd_level: int = 3):
+        self.app = app
+        self.max_decompressed_size = max_decompressed_size
+        self.min_response_size = min_response_size
+        self.levels = {'gzip': gzip_level, 'zstd': zstd_level}
+        self.available = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers', []))
+        content_encoding = headers.get(b'content-encoding', b'identity').decode('latin-1').strip().lower()
+        response_encoding = negotiate_encoding(headers.get(b'accept-encoding', b'').decode('latin-1'),
+                                               self.available)
+
+        if content_encoding != 'identity':
+            if content_encoding not in self.available:
+                await self._error(send, 415, f"Unsupported Content-Encoding {content_encoding}; "
+                                             f"supported: {', '.join(self.available)}")
+                return
+            scope = dict(scope, headers=[(key, value) for key, value in scope['headers']
+                                         if key not in (b'content-encoding', b'content-length')])
+            state = {'refused': False}
+            receive = self._decoding_receive(receive, content_encoding, send, state)
+            send = self._refusable_send(send, state)
+
+        if response_encoding is not None:
+            send = self._encoding_send(send, response_encoding)
+
+        await self.app(scope, receive, send)
+
+    def _decoding_receive(self, receive, encoding: str, send, state):
+        decoder = BoundedDecoder(encoding)
+        decompressed = 0
+
+        async def refuse(status_code: int, detail: str):
+            state['refused'] = True
+            await self._error(send, status_code, detail)
+            return {'type': 'http.disconnect'}
+
+        async def decoding_receive():
+            nonlocal decompressed
+            while True:
+                message = await receive()
+                if message['type'] != 'http.request' or state['refused']:
+                    return message
+                try:
+                    # Stop just past the limit rather than inflating the whole chunk
+                    body = decoder.decompress(message.get('body', b''),
+                                              self.max_decompressed_size - decompressed + 1)
+                except Exception as e:
+                    return await refuse(400, f"Request body could not be decompressed: {str(e)}")
+                decompressed += len(body)
+                if decompressed > self.max_decompressed_size:
+                    return await refuse(413, f"Decompressed request body exceeds {self.max_decompressed_size} bytes")
+                more_body = message.get('more_body', False)
+                if not more_body and not decoder.eof:
+                    return await refuse(400, "Compressed request body is truncated")
+                if body or not more_body:
+                    return {'type': 'http.request', 'body': body, 'more_body': more_body}
+
+        return decoding_receive
+
+    def _refusable_send(self, send, state):
+        # After a refusal the handler's own response is dropped
+        async def refusable_send(message):
+            if not state['refused']:
+                await send(message)
+
+        return refusable_send
+
+    def _encoding_send(self, send, encoding: str):
+        start_message = None
+        compressor = None
+
+        async def encoding_send(message):
+            nonlocal start_message, compressor
+            if message['type'] == 'http.response.start':
+                start_message = message
+                return
+            if message['type'] != 'http.response.body' or start_message is None:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if compressor is None:
+                # First body chunk decides whether this response is compressed
+                response_headers = dict(start_message.get('headers', []))
+                compressible = (b'content-encoding' not in response_headers
+                                and response_headers.get(b'content-type', b'').startswith(COMPRESSIBLE_TYPES)
+                                and (more_body or len(body) >= self.min_response_size))
+                if not compressible:
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+
+                compressor = make_compressor(encoding, self.levels[encoding])
+                headers = [(key, value) for key, value in start_message.get('headers', [])
+                           if key != b'content-length']
+                headers += [(b'content-encoding', encoding.encode()), (b'vary', b'Accept-Encoding')]
+                if not more_body:
+                    body = compressor.compress(body) + compressor.flush()
+                    headers.append((b'content-length', str(len(body)).encode()))
+                    await send(dict(start_message, headers=headers))
+                    await send({'type': 'http.response.body', 'body': body})
+                    return
+                await send(dict(start_message, headers=headers))
+
+            body = compressor.compress(body)
+            if not more_body:
+                body += compressor.flush()
+            if body or not more_body:
+                await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+
+        return encoding_send
+
+    @staticmethod
+    async def _error(send, status_code: int, detail: str) -> None:
+        body = json.dumps({'detail': detail}).encode()
+        headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        await send({'type': 'http.response.start', 'status': status_code, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
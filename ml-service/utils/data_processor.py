@@ -2,13 +2,21 @@
 Data processing utilities for the ML service
 """
 
-import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple, Iterable, Optional
+from itertools import chain, repeat
 import logging
 
+from utils.synthetic_data import SensorReadings
+
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
+# Shared by all callers so readings are drawn a block at a time
+_sensor_readings = SensorReadings()
+
 class DataProcessor:
     """
     Utility class for data processing operations
@@ -48,14 +56,7 @@ class DataProcessor:
         Returns:
             Dictionary with synthetic sensor readings
         """
-        return {
-            'temperature': round(20 + np.random.normal(0, 5), 1),  # 20°C ± 5°C
-            'pressure': round(1000 + np.random.normal(0, 50), 0),  # 1000 hPa ± 50 hPa
-            'humidity': round(50 + np.random.normal(0, 15), 1),    # 50% ± 15%
-            'vibration': round(np.random.normal(0, 0.5), 3),       # Vibration sensor
-            'voltage': round(220 + np.random.normal(0, 10), 1),    # 220V ± 10V
-            'current': round(5 + np.random.normal(0, 1), 2)        # 5A ± 1A
-        }
+        return _sensor_readings.next()
     
     @staticmethod
     def calculate_confidence_metrics(predictions: np.ndarray, 
@@ -96,33 +97,106 @@ class DataProcessor:
         }
     
     @staticmethod
-    def create_feature_matrix(data: List[Dict[str, Any]]) -> pd.DataFrame:
+    def get_feature_columns(rows: List[Dict[str, Any]],
+                            exclude: Iterable[str] = ()) -> List[str]:
+        """
+        Collect feature names across rows in order of first appearance
+        
+        Args:
+            rows: List of feature dictionaries
+            exclude: Keys that are not features
+            
+        Returns:
+            Ordered list of feature names
+        """
+        columns = dict.fromkeys(chain.from_iterable(rows))
+        for key in exclude:
+            columns.pop(key, None)
+        return list(columns)
+    
+    @staticmethod
+    def build_feature_matrix(rows: List[Dict[str, Any]], feature_columns: List[str],
+                             fill_value: float = 0.0) -> np.ndarray:
+        """
+        Build a float32 feature matrix directly from feature dictionaries
+        
+        Values are streamed straight into the float32 array, so no float64
+        DataFrame or intermediate copy is ever materialized. Features missing
+        from a row take fill_value; keys not in feature_columns are ignored.
+        
+        Args:
+            rows: List of feature dictionaries
+            feature_columns: Ordered feature names of the matrix columns
+            fill_value: Value for missing and NaN features
+            
+        Returns:
+            C-contiguous float32 array of shape (rows, features)
+        """
+        n_rows, n_features = len(rows), len(feature_columns)
+        values = chain.from_iterable(
+            map(row.get, feature_columns, repeat(fill_value)) for row in rows
+        )
+        try:
+            matrix = np.fromiter(values, dtype=np.float32, count=n_rows * n_features)
+        except TypeError:
+            # Explicit nulls in the input; fall back to cleaning value by value
+            values = chain.from_iterable(
+                (fill_value if value is None else value
+                 for value in map(row.get, feature_columns, repeat(fill_value)))
+                for row in rows
+            )
+            matrix = np.fromiter(values, dtype=np.float32, count=n_rows * n_features)
+        matrix = matrix.reshape(n_rows, n_features)
+        
+        np.copyto(matrix, np.float32(fill_value), where=np.isnan(matrix))
+        return matrix
+    
+    @staticmethod
+    def estimate_matrix_bytes(n_rows: int, n_features: int) -> int:
+        """
+        Estimate the size of a float32 feature matrix
+        
+        Args:
+            n_rows: Number of rows
+            n_features: Number of features
+            
+        Returns:
+            Size in bytes
+        """
+        return n_rows * n_features * np.dtype(np.float32).itemsize
+    
+    @staticmethod
+    def create_feature_matrix(data: List[Dict[str, Any]],
+                              feature_columns: Optional[List[str]] = None) -> 'pd.DataFrame':
         """
         Create a feature matrix from list of data points
         
         Args:
             data: List of data points with features
+            feature_columns: Optional column order; defaults to order of appearance
             
         Returns:
-            DataFrame with features
+            DataFrame with float32 features
         """
+        import pandas as pd
+        
         if not data:
             return pd.DataFrame()
         
         # Extract features from each data point
-        feature_rows = []
-        for point in data:
-            if 'features' in point:
-                cleaned_features = DataProcessor.validate_features(point['features'])
-                feature_rows.append(cleaned_features)
-            else:
-                # If no 'features' key, use the point itself (excluding metadata)
-                metadata_keys = {'timestamp', 'id', 'response', 'sampleId'}
-                features = {k: v for k, v in point.items() if k not in metadata_keys}
-                cleaned_features = DataProcessor.validate_features(features)
-                feature_rows.append(cleaned_features)
+        metadata_keys = {'timestamp', 'id', 'response', 'sampleId'}
+        feature_rows = [
+            point['features'] if 'features' in point else point
+            for point in data
+        ]
+        if feature_columns is None:
+            feature_columns = DataProcessor.get_feature_columns(feature_rows, exclude=metadata_keys)
+        
+        matrix = DataProcessor.build_feature_matrix(feature_rows, feature_columns)
+        # Non-finite readings are treated as missing, as validate_features does
+        matrix[~np.isfinite(matrix)] = 0.0
         
-        return pd.DataFrame(feature_rows)
+        return pd.DataFrame(matrix, columns=feature_columns, copy=False)
     
     @staticmethod
     def extract_targets(data: List[Dict[str, Any]]) -> np.ndarray:
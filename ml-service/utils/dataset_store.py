@@ -0,0 +1,284 @@
+"""
+On-disk dataset storage backed by memory-mapped numpy arrays
+"""
+
+import numpy as np
+from typing import List, Dict, Any, Iterable, Optional
+import hashlib
+import json
+import os
+import shutil
+import logging
+
+from utils.data_processor import DataProcessor
+
+logger = logging.getLogger(__name__)
+
+class DatasetStore:
+    """
+    Timestamp-sorted dataset kept as .npy files under a single directory
+
+    Features are stored as one float32 matrix so readers can memory-map it
+    instead of holding a private copy. The fingerprint changes whenever the
+    stored rows change, which lets derived artifacts detect that they are stale.
+    """
+
+    FILES = ('features', 'timestamps', 'ids', 'responses')
+
+    def __init__(self, root_dir: str):
+        """
+        Initialize the dataset store
+
+        Args:
+            root_dir: Directory holding the dataset files
+        """
+        self.root_dir = root_dir
+        self.metadata = None
+        self.load()
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether a dataset is stored"""
+        return self.metadata is not None
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        """Content hash of the stored dataset"""
+        return self.metadata['fingerprint'] if self.metadata else None
+
+    @property
+    def feature_columns(self) -> List[str]:
+        """Ordered feature names of the stored matrix"""
+        return self.metadata['feature_columns'] if self.metadata else []
+
+    @property
+    def n_rows(self) -> int:
+        """Number of stored rows"""
+        return self.metadata['n_rows'] if self.metadata else 0
+
+    def _path(self, name: str, root_dir: str = None) -> str:
+        return os.path.join(root_dir or self.root_dir, f"{name}.npy")
+
+    def load(self) -> bool:
+        """
+        Load dataset metadata from disk if present
+
+        Returns:
+            True if a dataset was found
+        """
+        metadata_path = os.path.join(self.root_dir, 'metadata.json')
+        if not os.path.exists(metadata_path):
+            self.metadata = None
+            return False
+
+        with open(metadata_path) as f:
+            self.metadata = json.load(f)
+        return True
+
+    def save(self, timestamps: List[str], ids: List[int], responses: List[int],
+             feature_rows: List[Dict[str, float]]) -> str:
+        """
+        Replace the stored dataset
+
+        Args:
+            timestamps: ISO timestamps of each row
+            ids: Record ids of each row
+            responses: Target values of each row
+            feature_rows: Feature dictionaries of each row
+
+        Returns:
+            Fingerprint of the stored dataset
+        """
+        import pandas as pd
+
+        feature_columns = DataProcessor.get_feature_columns(feature_rows)
+        features = DataProcessor.build_feature_matrix(feature_rows, feature_columns)
+        parsed = pd.to_datetime(pd.Series(timestamps)).values.astype('datetime64[ms]')
+        return self.save_arrays(features, feature_columns, parsed,
+                                np.asarray(ids, dtype=np.int64), np.asarray(responses, dtype=np.int8))
+
+    def save_arrays(self, features: np.ndarray, feature_columns: List[str], timestamps: np.ndarray,
+                    ids: np.ndarray, responses: np.ndarray) -> str:
+        """
+        Replace the stored dataset from arrays
+
+        Args:
+            features: Float32 feature matrix of shape (rows, features)
+            feature_columns: Ordered feature names of the matrix columns
+            timestamps: datetime64 timestamps of each row
+            ids: Record ids of each row
+            responses: Target values of each row
+
+        Returns:
+            Fingerprint of the stored dataset
+        """
+        timestamps = np.asarray(timestamps, dtype='datetime64[ms]')
+        order = np.argsort(timestamps, kind='stable')
+        if np.all(order[1:] > order[:-1]):
+            # Already sorted: skip the reordering copies
+            order = slice(None)
+
+        arrays = {
+            'features': np.ascontiguousarray(features[order], dtype=np.float32),
+            'timestamps': timestamps[order],
+            'ids': np.asarray(ids, dtype=np.int64)[order],
+            'responses': np.asarray(responses, dtype=np.int8)[order]
+        }
+
+        # Write into a sibling directory and swap it in, so readers never
+        # see a half-written dataset
+        staging_dir = self._staging_dir()
+        for name in self.FILES:
+            np.save(self._path(name, staging_dir), arrays[name])
+        return self._commit(staging_dir, arrays, feature_columns)
+
+    def save_chunks(self, chunks: Iterable[Dict[str, np.ndarray]], n_rows: int,
+                    feature_columns: List[str]) -> str:
+        """
+        Replace the stored dataset from chunks of timestamp-sorted rows
+
+        Each chunk is copied straight into the memory-mapped files, so
+        datasets larger than memory can be written. The stored dataset is
+        the same, fingerprint included, as save_arrays of the whole rows.
+
+        Args:
+            chunks: Dictionaries with features, timestamps, ids and
+                responses arrays, in timestamp order
+            n_rows: Total rows across the chunks
+            feature_columns: Ordered feature names of the matrix columns
+
+        Returns:
+            Fingerprint of the stored dataset
+
+        Raises:
+            ValueError: If the chunks are not timestamp-sorted or do not add up to n_rows
+        """
+        shapes = {
+            'features': ((n_rows, len(feature_columns)), np.float32),
+            'timestamps': ((n_rows,), 'datetime64[ms]'),
+            'ids': ((n_rows,), np.int64),
+            'responses': ((n_rows,), np.int8)
+        }
+        staging_dir = self._staging_dir()
+        arrays = {
+            name: np.lib.format.open_memmap(self._path(name, staging_dir), mode='w+', dtype=dtype, shape=shape)
+            for name, (shape, dtype) in shapes.items()
+        }
+
+        written = 0
+        try:
+            for chunk in chunks:
+                size = len(chunk['timestamps'])
+                if written + size > n_rows:
+                    raise ValueError(f"Chunks hold more than {n_rows} rows")
+                rows = slice(written, written + size)
+                for name in self.FILES:
+                    arrays[name][rows] = chunk[name]
+                timestamps = arrays['timestamps'][max(0, written - 1):written + size]
+                if np.any(timestamps[1:] < timestamps[:-1]):
+                    raise ValueError("Chunk timestamps must be sorted")
+                written += size
+            if written != n_rows:
+                raise ValueError(f"Chunks hold {written} rows, expected {n_rows}")
+            for array in arrays.values():
+                array.flush()
+        except Exception:
+            del arrays
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        return self._commit(staging_dir, arrays, feature_columns)
+
+    def _staging_dir(self) -> str:
+        staging_dir = f"{self.root_dir}.tmp"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+        return staging_dir
+
+    def _commit(self, staging_dir: str, arrays: Dict[str, np.ndarray], feature_columns: List[str]) -> str:
+        """Fingerprint the staged arrays, write metadata and swap the staging directory in"""
+        n_rows = len(arrays['timestamps'])
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps(feature_columns).encode())
+        for name in self.FILES:
+            # Blocks of rows keep memory-mapped arrays from being read in whole
+            array = arrays[name]
+            block_rows = max(1, (64 << 20) // max(1, array[:1].nbytes))
+            for start in range(0, len(array), block_rows):
+                digest.update(array[start:start + block_rows].tobytes())
+        fingerprint = digest.hexdigest()
+
+        metadata = {
+            'fingerprint': fingerprint,
+            'feature_columns': list(feature_columns),
+            'n_rows': int(n_rows),
+            'start': str(arrays['timestamps'][0]) if n_rows else None,
+            'end': str(arrays['timestamps'][-1]) if n_rows else None
+        }
+        with open(os.path.join(staging_dir, 'metadata.json'), 'w') as f:
+            json.dump(metadata, f)
+
+        shutil.rmtree(self.root_dir, ignore_errors=True)
+        os.replace(staging_dir, self.root_dir)
+        self.metadata = metadata
+
+        logger.info(f"Stored dataset with {metadata['n_rows']} rows, fingerprint {fingerprint}")
+        return fingerprint
+
+    @staticmethod
+    def _to_datetime64(value: Any) -> np.datetime64:
+        import pandas as pd
+
+        timestamp = pd.Timestamp(value)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_convert(None)
+        return np.datetime64(timestamp, 'ms')
+
+    def clear(self) -> None:
+        """Remove the stored dataset"""
+        shutil.rmtree(self.root_dir, ignore_errors=True)
+        self.metadata = None
+
+    def array_path(self, name: str) -> str:
+        """
+        Get the file path of one of the stored arrays
+
+        Args:
+            name: One of features, timestamps, ids or responses
+
+        Returns:
+            Path of the .npy file, for processes that memory-map it themselves
+        """
+        return self._path(name)
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Memory-map one of the stored arrays read-only
+
+        Args:
+            name: One of features, timestamps, ids or responses
+
+        Returns:
+            Read-only memory-mapped array
+        """
+        return np.load(self._path(name), mmap_mode='r')
+
+    def range_slice(self, start: Any, end: Any, end_inclusive: bool = True) -> slice:
+        """
+        Find the rows whose timestamps fall in a range
+
+        Args:
+            start: Range start (anything pandas can parse)
+            end: Range end (anything pandas can parse)
+            end_inclusive: Whether rows stamped exactly at end are included
+
+        Returns:
+            Slice over the timestamp-sorted rows
+        """
+        timestamps = self.array('timestamps')
+        start = self._to_datetime64(start)
+        end = self._to_datetime64(end)
+        lo = int(np.searchsorted(timestamps, start, side='left'))
+        hi = int(np.searchsorted(timestamps, end, side='right' if end_inclusive else 'left'))
+        return slice(lo, max(lo, hi))
@@ -0,0 +1,183 @@
+"""
+Streaming feature-distribution sketches for drift monitoring
+"""
+
+import numpy as np
+from typing import List, Dict, Any, Optional
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class FeatureDriftMonitor:
+    """
+    Fixed-memory per-feature histograms comparing scored traffic to the training window
+
+    Bin edges come from the training window quantiles, so each feature keeps
+    one reference histogram and one live histogram of ``n_bins`` counts.
+    Memory depends only on the feature and bin counts, never on how many rows
+    have been scored.
+    """
+
+    _CHUNK_ROWS = 4096
+
+    def __init__(self, feature_columns: List[str], n_bins: int = 10,
+                 sample_every: int = 32):
+        """
+        Initialize the drift monitor
+
+        Args:
+            feature_columns: Ordered feature names matching the scored matrices
+            n_bins: Number of histogram bins per feature
+            sample_every: Histogram one scored row in this many, bounding update cost
+        """
+        self.feature_columns = list(feature_columns)
+        self.n_bins = n_bins
+        self.sample_every = sample_every
+        self.edges = None
+        self.reference_counts = None
+        self.live_counts = np.zeros((len(self.feature_columns), n_bins), dtype=np.int64)
+        self.rows_scored = 0
+        self.rows_sampled = 0
+        self._sample_phase = 0
+        self._offsets = np.arange(len(self.feature_columns), dtype=np.intp) * n_bins
+        self._lock = threading.Lock()
+
+    def _bin_counts(self, X: np.ndarray) -> np.ndarray:
+        """
+        Histogram every column of X against the reference bin edges
+
+        Args:
+            X: Matrix of shape (rows, features)
+
+        Returns:
+            Array of shape (features, n_bins) with per-bin counts
+        """
+        n_features = len(self.feature_columns)
+        counts = np.zeros(n_features * self.n_bins, dtype=np.int64)
+        for start in range(0, len(X), self._CHUNK_ROWS):
+            chunk = X[start:start + self._CHUNK_ROWS]
+            # One comparison per inner edge keeps the work vectorized across all
+            # features without materializing a (rows, features, bins) array
+            bins = np.zeros(chunk.shape, dtype=np.uint8)
+            for edge in self.edges:
+                bins += chunk > edge
+            flat = bins.astype(np.intp)
+            flat += self._offsets
+            counts += np.bincount(flat.ravel(), minlength=n_features * self.n_bins)
+        return counts.reshape(n_features, self.n_bins)
+
+    def fit(self, X: np.ndarray) -> None:
+        """
+        Build the reference histograms from the training window
+
+        Args:
+            X: Training feature matrix of shape (rows, features)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        quantiles = np.linspace(0, 1, self.n_bins + 1)[1:-1]
+        # Shape (n_bins - 1, features): each inner edge is a contiguous row
+        self.edges = np.quantile(X, quantiles, axis=0).astype(np.float32)
+        self.reference_counts = self._bin_counts(X)
+        self.reset()
+
+        logger.info(f"Drift reference built from {X.shape[0]} rows and {X.shape[1]} features")
+
+    def update(self, X: np.ndarray) -> None:
+        """
+        Add a scored batch to the live histograms
+
+        Args:
+            X: Scored feature matrix of shape (rows, features)
+        """
+        if self.edges is None or len(X) == 0:
+            return
+
+        with self._lock:
+            # Systematic sample that carries its phase across calls, so
+            # single-row requests are sampled at the same rate as batches
+            phase = self._sample_phase
+            self._sample_phase = (phase - len(X)) % self.sample_every
+            self.rows_scored += len(X)
+
+        sample = X[phase::self.sample_every]
+        if len(sample) == 0:
+            return
+
+        counts = self._bin_counts(np.asarray(sample, dtype=np.float32))
+        with self._lock:
+            self.live_counts += counts
+            self.rows_sampled += len(sample)
+
+    def reset(self) -> None:
+        """Clear the live histograms"""
+        with self._lock:
+            self.live_counts[:] = 0
+            self.rows_scored = 0
+            self.rows_sampled = 0
+            self._sample_phase = 0
+
+    def compute_drift(self, limit: Optional[int] = None, psi_threshold: float = 0.2,
+                      min_samples: int = 0) -> Dict[str, Any]:
+        """
+        Compare live histograms with the training reference
+
+        PSI over a handful of rows is dominated by empty bins, so no feature
+        is flagged as drifted until min_samples rows have been histogrammed.
+
+        Args:
+            limit: Optional number of most-drifted features to return
+            psi_threshold: PSI above which a feature counts as drifted
+            min_samples: Histogrammed rows needed before features are flagged
+
+        Returns:
+            Dictionary with per-feature PSI and KS statistics and a summary
+        """
+        with self._lock:
+            live = self.live_counts.astype(np.float64)
+            rows_scored = self.rows_scored
+            rows_sampled = self.rows_sampled
+        sufficient = rows_sampled >= min_samples
+
+        if self.reference_counts is None or live.sum() == 0:
+            return {
+                'rows_scored': rows_scored,
+                'rows_sampled': rows_sampled,
+                'sufficient_samples': sufficient,
+                'features': [],
+                'summary': {'max_psi': 0.0, 'mean_psi': 0.0, 'max_ks': 0.0, 'drifted_features': 0}
+            }
+
+        eps = 1e-6
+        expected = self.reference_counts / self.reference_counts.sum(axis=1, keepdims=True)
+        actual = live / live.sum(axis=1, keepdims=True)
+        expected = np.clip(expected, eps, None)
+        actual = np.clip(actual, eps, None)
+
+        psi = ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+        # KS on the binned distributions: largest gap between the two CDFs
+        ks = np.abs(np.cumsum(actual, axis=1) - np.cumsum(expected, axis=1)).max(axis=1)
+
+        order = np.argsort(psi)[::-1]
+        if limit is not None:
+            order = order[:limit]
+
+        return {
+            'rows_scored': rows_scored,
+            'rows_sampled': rows_sampled,
+            'sufficient_samples': sufficient,
+            'features': [
+                {
+                    'feature': self.feature_columns[i],
+                    'psi': float(psi[i]),
+                    'ks': float(ks[i])
+                }
+                for i in order
+            ],
+            'summary': {
+                'max_psi': float(psi.max()),
+                'mean_psi': float(psi.mean()),
+                'max_ks': float(ks.max()),
+                'drifted_features': int((psi > psi_threshold).sum()) if sufficient else 0
+            }
+        }
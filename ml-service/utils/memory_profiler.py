@@ -0,0 +1,437 @@
+"""
+Per-request peak memory, allocation profiling and sizing of long-lived state
+"""
+
+import numpy as np
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+import asyncio
+import os
+import sys
+import threading
+import time
+import types
+import weakref
+import logging
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+current_request_memory: ContextVar[Optional['RequestMemory']] = ContextVar('current_request_memory', default=None)
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size since start or the last reset"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS to the current RSS; False where not permitted"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def memory_stage(stage: str) -> None:
+    """Record the current request's memory after a named stage, if it is tracked"""
+    record = current_request_memory.get()
+    if record is not None:
+        record.mark(stage)
+
+class RequestMemory:
+    """
+    Memory use of one request: RSS at start, peak RSS and per-stage marks
+
+    Peaks come from the tracker's sampler. A request that runs alone also
+    reads the kernel's exact peak, reset when it started. Requests that
+    overlap others are marked shared, since their peaks include the other
+    requests' memory.
+    """
+
+    def __init__(self, name: str, start_rss: int, exclusive: bool):
+        self.name = name
+        self.start_rss = start_rss
+        self.peak_rss = start_rss
+        self.exclusive = exclusive
+        self.shared = False
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def observe(self, rss: int) -> None:
+        """Raise the peak to an RSS sample"""
+        if rss > self.peak_rss:
+            self.peak_rss = rss
+
+    def mark(self, stage: str) -> None:
+        """Record RSS and peak so far after a stage"""
+        rss = rss_bytes()
+        if rss is None:
+            return
+        with self._lock:
+            self.observe(rss)
+            self.stages.append((stage, rss - self.start_rss, self.peak_rss - self.start_rss))
+
+    @property
+    def peak_delta(self) -> int:
+        """Peak RSS above the RSS at start"""
+        return self.peak_rss - self.start_rss
+
+    def summary(self) -> Dict[str, Any]:
+        """Peak and stage figures in MB"""
+        return {
+            'request': self.name,
+            'start_rss_mb': self.start_rss / MB,
+            'peak_rss_mb': self.peak_rss / MB,
+            'peak_delta_mb': self.peak_delta / MB,
+            'shared': self.shared,
+            'stages': [{'stage': stage, 'rss_delta_mb': rss / MB, 'peak_delta_mb': peak / MB}
+                       for stage, rss, peak in self.stages]
+        }
+
+class MemoryTracker:
+    """
+    Tracks the peak RSS of every in-flight request
+
+    A sampler thread reads /proc/self/statm every sample_interval while
+    requests are in flight and raises each one's peak, and sleeps otherwise.
+    """
+
+    def __init__(self, sample_interval: float = 0.005, recent_requests: int = 50):
+        """
+        Initialize the tracker
+
+        Args:
+            sample_interval: Seconds between RSS samples while requests run
+            recent_requests: Finished request summaries kept
+        """
+        self.sample_interval = sample_interval
+        self.recent = deque(maxlen=recent_requests)
+        self.enabled = rss_bytes() is not None
+        self.requests_tracked = 0
+        self.max_peak_delta = 0
+        self.max_peak_request = None
+        self._in_flight = set()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self, name: str) -> Optional[RequestMemory]:
+        """
+        Start tracking a request
+
+        Args:
+            name: Label of the request, e.g. method and path
+
+        Returns:
+            The request's record, or None where RSS cannot be read
+        """
+        if not self.enabled:
+            return None
+        with self._condition:
+            exclusive = not self._in_flight and reset_peak_rss()
+            record = RequestMemory(name, rss_bytes(), exclusive)
+            for other in self._in_flight:
+                other.shared = True
+            record.shared = bool(self._in_flight)
+            self._in_flight.add(record)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name='memory-sampler', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return record
+
+    def finish(self, record: Optional[RequestMemory]) -> None:
+        """Stop tracking a request and take its final peak"""
+        if record is None:
+            return
+        with self._condition:
+            self._in_flight.discard(record)
+            record.observe(rss_bytes() or 0)
+            if record.exclusive and not record.shared:
+                record.observe(peak_rss_bytes() or 0)
+            self.requests_tracked += 1
+            self.recent.append(record)
+            if record.peak_delta > self.max_peak_delta:
+                self.max_peak_delta = record.peak_delta
+                self.max_peak_request = record.name
+
+    def _sample(self) -> None:
+        while True:
+            with self._condition:
+                while not self._in_flight:
+                    self._condition.wait()
+                records = list(self._in_flight)
+            rss = rss_bytes()
+            if rss is not None:
+                for record in records:
+                    record.observe(rss)
+            time.sleep(self.sample_interval)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get process RSS and tracked request peaks"""
+        rss, peak = rss_bytes(), peak_rss_bytes()
+        return {
+            'enabled': self.enabled,
+            'rss_mb': rss / MB if rss is not None else None,
+            'peak_rss_mb': peak / MB if peak is not None else None,
+            'in_flight': len(self._in_flight),
+            'requests_tracked': self.requests_tracked,
+            'max_peak_delta_mb': self.max_peak_delta / MB,
+            'max_peak_request': self.max_peak_request
+        }
+
+class AllocationProfiler:
+    """
+    tracemalloc snapshot diffs around the next N requests
+
+    Arming starts tracemalloc if it is not running. Each profiled request
+    is bracketed by two snapshots, and its report lists the source lines
+    whose allocations grew the most, plus tracemalloc's peak during the
+    request. Tracing stops once every armed request is done, if the
+    profiler started it. Tracing slows allocation-heavy code, and snapshots
+    of overlapping requests include each other's allocations.
+    """
+
+    def __init__(self, max_reports: int = 100):
+        """
+        Initialize the profiler
+
+        Args:
+            max_reports: Reports kept, oldest dropped first
+        """
+        self.remaining = 0
+        self.active = 0
+        self.top_k = 20
+        self.reports = deque(maxlen=max_reports)
+        self._started_tracing = False
+        self._lock = threading.Lock()
+
+    def arm(self, n_requests: int, top_k: int = 20, frames: int = 1) -> None:
+        """
+        Profile the next n_requests requests
+
+        Args:
+            n_requests: Requests to profile
+            top_k: Allocation sites reported per request
+            frames: Stack frames kept per allocation
+        """
+        import tracemalloc
+
+        with self._lock:
+            self.remaining = n_requests
+            self.top_k = top_k
+            self.reports.clear()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self._started_tracing = True
+
+    @property
+    def armed(self) -> bool:
+        """Whether requests are waiting to be profiled; a cheap check before claiming a slot"""
+        return self.remaining > 0
+
+    def before(self, name: str) -> Optional[Dict[str, Any]]:
+        """Claim a profiling slot for a request and snapshot; None if not armed"""
+        import tracemalloc
+
+        with self._lock:
+            if self.remaining <= 0 or not tracemalloc.is_tracing():
+                return None
+            self.remaining -= 1
+            self.active += 1
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        return {'name': name, 'snapshot': tracemalloc.take_snapshot(), 'traced': current,
+                'started': time.perf_counter()}
+
+    def after(self, token: Optional[Dict[str, Any]], status_code: Optional[int] = None) -> None:
+        """Diff a profiled request's snapshots and record the report"""
+        import tracemalloc
+
+        if token is None:
+            return
+        try:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            ignored = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            diff = snapshot.filter_traces(ignored).compare_to(token['snapshot'].filter_traces(ignored), 'lineno')
+            diff.sort(key=lambda stat: stat.size_diff, reverse=True)
+            self.reports.append({
+                'request': token['name'],
+                'status_code': status_code,
+                'seconds': time.perf_counter() - token['started'],
+                'traced_delta_mb': (current - token['traced']) / MB,
+                'traced_peak_delta_mb': (peak - token['traced']) / MB,
+                'top_allocations': [
+                    {
+                        'site': str(stat.traceback),
+                        'size_diff_mb': stat.size_diff / MB,
+                        'count_diff': stat.count_diff,
+                        'size_mb': stat.size / MB
+                    }
+                    for stat in diff[:self.top_k] if stat.size_diff > 0
+                ]
+            })
+        finally:
+            with self._lock:
+                self.active -= 1
+                if self.remaining <= 0 and self.active == 0 and self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the armed state and the reports so far"""
+        import tracemalloc
+
+        return {
+            'tracing': tracemalloc.is_tracing(),
+            'remaining_requests': self.remaining,
+            'active_requests': self.active,
+            'reports': list(self.reports)
+        }
+
+# Native booster memory is invisible to sys.getsizeof; its serialized size
+# is a close stand-in, cached per booster because serializing is not free
+_booster_sizes = weakref.WeakKeyDictionary()
+
+_OPAQUE_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, types.CodeType, threading.Thread)
+
+def estimate_size(obj: Any, sample_items: int = 64, max_depth: int = 12) -> int:
+    """
+    Approximate bytes held by an object graph
+
+    NumPy arrays count their own data; memory-mapped arrays count nothing,
+    since their pages belong to the page cache. XGBoost boosters count
+    their serialized size. Containers larger than sample_items are sized
+    from an even sample of their items, scaled to their length. Objects
+    reached twice count once.
+
+    Args:
+        obj: Root of the object graph
+        sample_items: Items sized per container before scaling
+        max_depth: Nesting depth followed
+
+    Returns:
+        Approximate size in bytes
+    """
+    seen = set()
+
+    def sample(items: List[Any]) -> List[Any]:
+        if len(items) <= sample_items:
+            return items
+        return [items[i] for i in np.linspace(0, len(items) - 1, sample_items).astype(int)]
+
+    def size(o: Any, depth: int) -> int:
+        if id(o) in seen or depth > max_depth:
+            return 0
+        seen.add(id(o))
+
+        if isinstance(o, np.memmap):
+            return 0
+        if isinstance(o, np.ndarray):
+            return sys.getsizeof(o) + (size(o.base, depth + 1) if isinstance(o.base, np.ndarray) else 0)
+        if isinstance(o, (str, bytes, bytearray, int, float, bool, type(None))) or isinstance(o, _OPAQUE_TYPES):
+            return sys.getsizeof(o)
+        if type(o).__name__ == 'Booster' and hasattr(o, 'save_raw'):
+            if o not in _booster_sizes:
+                _booster_sizes[o] = len(o.save_raw('ubj'))
+            return _booster_sizes[o]
+
+        total = sys.getsizeof(o)
+        if isinstance(o, dict):
+            items = list(o.items())
+            picked = sample(items)
+            if picked:
+                total += sum(size(k, depth + 1) + size(v, depth + 1) for k, v in picked) * len(items) // len(picked)
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            items = list(o)
+            picked = sample(items)
+            if picked:
+                total += sum(size(item, depth + 1) for item in picked) * len(items) // len(picked)
+        else:
+            if hasattr(o, '__dict__'):
+                total += size(vars(o), depth + 1)
+            for slot in getattr(type(o), '__slots__', ()):
+                if isinstance(slot, str) and hasattr(o, slot):
+                    total += size(getattr(o, slot), depth + 1)
+        return total
+
+    return size(obj, 0)
+
+class MemoryTrackingMiddleware:
+    """
+    ASGI middleware reporting each HTTP request's peak memory
+
+    Adds an X-Peak-Memory-MB header, the peak RSS above the RSS when the
+    request arrived, and logs requests whose peak reaches log_min_mb with
+    the stages the handler marked through memory_stage. Requests claimed
+    by an armed AllocationProfiler are also bracketed by its snapshots,
+    taken and compared on a worker thread so the event loop keeps serving
+    other requests; /admin paths are never profiled. WebSocket connections
+    pass through.
+    """
+
+    def __init__(self, app, tracker: MemoryTracker, profiler: Optional[AllocationProfiler] = None,
+                 log_min_mb: float = 10.0):
+        self.app = app
+        self.tracker = tracker
+        self.profiler = profiler
+        self.log_min_mb = log_min_mb
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        name = f"{scope['method']} {scope['path']}"
+        token = None
+        if self.profiler is not None and self.profiler.armed and not scope['path'].startswith('/admin'):
+            # Snapshots walk every traced block, which takes a while on a large heap
+            token = await asyncio.to_thread(self.profiler.before, name)
+        record = self.tracker.start(name)
+        status_code = None
+
+        async def tracked_send(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start' and record is not None:
+                status_code = message['status']
+                record.observe(rss_bytes() or 0)
+                headers = list(message.get('headers', []))
+                headers.append((b'x-peak-memory-mb', f"{record.peak_delta / MB:.1f}".encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        context_token = current_request_memory.set(record)
+        try:
+            await self.app(scope, receive, tracked_send)
+        finally:
+            current_request_memory.reset(context_token)
+            self.tracker.finish(record)
+            if token is not None:
+                await asyncio.to_thread(self.profiler.after, token, status_code)
+            if record is not None and record.peak_delta >= self.log_min_mb * MB:
+                stages = ', '.join(f"{stage} {rss / MB:+.1f}" for stage, rss, _ in record.stages)
+                logger.info(f"{name} peak memory {record.peak_delta / MB:+.1f} MB over "
+                            f"{record.start_rss / MB:.0f} MB RSS{' (shared)' if record.shared else ''}"
+                            f"{'; stages MB: ' + stages if stages else ''}")
@@ -0,0 +1,214 @@
+"""
+Precomputed prediction index for replaying simulations without rescoring
+"""
+
+import numpy as np
+from contextlib import nullcontext
+from typing import List, Dict, Any, Optional
+import copy
+import glob
+import os
+import threading
+import logging
+
+from utils.dataset_store import DatasetStore
+from utils.resource_manager import ResourceManager
+from utils.station_features import StationFeatureCache
+
+logger = logging.getLogger(__name__)
+
+class PredictionIndex:
+    """
+    Pass probabilities for every stored dataset row, keyed by model version
+
+    The probabilities are written to a memory-mapped .npy file aligned
+    row-for-row with the timestamp-sorted DatasetStore, so any simulation range
+    becomes a slice lookup. The index is tied to one (model version, dataset
+    fingerprint) pair and is never served for any other pair.
+    """
+
+    def __init__(self, index_dir: str, batch_size: int = 10000,
+                 resource_manager: Optional[ResourceManager] = None,
+                 feature_cache: Optional[StationFeatureCache] = None):
+        """
+        Initialize the prediction index
+
+        Args:
+            index_dir: Directory holding index files
+            batch_size: Rows scored per predict call while building
+            resource_manager: Optional manager that limits build threads
+            feature_cache: Optional station aggregate cache that compact
+                models read instead of aggregating every stored row again
+        """
+        self.index_dir = index_dir
+        self.batch_size = batch_size
+        self.resource_manager = resource_manager
+        self.feature_cache = feature_cache
+        self.model_version = None
+        self.fingerprint = None
+        self.status = 'empty'
+        self.probabilities = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _path(self, model_version: str, fingerprint: str, generation: int) -> str:
+        # Per build, so a superseded build only ever touches its own files
+        return os.path.join(self.index_dir, f"predictions_{model_version}_{fingerprint}_{generation}.npy")
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def invalidate(self) -> None:
+        """Drop the current index and any build in progress"""
+        with self._lock:
+            self._generation += 1
+            self.model_version = None
+            self.fingerprint = None
+            self.status = 'empty'
+            self.probabilities = None
+
+        for path in glob.glob(os.path.join(self.index_dir, 'predictions_*.npy*')):
+            self._discard(path)
+
+    def is_ready(self, model_version: Optional[str], fingerprint: Optional[str]) -> bool:
+        """
+        Whether the index can serve lookups for a model version and dataset
+
+        Args:
+            model_version: Active model version
+            fingerprint: Fingerprint of the stored dataset
+
+        Returns:
+            True if the index matches both and is fully built
+        """
+        with self._lock:
+            return (self.status == 'ready'
+                    and model_version is not None
+                    and self.model_version == model_version
+                    and self.fingerprint == fingerprint)
+
+    def build_async(self, model: Any, model_version: str, feature_columns: List[str],
+                    store: DatasetStore) -> None:
+        """
+        Invalidate the index and rebuild it on a background thread
+
+        Args:
+            model: Trained classifier exposing predict_proba
+            model_version: Version of the model being indexed
+            feature_columns: Feature order the model was trained on
+            store: Dataset store to score
+        """
+        self.invalidate()
+        if not store.is_loaded or store.n_rows == 0:
+            return
+
+        with self._lock:
+            generation = self._generation
+            self.model_version = model_version
+            self.fingerprint = store.fingerprint
+            self.status = 'building'
+
+        thread = threading.Thread(
+            target=self._build,
+            args=(generation, model, model_version, feature_columns, store),
+            daemon=True
+        )
+        thread.start()
+
+    def _build(self, generation: int, model: Any, model_version: str,
+               feature_columns: List[str], store: DatasetStore) -> None:
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            path = self._path(model_version, store.fingerprint, generation)
+            tmp_path = f"{path}.tmp"
+
+            features = store.array('features')
+            # Map the stored column order onto the model's, treating columns
+            # the dataset lacks as zero like the request paths do
+            stored_positions = {name: i for i, name in enumerate(store.feature_columns)}
+            aligned = store.feature_columns == list(feature_columns)
+            column_map = [(i, stored_positions[name]) for i, name in enumerate(feature_columns)
+                          if name in stored_positions]
+
+            output = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                               shape=(len(features),))
+            # Compact models score station aggregates, shared by every version
+            compact_features = getattr(model, 'features', None)
+            aggregates = None
+            if compact_features is not None and self.feature_cache is not None:
+                aggregates = self.feature_cache.get(store, compact_features.station_map)
+            allocation = (self.resource_manager.allocate('batch_scoring')
+                          if self.resource_manager else nullcontext(None))
+            with allocation as n_threads:
+                if n_threads is not None:
+                    # Private copy so the served model keeps its inference threads
+                    model = copy.deepcopy(model)
+                    model.set_params(n_jobs=n_threads)
+                for start in range(0, len(features), self.batch_size):
+                    with self._lock:
+                        if generation != self._generation:
+                            del output
+                            self._discard(tmp_path)
+                            return
+                    batch = features[start:start + self.batch_size]
+                    if not aligned:
+                        reordered = np.zeros((len(batch), len(feature_columns)), dtype=np.float32)
+                        for model_idx, stored_idx in column_map:
+                            reordered[:, model_idx] = batch[:, stored_idx]
+                        batch = reordered
+                    if aggregates is not None:
+                        probabilities = model.predict_proba(batch, aggregates[start:start + len(batch)])
+                    else:
+                        probabilities = model.predict_proba(batch)
+                    output[start:start + len(batch)] = probabilities[:, 1]
+            output.flush()
+            del output
+            os.replace(tmp_path, path)
+
+            with self._lock:
+                if generation != self._generation:
+                    self._discard(path)
+                    return
+                self.probabilities = np.load(path, mmap_mode='r')
+                self.status = 'ready'
+
+            logger.info(f"Prediction index built for model {model_version} over {len(features)} rows")
+
+        except Exception as e:
+            with self._lock:
+                if generation == self._generation:
+                    logger.error(f"Error building prediction index: {str(e)}")
+                    self.status = 'failed'
+
+    def lookup(self, rows: slice) -> np.ndarray:
+        """
+        Get pass probabilities for a range of stored rows
+
+        Args:
+            rows: Slice over the timestamp-sorted dataset
+
+        Returns:
+            Memory-mapped view of the probabilities
+        """
+        with self._lock:
+            if self.status != 'ready':
+                raise ValueError("Prediction index is not ready")
+            return self.probabilities[rows]
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the index state
+
+        Returns:
+            Dictionary describing the index
+        """
+        with self._lock:
+            return {
+                'status': self.status,
+                'model_version': self.model_version,
+                'dataset_fingerprint': self.fingerprint
+            }
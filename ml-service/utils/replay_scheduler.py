@@ -0,0 +1,367 @@
+"""
+Accelerated-time replay of simulation sessions on one shared timer loop
+"""
+
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class ReplaySession:
+    """
+    One simulation with its own records, result buffer and statistics
+
+    Records carry either a feature matrix, scored as they come due, or pass
+    probabilities that are already known, e.g. from the prediction index.
+    """
+
+    def __init__(self, timestamps: List[str], sample_ids: List[int],
+                 replay_times: Optional[np.ndarray] = None, speed: float = 1.0,
+                 features: Optional[np.ndarray] = None,
+                 pass_probabilities: Optional[np.ndarray] = None,
+                 scorer: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                 model_version: Optional[str] = None, threshold: float = 0.5):
+        """
+        Initialize the session
+
+        Args:
+            timestamps: Record timestamps as returned in results
+            sample_ids: Record sample ids
+            replay_times: Record times as datetime64, sorted ascending; None
+                for a session that is never replayed
+            speed: Replay speed; 60 replays one recorded minute per second
+            features: Feature matrix to score, one row per record
+            pass_probabilities: Precomputed pass probabilities, one per record
+            scorer: Function returning pass probabilities for feature rows
+            model_version: Version of the model behind the scorer
+            threshold: Pass probability above which a record is predicted Pass
+        """
+        if (features is None) == (pass_probabilities is None):
+            raise ValueError("A session needs either features or pass probabilities")
+
+        self.session_id = uuid.uuid4().hex
+        self.timestamps = timestamps
+        self.sample_ids = sample_ids
+        self.speed = speed
+        self.features = features
+        self.pass_probabilities = pass_probabilities
+        self.scorer = scorer
+        self.model_version = model_version
+        self.threshold = threshold
+        self.created_at = datetime.utcnow().isoformat()
+
+        # Seconds after the first record at which each record is due
+        if replay_times is None or len(replay_times) == 0:
+            self.offsets = np.zeros(len(sample_ids))
+        else:
+            replay_times = np.asarray(replay_times, dtype='datetime64[ms]')
+            self.offsets = (replay_times - replay_times[0]).astype(np.float64) / 1000
+
+        self.status = 'pending'
+        self.started_at = None
+        self.cursor = 0
+        self.results = []
+        self.pass_count = 0
+        self.fail_count = 0
+        self.total_confidence = 0.0
+
+    @property
+    def total_records(self) -> int:
+        """Number of records in the session"""
+        return len(self.sample_ids)
+
+    def due_time(self, index: int) -> float:
+        """Event loop time at which record index is due"""
+        return self.started_at + self.offsets[index] / self.speed
+
+    def due_until(self, now: float) -> int:
+        """Index one past the last record due at event loop time now"""
+        return int(np.searchsorted(self.offsets, (now - self.started_at) * self.speed, side='right'))
+
+    def record(self, pass_probabilities: np.ndarray, formatter: Callable[[str, int, float, float], Any]) -> None:
+        """
+        Append results for the next records and update the statistics
+
+        Args:
+            pass_probabilities: Pass probabilities of the records at the cursor
+            formatter: Builds one result from timestamp, sample id, pass probability
+                and the session's threshold
+        """
+        start = self.cursor
+        for offset, pass_probability in enumerate(pass_probabilities):
+            pass_probability = float(pass_probability)
+            if pass_probability > self.threshold:
+                self.pass_count += 1
+                self.total_confidence += pass_probability
+            else:
+                self.fail_count += 1
+                self.total_confidence += 1 - pass_probability
+            self.results.append(formatter(self.timestamps[start + offset], self.sample_ids[start + offset],
+                                          pass_probability, self.threshold))
+        self.cursor += len(pass_probabilities)
+        if self.cursor >= self.total_records:
+            self.status = 'completed'
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the session's prediction statistics"""
+        processed = len(self.results)
+        return {
+            "totalPredictions": processed,
+            "passCount": self.pass_count,
+            "failCount": self.fail_count,
+            "averageConfidence": self.total_confidence / processed if processed else 0.0
+        }
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Get the session's state and statistics"""
+        return {
+            "sessionId": self.session_id,
+            "status": self.status,
+            "speed": self.speed,
+            "modelVersion": self.model_version,
+            "createdAt": self.created_at,
+            "totalRecords": self.total_records,
+            "processedRecords": self.cursor,
+            "stats": self.get_stats()
+        }
+
+class ReplayScheduler:
+    """
+    Replays sessions at their recorded timestamps scaled by each session's speed
+
+    All sessions share one timer loop driven by a heap of due times. Each
+    wake-up collects the records due within the next tick across every
+    session and scores them with one inference call per model, run off the
+    event loop, so hundreds of concurrent sessions cost one task and a few
+    batched predictions per tick rather than a task or a call per row.
+    """
+
+    def __init__(self, formatter: Callable[[str, int, float, float], Any], max_sessions: int = 500,
+                 max_records: int = 500000, max_batch_rows: int = 4096, tick_ms: float = 10,
+                 recorder: Optional[Callable[[ReplaySession, int, np.ndarray], None]] = None):
+        """
+        Initialize the scheduler
+
+        Args:
+            formatter: Builds one result from timestamp, sample id, pass probability
+                and the session's threshold
+            max_sessions: Sessions kept at once; completed ones are evicted first
+            max_records: Records kept at once across sessions, with their
+                results; completed sessions are evicted first
+            max_batch_rows: Upper bound on rows one session contributes to a tick
+            tick_ms: Records due this close together are replayed in one batch,
+                at most this much early
+            recorder: Called with the session, the index of the first record and
+                the pass probabilities of every batch replayed
+        """
+        self.formatter = formatter
+        self.recorder = recorder
+        self.max_sessions = max_sessions
+        self.max_records = max_records
+        self.max_batch_rows = max_batch_rows
+        self.tick = tick_ms / 1000
+
+        self._sessions = OrderedDict()
+        self._retained_records = 0
+        self._heap = []
+        self._tie_breaker = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+        self.ticks = 0
+        self.inference_calls = 0
+        self.rows_replayed = 0
+        self.max_lag = 0.0
+
+    def _make_room(self, n_records: int) -> None:
+        running = [session for session in self._sessions.values() if session.status == 'running']
+        running_records = sum(session.total_records for session in running)
+        # Refuse before evicting anything if running sessions alone leave no room
+        if len(running) >= self.max_sessions or running_records + n_records > self.max_records:
+            raise OverflowError(f"Running simulation sessions hold {len(running)} sessions and "
+                                f"{running_records} records; limits are {self.max_sessions} sessions "
+                                f"and {self.max_records} records")
+        while (len(self._sessions) >= self.max_sessions
+               or self._retained_records + n_records > self.max_records):
+            finished = next(session_id for session_id, session in self._sessions.items()
+                            if session.status != 'running')
+            self._retained_records -= self._sessions.pop(finished).total_records
+
+    def register(self, session: ReplaySession) -> None:
+        """
+        Keep a session that was completed outside the scheduler
+
+        Args:
+            session: Session to keep
+
+        Raises:
+            OverflowError: If the session or record limit is reached by running sessions
+        """
+        self._make_room(session.total_records)
+        self._sessions[session.session_id] = session
+        self._retained_records += session.total_records
+
+    def start(self, session: ReplaySession) -> None:
+        """
+        Start replaying a session
+
+        Args:
+            session: Session to replay
+
+        Raises:
+            OverflowError: If the session or record limit is reached by running sessions
+        """
+        self.register(session)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._heap = []
+            self._task = loop.create_task(self._run())
+            # Sessions left from a stopped loop resume on this one
+            for pending in self._sessions.values():
+                if pending.status == 'running':
+                    self._schedule(pending, pending.due_time(pending.cursor))
+
+        if session.total_records == 0:
+            session.status = 'completed'
+            return
+
+        session.status = 'running'
+        session.started_at = loop.time()
+        self._schedule(session, session.started_at)
+        logger.info(f"Started simulation session {session.session_id} with {session.total_records} "
+                    f"records at speed {session.speed}")
+
+    def _schedule(self, session: ReplaySession, due: float) -> None:
+        heapq.heappush(self._heap, (due, next(self._tie_breaker), session))
+        self._wakeup.set()
+
+    def get(self, session_id: str) -> Optional[ReplaySession]:
+        """Get a session by id"""
+        return self._sessions.get(session_id)
+
+    def list_sessions(self) -> List[ReplaySession]:
+        """Get all sessions, oldest first"""
+        return list(self._sessions.values())
+
+    def cancel(self, session_id: str) -> bool:
+        """
+        Stop a session and drop it with its results
+
+        Args:
+            session_id: Session to drop
+
+        Returns:
+            True if the session existed
+        """
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._retained_records -= session.total_records
+        if session.status == 'running':
+            session.status = 'cancelled'
+        return True
+
+    def clear(self) -> None:
+        """Stop and drop every session"""
+        for session_id in list(self._sessions):
+            self.cancel(session_id)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - loop.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = loop.time()
+            horizon = now + self.tick
+            due_sessions = []
+            while self._heap and self._heap[0][0] <= horizon:
+                due, _, session = heapq.heappop(self._heap)
+                if session.status == 'running':
+                    self.max_lag = max(self.max_lag, now - due)
+                    due_sessions.append(session)
+
+            try:
+                await self._replay_due(due_sessions, horizon)
+            except Exception as e:
+                logger.error(f"Error replaying simulation sessions: {str(e)}")
+                for session in due_sessions:
+                    session.status = 'failed'
+                continue
+
+            for session in due_sessions:
+                if session.status == 'running':
+                    self._schedule(session, session.due_time(session.cursor))
+
+    async def _replay_due(self, due_sessions: List[ReplaySession], horizon: float) -> None:
+        self.ticks += 1
+        scoring_groups = {}
+        for session in due_sessions:
+            end = min(session.due_until(horizon), session.cursor + self.max_batch_rows)
+            end = max(end, session.cursor + 1)
+            if session.pass_probabilities is not None:
+                self.rows_replayed += end - session.cursor
+                self._record(session, session.pass_probabilities[session.cursor:end])
+            else:
+                scoring_groups.setdefault(id(session.scorer), []).append((session, end))
+
+        for group in scoring_groups.values():
+            scorer = group[0][0].scorer
+            X = np.concatenate([session.features[session.cursor:end] for session, end in group])
+            pass_probabilities = await asyncio.to_thread(scorer, X)
+            self.inference_calls += 1
+
+            start = 0
+            for session, end in group:
+                n_rows = end - session.cursor
+                # A session cancelled while scoring ran keeps no more results
+                if session.status == 'running':
+                    self._record(session, pass_probabilities[start:start + n_rows])
+                    self.rows_replayed += n_rows
+                start += n_rows
+
+    def _record(self, session: ReplaySession, pass_probabilities: np.ndarray) -> None:
+        start = session.cursor
+        session.record(pass_probabilities, self.formatter)
+        if self.recorder is not None:
+            try:
+                self.recorder(session, start, pass_probabilities)
+            except Exception as e:
+                logger.error(f"Error recording session {session.session_id}: {str(e)}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get scheduler activity
+
+        Returns:
+            Dictionary with session counts and batching figures
+        """
+        statuses = [session.status for session in self._sessions.values()]
+        return {
+            'sessions': len(statuses),
+            'running_sessions': statuses.count('running'),
+            'retained_records': self._retained_records,
+            'ticks': self.ticks,
+            'inference_calls': self.inference_calls,
+            'rows_replayed': self.rows_replayed,
+            'max_lag_ms': self.max_lag * 1000
+        }
@@ -0,0 +1,179 @@
+"""
+CPU core allocation between inference and background jobs
+"""
+
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+import itertools
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+def detect_physical_cores() -> int:
+    """
+    Count the physical cores this process may run on
+
+    Hyper-threads are collapsed using /proc/cpuinfo where available, and the
+    result never exceeds the CPUs in the process affinity mask.
+
+    Returns:
+        Number of usable physical cores
+    """
+    try:
+        usable = len(os.sched_getaffinity(0))
+    except AttributeError:
+        usable = os.cpu_count() or 1
+
+    try:
+        cores = set()
+        physical_id = None
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                key = key.strip()
+                if key == 'physical id':
+                    physical_id = value.strip()
+                elif key == 'core id':
+                    cores.add((physical_id, value.strip()))
+        if cores:
+            return max(1, min(len(cores), usable))
+    except OSError:
+        pass
+
+    return max(1, usable)
+
+class ResourceManager:
+    """
+    Splits physical cores into a reserved inference share and a background pool
+
+    Inference always runs with the reserved share, and at most
+    inference_threads scoring calls run at once; further calls wait in line.
+    Training, tuning and batch scoring jobs borrow threads from the
+    background pool: a job gets as many threads as it asks for if they are
+    free, fewer if only some are free, and waits in line if none are. With
+    two or more cores the threads in use therefore never exceed the physical
+    cores. A single core cannot be split: inference and one background job
+    share it, so background work there slows inference rather than waiting
+    for it.
+    """
+
+    def __init__(self, total_cores: int = 0, inference_share: float = 0.25,
+                 max_job_threads: int = 0):
+        """
+        Initialize the resource manager
+
+        Args:
+            total_cores: Cores to manage; 0 detects physical cores
+            inference_share: Fraction of cores reserved for inference
+            max_job_threads: Upper bound on threads for one background job; 0 for no bound
+        """
+        self.total_cores = total_cores or detect_physical_cores()
+        self.inference_threads = max(1, int(round(self.total_cores * inference_share)))
+        if self.total_cores > 1:
+            self.inference_threads = min(self.inference_threads, self.total_cores - 1)
+        # With a single core there is nothing to split; both sides share it
+        self.background_threads = max(1, self.total_cores - self.inference_threads)
+        self.max_job_threads = max_job_threads or self.background_threads
+
+        self._inference_slots = threading.Semaphore(self.inference_threads)
+        self._inference_running = 0
+        self._inference_waiting = 0
+        self._allocations = {}
+        self._waiting = 0
+        self._job_ids = itertools.count(1)
+        self._condition = threading.Condition()
+
+        logger.info(f"Managing {self.total_cores} cores: {self.inference_threads} reserved for inference, "
+                    f"{self.background_threads} for background jobs"
+                    + (" (sharing the single core)" if self.total_cores == 1 else ""))
+
+    @property
+    def free_threads(self) -> int:
+        """Background threads not currently allocated"""
+        return self.background_threads - sum(threads for _, threads in self._allocations.values())
+
+    @contextmanager
+    def inference(self) -> Iterator[None]:
+        """
+        Hold one of the inference slots for the duration of a scoring call
+
+        Blocks while inference_threads calls are running, so call it from a
+        worker thread, never from the event loop.
+        """
+        with self._condition:
+            self._inference_waiting += 1
+        try:
+            self._inference_slots.acquire()
+        finally:
+            with self._condition:
+                self._inference_waiting -= 1
+                self._inference_running += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._inference_running -= 1
+            self._inference_slots.release()
+
+    @contextmanager
+    def allocate(self, kind: str, requested: Optional[int] = None,
+                 timeout: Optional[float] = None) -> Iterator[int]:
+        """
+        Borrow threads from the background pool for the duration of a job
+
+        Args:
+            kind: Job type reported in the allocation, e.g. training or batch_scoring
+            requested: Threads wanted; defaults to the per-job maximum
+            timeout: Seconds to wait for a free thread; None waits indefinitely
+
+        Yields:
+            Number of threads granted, at least 1
+
+        Raises:
+            TimeoutError: If no thread became free within timeout
+        """
+        requested = min(requested or self.max_job_threads, self.max_job_threads)
+
+        with self._condition:
+            self._waiting += 1
+            try:
+                if not self._condition.wait_for(lambda: self.free_threads > 0, timeout=timeout):
+                    raise TimeoutError(f"No CPU threads became free for {kind} job")
+            finally:
+                self._waiting -= 1
+            granted = max(1, min(requested, self.free_threads))
+            job_id = next(self._job_ids)
+            self._allocations[job_id] = (kind, granted)
+
+        logger.info(f"Allocated {granted} threads to {kind} job {job_id}")
+        try:
+            yield granted
+        finally:
+            with self._condition:
+                del self._allocations[job_id]
+                self._condition.notify_all()
+
+    def get_allocation(self) -> Dict[str, Any]:
+        """
+        Get the current core allocation
+
+        Returns:
+            Dictionary describing reserved, allocated and queued threads
+        """
+        with self._condition:
+            jobs = [
+                {'job_id': job_id, 'kind': kind, 'threads': threads}
+                for job_id, (kind, threads) in self._allocations.items()
+            ]
+            return {
+                'total_cores': self.total_cores,
+                'inference_threads': self.inference_threads,
+                'inference_calls_running': self._inference_running,
+                'queued_inference_calls': self._inference_waiting,
+                'background_threads': self.background_threads,
+                'background_threads_in_use': self.background_threads - self.free_threads,
+                'queued_jobs': self._waiting,
+                'jobs': jobs
+            }
@@ -0,0 +1,431 @@
+"""
+Append-only columnar log of scored rows and training runs
+"""
+
+import numpy as np
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import itertools
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+ONE_DAY = np.timedelta64(1, 'D')
+
+class ResultLog:
+    """
+    Compressed, columnar, append-only log partitioned by day and model version
+
+    Rows are buffered in memory and written as immutable segments under
+    <root>/<table>/day=YYYY-MM-DD/model=<version>/. A segment is a compressed
+    .npz file with one member per column, so a reader loads only the columns
+    it asks for, and a query only opens the partitions its day range and model
+    version select. A background thread flushes the buffer every
+    flush_interval seconds, or sooner once flush_rows rows are waiting, and
+    merges partitions that have collected compact_min_segments segments into
+    one part file.
+    """
+
+    # Column dtypes per table; the first column is the time that picks the day
+    SCHEMAS = {
+        'predictions': {
+            'scored_at': 'datetime64[ms]',
+            'record_time': 'datetime64[s]',
+            'sample_id': np.int64,
+            'pass_probability': np.float32,
+            'prediction': np.int8,  # 1 = Pass
+            'confidence': np.float32,
+            'source': 'S8',
+            'session_id': 'S32'
+        },
+        'training_runs': {
+            'trained_at': 'datetime64[ms]',
+            'train_rows': np.int64,
+            'test_rows': np.int64,
+            'n_features': np.int32,
+            'accuracy': np.float64,
+            'precision': np.float64,
+            'recall': np.float64,
+            'f1_score': np.float64,
+            'tn': np.int64,
+            'fp': np.int64,
+            'fn': np.int64,
+            'tp': np.int64,
+            'training_seconds': np.float64
+        }
+    }
+
+    GROUP_BY = ('day', 'hour', 'model_version', 'source')
+
+    def __init__(self, root_dir: str, flush_rows: int = 10000, flush_interval: float = 5.0,
+                 compact_min_segments: int = 8):
+        """
+        Initialize the log
+
+        Args:
+            root_dir: Directory holding the tables
+            flush_rows: Buffered rows that trigger an early flush
+            flush_interval: Seconds between background flushes
+            compact_min_segments: Segments in a partition that trigger compaction
+        """
+        self.root_dir = root_dir
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.compact_min_segments = compact_min_segments
+
+        self._buffers = {}
+        self._buffered_rows = 0
+        self._buffer_lock = threading.Lock()
+        # Writers, compaction and readers of the files take this lock
+        self._io_lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._sequence = itertools.count()
+
+        self.segments_written = 0
+        self.compactions = 0
+
+        self._recover()
+
+    @staticmethod
+    def _version_name(model_version: Optional[str]) -> str:
+        return (model_version or 'unknown').replace(os.sep, '_')
+
+    def _partition_dir(self, table: str, day: str, model_version: str) -> str:
+        return os.path.join(self.root_dir, table, f"day={day}", f"model={model_version}")
+
+    def append(self, table: str, model_version: Optional[str], columns: Dict[str, Any]) -> None:
+        """
+        Buffer rows for a table
+
+        Args:
+            table: Table name, a key of SCHEMAS
+            model_version: Version of the model the rows belong to
+            columns: Equal-length values for every column of the table
+
+        Raises:
+            KeyError: If a column of the table is missing
+        """
+        schema = self.SCHEMAS[table]
+        arrays = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in schema.items()}
+        time_column = next(iter(schema))
+        if len(arrays[time_column]) == 0:
+            return
+
+        version = self._version_name(model_version)
+        days = arrays[time_column].astype('datetime64[D]')
+        unique_days = np.unique(days)
+        with self._buffer_lock:
+            for day in unique_days:
+                rows = days == day if len(unique_days) > 1 else slice(None)
+                chunk = {name: values[rows] for name, values in arrays.items()}
+                self._buffers.setdefault((table, str(day), version), []).append(chunk)
+            self._buffered_rows += len(days)
+            flush_now = self._buffered_rows >= self.flush_rows
+
+        if flush_now:
+            if self._thread is not None:
+                self._wakeup.set()
+            else:
+                self.flush()
+
+    def flush(self) -> int:
+        """
+        Write buffered rows as one segment per partition
+
+        Returns:
+            Number of rows written
+        """
+        with self._io_lock:
+            with self._buffer_lock:
+                buffers, self._buffers = self._buffers, {}
+                self._buffered_rows = 0
+
+            written = 0
+            for (table, day, version), chunks in buffers.items():
+                data = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in self.SCHEMAS[table]}
+                partition = self._partition_dir(table, day, version)
+                os.makedirs(partition, exist_ok=True)
+                self._write(os.path.join(partition, f"seg-{time.time_ns()}-{next(self._sequence)}.npz"), data)
+                self.segments_written += 1
+                written += len(next(iter(data.values())))
+            return written
+
+    @staticmethod
+    def _write(path: str, data: Dict[str, np.ndarray]) -> None:
+        """Write an .npz file atomically"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **data)
+        os.replace(tmp_path, path)
+
+    def _partitions(self, table: str, start_day: Optional[np.datetime64] = None,
+                    end_day: Optional[np.datetime64] = None,
+                    model_version: Optional[str] = None) -> Iterator[Tuple[str, str, str]]:
+        """Partitions of a table within a day range and for a model version, oldest first"""
+        table_dir = os.path.join(self.root_dir, table)
+        if not os.path.isdir(table_dir):
+            return
+        for day_name in sorted(os.listdir(table_dir)):
+            if not day_name.startswith('day='):
+                continue
+            day = np.datetime64(day_name[4:], 'D')
+            if (start_day is not None and day < start_day) or (end_day is not None and day > end_day):
+                continue
+            day_dir = os.path.join(table_dir, day_name)
+            for model_name in sorted(os.listdir(day_dir)):
+                version = model_name[6:]
+                if model_version is not None and version != self._version_name(model_version):
+                    continue
+                yield day_name[4:], version, os.path.join(day_dir, model_name)
+
+    @staticmethod
+    def _files(partition: str, prefix: str = '') -> List[str]:
+        return sorted(name for name in os.listdir(partition)
+                      if name.endswith('.npz') and name.startswith(prefix))
+
+    def _read_partition(self, partition: str, columns: List[str]) -> Dict[str, np.ndarray]:
+        """Read some columns of every file in a partition"""
+        parts = []
+        for name in self._files(partition):
+            with np.load(os.path.join(partition, name)) as data:
+                parts.append({column: data[column] for column in columns})
+        return {column: np.concatenate([part[column] for part in parts]) for column in columns}
+
+    def compact(self) -> int:
+        """
+        Merge the files of partitions that have collected enough segments
+
+        The merged part records the files it replaces, so a crash between
+        writing it and deleting them is repaired on the next start.
+
+        Returns:
+            Number of partitions compacted
+        """
+        compacted = 0
+        for table, schema in self.SCHEMAS.items():
+            for _, _, partition in list(self._partitions(table)):
+                with self._io_lock:
+                    if len(self._files(partition, 'seg-')) < self.compact_min_segments:
+                        continue
+                    sources = self._files(partition)
+                    data = self._read_partition(partition, list(schema))
+                    time_column = next(iter(schema))
+                    order = np.argsort(data[time_column], kind='stable')
+                    data = {column: values[order] for column, values in data.items()}
+                    data['__sources__'] = np.array(sources, dtype='S')
+                    self._write(os.path.join(partition, f"part-{time.time_ns()}.npz"), data)
+                    for name in sources:
+                        os.remove(os.path.join(partition, name))
+                compacted += 1
+        self.compactions += compacted
+        return compacted
+
+    def _recover(self) -> None:
+        """Delete files already merged into a part and unfinished temporary files"""
+        for table in self.SCHEMAS:
+            for _, _, partition in self._partitions(table):
+                for name in os.listdir(partition):
+                    if name.endswith('.tmp'):
+                        os.remove(os.path.join(partition, name))
+                for name in self._files(partition, 'part-'):
+                    with np.load(os.path.join(partition, name)) as data:
+                        sources = [source.decode() for source in data['__sources__']]
+                    for source in sources:
+                        if os.path.exists(os.path.join(partition, source)):
+                            os.remove(os.path.join(partition, source))
+
+    def start(self) -> None:
+        """Start the background flush and compaction thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='result-log', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                self.compact()
+            except Exception as e:
+                logger.error(f"Error writing result log: {str(e)}")
+
+    @staticmethod
+    def _parse_bound(value: Optional[str], end: bool = False) -> Optional[np.datetime64]:
+        """Parse a range bound; a date-only end covers the whole day"""
+        if not value:
+            return None
+        bound = np.datetime64(value, 'ms')
+        if end and len(value) == 10:
+            bound += ONE_DAY
+        return bound
+
+    def query_predictions(self, start: Optional[str] = None, end: Optional[str] = None,
+                          model_version: Optional[str] = None, source: Optional[str] = None,
+                          group_by: str = 'day') -> Dict[str, Any]:
+        """
+        Pass rate and confidence of logged predictions
+
+        Args:
+            start: Earliest scoring time, inclusive
+            end: Latest scoring time, exclusive; a date-only end includes that day
+            model_version: Only predictions of this model version
+            source: Only predictions from this source, e.g. simulate, session or predict
+            group_by: One of day, hour, model_version or source
+
+        Returns:
+            Row count, pass rate and average confidence per group, with the
+            partitions and columns that were read
+
+        Raises:
+            ValueError: If group_by is unknown or a bound is not a timestamp
+        """
+        if group_by not in self.GROUP_BY:
+            raise ValueError(f"group_by must be one of {', '.join(self.GROUP_BY)}")
+        start_bound, end_bound = self._parse_bound(start), self._parse_bound(end, end=True)
+        self.flush()
+
+        groups = {}
+        columns_read = set()
+        partitions_read = 0
+        with self._io_lock:
+            for day, version, partition in self._partitions(
+                'predictions',
+                start_bound.astype('datetime64[D]') if start_bound is not None else None,
+                (end_bound - np.timedelta64(1, 'ms')).astype('datetime64[D]') if end_bound is not None else None,
+                model_version
+            ):
+                # Only partitions cut by the range need their scoring times
+                day_start = np.datetime64(day, 'ms')
+                cut = (start_bound is not None and start_bound > day_start) or \
+                      (end_bound is not None and end_bound < day_start + ONE_DAY)
+                columns = ['prediction', 'confidence']
+                if cut or group_by == 'hour':
+                    columns.append('scored_at')
+                if source is not None or group_by == 'source':
+                    columns.append('source')
+                data = self._read_partition(partition, columns)
+                columns_read.update(columns)
+                partitions_read += 1
+
+                keep = np.ones(len(data['prediction']), dtype=bool)
+                if start_bound is not None and cut:
+                    keep &= data['scored_at'] >= start_bound
+                if end_bound is not None and cut:
+                    keep &= data['scored_at'] < end_bound
+                if source is not None:
+                    keep &= data['source'] == source.encode()
+                if not keep.all():
+                    data = {column: values[keep] for column, values in data.items()}
+                if len(data['prediction']) == 0:
+                    continue
+
+                if group_by == 'day':
+                    keys, inverse = np.array([day]), np.zeros(len(data['prediction']), dtype=np.intp)
+                elif group_by == 'model_version':
+                    keys, inverse = np.array([version]), np.zeros(len(data['prediction']), dtype=np.intp)
+                elif group_by == 'hour':
+                    keys, inverse = np.unique(data['scored_at'].astype('datetime64[h]'), return_inverse=True)
+                    keys = np.datetime_as_string(keys, unit='h')
+                else:
+                    keys, inverse = np.unique(data['source'], return_inverse=True)
+                    keys = np.char.decode(keys)
+
+                counts = np.bincount(inverse, minlength=len(keys))
+                passes = np.bincount(inverse, weights=data['prediction'], minlength=len(keys))
+                confidence = np.bincount(inverse, weights=data['confidence'], minlength=len(keys))
+                for key, n, n_pass, total_confidence in zip(keys.tolist(), counts.tolist(),
+                                                            passes.tolist(), confidence.tolist()):
+                    totals = groups.setdefault(key, [0, 0.0, 0.0])
+                    totals[0] += n
+                    totals[1] += n_pass
+                    totals[2] += total_confidence
+
+        return {
+            'group_by': group_by,
+            'rows': sum(totals[0] for totals in groups.values()),
+            'partitions_read': partitions_read,
+            'columns_read': sorted(columns_read),
+            'groups': [
+                {
+                    'key': key,
+                    'rows': n,
+                    'pass_count': int(n_pass),
+                    'fail_count': n - int(n_pass),
+                    'pass_rate': n_pass / n,
+                    'average_confidence': total_confidence / n
+                }
+                for key, (n, n_pass, total_confidence) in sorted(groups.items())
+            ]
+        }
+
+    def training_runs(self, start: Optional[str] = None, end: Optional[str] = None,
+                      model_version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Logged training runs, oldest first
+
+        Args:
+            start: Earliest training time, inclusive
+            end: Latest training time, exclusive; a date-only end includes that day
+            model_version: Only runs that produced this model version
+
+        Returns:
+            One dictionary per run with its model version and metrics
+        """
+        start_bound, end_bound = self._parse_bound(start), self._parse_bound(end, end=True)
+        self.flush()
+
+        runs = []
+        columns = list(self.SCHEMAS['training_runs'])
+        with self._io_lock:
+            for _, version, partition in self._partitions(
+                'training_runs',
+                start_bound.astype('datetime64[D]') if start_bound is not None else None,
+                (end_bound - np.timedelta64(1, 'ms')).astype('datetime64[D]') if end_bound is not None else None,
+                model_version
+            ):
+                data = self._read_partition(partition, columns)
+                for i in range(len(data['trained_at'])):
+                    trained_at = data['trained_at'][i]
+                    if (start_bound is not None and trained_at < start_bound) or \
+                       (end_bound is not None and trained_at >= end_bound):
+                        continue
+                    run = {column: data[column][i].item() for column in columns[1:]}
+                    run['trained_at'] = np.datetime_as_string(trained_at, unit='ms')
+                    run['model_version'] = version
+                    runs.append(run)
+
+        return sorted(runs, key=lambda run: run['trained_at'])
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get log size and activity
+
+        Returns:
+            Dictionary with partitions, files, bytes on disk and buffered rows
+        """
+        partitions = segments = parts = size = 0
+        with self._io_lock:
+            for table in self.SCHEMAS:
+                for _, _, partition in self._partitions(table):
+                    partitions += 1
+                    for name in self._files(partition):
+                        segments += name.startswith('seg-')
+                        parts += name.startswith('part-')
+                        size += os.path.getsize(os.path.join(partition, name))
+        with self._buffer_lock:
+            buffered_rows = self._buffered_rows
+
+        return {
+            'partitions': partitions,
+            'segments': segments,
+            'compacted_parts': parts,
+            'size_mb': size / 1024 ** 2,
+            'buffered_rows': buffered_rows,
+            'segments_written': self.segments_written,
+            'compactions': self.compactions
+        }
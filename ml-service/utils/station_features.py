@@ -0,0 +1,243 @@
+"""
+Station-level aggregate features for L<line>_S<station>_F<feature> columns
+"""
+
+import numpy as np
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import logging
+
+if TYPE_CHECKING:
+    from utils.dataset_store import DatasetStore
+
+logger = logging.getLogger(__name__)
+
+FEATURE_PATTERN = re.compile(r'^L(\d+)_S(\d+)_F(\d+)$')
+AGGREGATES = ('count', 'mean', 'min', 'max')
+
+# Up to this many rows per call, min and max use one reduceat over the
+# flattened rows; above it, per-station reductions over a transposed chunk
+# win because reduceat pays a fixed cost per row and station
+FLAT_REDUCE_ROWS = 64
+
+class StationMap:
+    """
+    Feature columns grouped by station, parsed once from their names
+
+    Stations are ordered by station number, which follows the part's path
+    through the lines. Columns that do not follow the naming scheme are
+    not part of any station.
+    """
+
+    def __init__(self, feature_columns: List[str]):
+        """
+        Parse the station layout of a feature order
+
+        Args:
+            feature_columns: Ordered feature names
+
+        Raises:
+            ValueError: If no column follows the L*_S*_F* scheme
+        """
+        parsed = []
+        for j, name in enumerate(feature_columns):
+            match = FEATURE_PATTERN.match(name)
+            if match:
+                line, station, feature = (int(group) for group in match.groups())
+                parsed.append((station, feature, line, j))
+        if not parsed:
+            raise ValueError("No feature column follows the L<line>_S<station>_F<feature> scheme")
+        parsed.sort()
+
+        self.feature_columns = list(feature_columns)
+        self.key = hashlib.blake2b(json.dumps(self.feature_columns).encode(), digest_size=8).hexdigest()
+
+        # Column order that makes every station's columns contiguous
+        self.order = np.array([j for _, _, _, j in parsed], dtype=np.intp)
+        self.in_order = bool(np.array_equal(self.order, np.arange(len(feature_columns))))
+        stations = [f"L{line}_S{station}" for station, _, line, _ in parsed]
+        starts = [0] + [i for i in range(1, len(stations)) if stations[i] != stations[i - 1]]
+        self.starts = np.array(starts, dtype=np.intp)
+        self.bounds = np.r_[self.starts, len(stations)]
+        self.stations = [stations[start] for start in starts]
+
+        # Feature-to-station indicator: counts and sums are one matrix product
+        self.indicator = np.zeros((len(stations), len(self.stations)), dtype=np.float32)
+        self.indicator[np.arange(len(stations)), np.repeat(np.arange(len(starts)), np.diff(self.bounds))] = 1.0
+
+    @property
+    def n_stations(self) -> int:
+        """Number of stations"""
+        return len(self.stations)
+
+    @property
+    def aggregate_columns(self) -> List[str]:
+        """Names of the aggregate columns, grouped by aggregate"""
+        return ([f"{station}_{aggregate}" for aggregate in AGGREGATES for station in self.stations]
+                + ['first_station', 'last_station'])
+
+    def aggregate(self, X: np.ndarray, missing_value: Optional[float] = 0.0,
+                  chunk_rows: int = 2048) -> np.ndarray:
+        """
+        Per-station aggregates of a feature matrix
+
+        For every station: the number of present features, and their mean,
+        min and max (NaN for stations the part did not visit). For every
+        row: the position of the first and last visited station in station
+        order, NaN if none. The work runs in chunks of rows so temporaries
+        stay cache-sized.
+
+        Args:
+            X: Float32 matrix in this map's feature order
+            missing_value: Value that also marks a missing feature besides
+                NaN; the service fills missing readings with 0
+            chunk_rows: Rows aggregated at a time
+
+        Returns:
+            Float32 matrix of shape (rows, 4 * stations + 2)
+        """
+        n_rows, n_stations = len(X), self.n_stations
+        output = np.empty((n_rows, len(AGGREGATES) * n_stations + 2), dtype=np.float32)
+        for start in range(0, n_rows, chunk_rows):
+            rows = slice(start, min(start + chunk_rows, n_rows))
+            chunk = X[rows] if self.in_order else X[rows][:, self.order]
+            self._aggregate_chunk(np.asarray(chunk, dtype=np.float32), missing_value, output[rows])
+        return output
+
+    def _aggregate_chunk(self, X: np.ndarray, missing_value: Optional[float], out: np.ndarray) -> None:
+        n_stations = self.n_stations
+        present = ~np.isnan(X)
+        if missing_value is not None:
+            present &= X != missing_value
+
+        counts = present.astype(np.float32) @ self.indicator
+        sums = np.where(present, X, 0.0).astype(np.float32) @ self.indicator
+        low = np.where(present, X, np.inf)
+        high = np.where(present, X, -np.inf)
+
+        if len(X) <= FLAT_REDUCE_ROWS:
+            segments = (np.arange(len(X))[:, None] * X.shape[1] + self.starts).ravel()
+            minimums = np.minimum.reduceat(low.ravel(), segments).reshape(len(X), n_stations)
+            maximums = np.maximum.reduceat(high.ravel(), segments).reshape(len(X), n_stations)
+        else:
+            # Stations as contiguous row blocks: each min/max is elementwise over rows
+            low, high = np.ascontiguousarray(low.T), np.ascontiguousarray(high.T)
+            minimums = np.empty((n_stations, len(X)), dtype=np.float32)
+            maximums = np.empty((n_stations, len(X)), dtype=np.float32)
+            for s in range(n_stations):
+                np.minimum.reduce(low[self.bounds[s]:self.bounds[s + 1]], axis=0, out=minimums[s])
+                np.maximum.reduce(high[self.bounds[s]:self.bounds[s + 1]], axis=0, out=maximums[s])
+            minimums, maximums = minimums.T, maximums.T
+
+        visited = counts > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[:, :n_stations] = counts
+            out[:, n_stations:2 * n_stations] = np.where(visited, sums / counts, np.nan)
+        out[:, 2 * n_stations:3 * n_stations] = np.where(visited, minimums, np.nan)
+        out[:, 3 * n_stations:4 * n_stations] = np.where(visited, maximums, np.nan)
+
+        any_visited = visited.any(axis=1)
+        out[:, -2] = np.where(any_visited, visited.argmax(axis=1), np.nan)
+        out[:, -1] = np.where(any_visited, n_stations - 1 - visited[:, ::-1].argmax(axis=1), np.nan)
+
+class StationFeatureCache:
+    """
+    On-disk station aggregates of the stored dataset, one file per feature layout
+
+    Aggregating the stored dataset costs far more than scoring its rows
+    with a compact model, and the result only changes with the dataset, so
+    it is computed once per dataset fingerprint and memory-mapped after
+    that. Files of replaced datasets are removed when a new one is cached.
+    """
+
+    def __init__(self, cache_dir: str, missing_value: Optional[float] = 0.0, chunk_rows: int = 50000):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory holding the cached aggregates
+            missing_value: Value that marks a missing feature besides NaN
+            chunk_rows: Stored rows aggregated per chunk
+        """
+        self.cache_dir = cache_dir
+        self.missing_value = missing_value
+        self.chunk_rows = chunk_rows
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, fingerprint: str, station_map: StationMap) -> str:
+        return os.path.join(self.cache_dir, f"{fingerprint}-{station_map.key}.npy")
+
+    def get(self, store: 'DatasetStore', station_map: StationMap) -> np.ndarray:
+        """
+        Station aggregates of every stored row, computing them on a miss
+
+        Args:
+            store: Dataset store holding the rows
+            station_map: Station layout of the model's feature order;
+                stored columns the model lacks are ignored and columns the
+                stored dataset lacks count as missing
+
+        Returns:
+            Read-only memory-mapped aggregate matrix, one row per stored row
+        """
+        with self._lock:
+            path = self._path(store.fingerprint, station_map)
+            if os.path.exists(path):
+                self.hits += 1
+                return np.load(path, mmap_mode='r')
+            self.misses += 1
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for stale in glob.glob(os.path.join(self.cache_dir, '*.npy')):
+                if not os.path.basename(stale).startswith(f"{store.fingerprint}-"):
+                    os.remove(stale)
+
+            features = store.array('features')
+            aligned = store.feature_columns == station_map.feature_columns
+            positions = {name: i for i, name in enumerate(store.feature_columns)}
+            column_map = [(j, positions[name]) for j, name in enumerate(station_map.feature_columns)
+                          if name in positions]
+
+            tmp_path = f"{path}.tmp"
+            output = np.lib.format.open_memmap(
+                tmp_path, mode='w+', dtype=np.float32,
+                shape=(len(features), len(station_map.aggregate_columns))
+            )
+            for start in range(0, len(features), self.chunk_rows):
+                batch = features[start:start + self.chunk_rows]
+                if not aligned:
+                    reordered = np.full((len(batch), len(station_map.feature_columns)), np.nan, dtype=np.float32)
+                    for model_idx, stored_idx in column_map:
+                        reordered[:, model_idx] = batch[:, stored_idx]
+                    batch = reordered
+                output[start:start + len(batch)] = station_map.aggregate(batch, self.missing_value)
+            output.flush()
+            del output
+            os.replace(tmp_path, path)
+
+            logger.info(f"Cached station aggregates of dataset {store.fingerprint} "
+                        f"for {station_map.n_stations} stations")
+            return np.load(path, mmap_mode='r')
+
+    def clear(self) -> None:
+        """Remove every cached file"""
+        with self._lock:
+            for path in glob.glob(os.path.join(self.cache_dir, '*.npy*')):
+                os.remove(path)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get cache hit counts and size"""
+        files = glob.glob(os.path.join(self.cache_dir, '*.npy'))
+        return {
+            'cached_layouts': len(files),
+            'size_mb': sum(os.path.getsize(path) for path in files) / 1024 ** 2,
+            'hits': self.hits,
+            'misses': self.misses
+        }
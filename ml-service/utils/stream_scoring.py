@@ -0,0 +1,196 @@
+"""
+Batched scoring of feature vectors streamed over a WebSocket
+"""
+
+import numpy as np
+from collections import deque
+from fastapi import WebSocket, WebSocketDisconnect
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import asyncio
+import json
+import logging
+
+from utils.data_processor import DataProcessor
+
+logger = logging.getLogger(__name__)
+
+class StreamScoringSession:
+    """
+    One WebSocket connection streaming readings in and predictions out
+
+    Flow control is credit based. The ready message grants the client
+    ``max_in_flight_rows`` credits, every row sent uses one, and every
+    predictions message hands back one credit per row it scored. The server
+    stops reading from the socket while the in-flight limit is reached, so a
+    producer that ignores its credits is held back by TCP instead of growing
+    server memory, and a frame that would overrun the limit closes the
+    connection.
+
+    Frames from the client are either JSON text, holding one reading
+    ``{"id": ..., "features": {...}}`` or ``{"readings": [...]}``, or binary
+    little-endian float32 rows in the feature order announced at connect.
+    """
+
+    def __init__(self, websocket: WebSocket, scorer: Callable[[np.ndarray], np.ndarray],
+                 feature_columns: List[str], model_version: Optional[str],
+                 threshold: float = 0.5, batch_size: int = 256, max_batch_delay_ms: float = 10,
+                 max_in_flight_rows: int = 4096,
+                 recorder: Optional[Callable[['StreamScoringSession', List[Any], np.ndarray], None]] = None):
+        """
+        Initialize the session
+
+        Args:
+            websocket: Accepted WebSocket connection
+            scorer: Function returning pass probabilities for a float32 matrix
+            feature_columns: Feature order of binary frames and of the scorer
+            model_version: Version of the model behind the scorer
+            threshold: Pass probability above which a row is predicted Pass
+            batch_size: Rows gathered into one scoring call
+            max_batch_delay_ms: Longest wait for a batch to fill
+            max_in_flight_rows: Rows received but not yet answered
+            recorder: Called with the session, the row ids (None for binary
+                rows) and the pass probabilities of every scored batch
+        """
+        self.websocket = websocket
+        self.scorer = scorer
+        self.feature_columns = feature_columns
+        self.model_version = model_version
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay_ms / 1000
+        self.max_in_flight_rows = max_in_flight_rows
+        self.recorder = recorder
+
+        self._pending = deque()
+        self._pending_rows = 0
+        self._next_seq = 0
+        self._capacity = asyncio.Condition()
+        self._rows_available = asyncio.Event()
+
+    async def run(self) -> None:
+        """Serve the connection until the client disconnects"""
+        await self.websocket.send_json({
+            'type': 'ready',
+            'modelVersion': self.model_version,
+            'features': self.feature_columns,
+            'credits': self.max_in_flight_rows,
+            'batchSize': self.batch_size
+        })
+
+        # Whichever side ends first, the disconnect or a failed scorer, ends the other
+        tasks = [asyncio.create_task(self._receive_frames()), asyncio.create_task(self._score_batches())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                try:
+                    await task
+                except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+                    pass
+
+    def _decode_json(self, text: str) -> Tuple[List[Any], np.ndarray]:
+        message = json.loads(text)
+        readings = message['readings'] if 'readings' in message else [message]
+        ids = [reading.get('id') for reading in readings]
+        X = DataProcessor.build_feature_matrix([reading['features'] for reading in readings],
+                                               self.feature_columns)
+        return ids, X
+
+    def _decode_binary(self, data: bytes) -> Tuple[List[Any], np.ndarray]:
+        row_bytes = 4 * len(self.feature_columns)
+        if len(data) % row_bytes:
+            raise ValueError(f"Binary frame length {len(data)} is not a multiple of {row_bytes} bytes per row")
+        X = np.frombuffer(data, dtype='<f4').reshape(-1, len(self.feature_columns)).astype(np.float32)
+        # Missing features are 0, as for JSON frames and every other endpoint
+        np.copyto(X, np.float32(0.0), where=np.isnan(X))
+        return [None] * len(X), X
+
+    async def _receive_frames(self) -> None:
+        while True:
+            # Backpressure: do not read another frame while the limit is reached
+            async with self._capacity:
+                await self._capacity.wait_for(lambda: self._pending_rows < self.max_in_flight_rows)
+
+            message = await self.websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                raise WebSocketDisconnect(message.get('code', 1000))
+
+            try:
+                if message.get('bytes') is not None:
+                    ids, X = self._decode_binary(message['bytes'])
+                else:
+                    ids, X = self._decode_json(message['text'])
+            except (ValueError, KeyError, TypeError) as e:
+                await self.websocket.send_json({'type': 'error', 'detail': f"Invalid frame: {str(e)}"})
+                continue
+
+            if self._pending_rows + len(X) > self.max_in_flight_rows:
+                await self.websocket.send_json({'type': 'error', 'detail': "Credit limit exceeded"})
+                await self.websocket.close(code=1008)
+                return
+
+            seqs = range(self._next_seq, self._next_seq + len(X))
+            self._next_seq += len(X)
+            self._pending.append((seqs, ids, X))
+            self._pending_rows += len(X)
+            self._rows_available.set()
+
+    async def _score_batches(self) -> None:
+        while True:
+            await self._rows_available.wait()
+            if self._pending_rows < self.batch_size and self.max_batch_delay > 0:
+                # Give a partial batch a moment to fill
+                await asyncio.sleep(self.max_batch_delay)
+
+            seqs, ids, matrices = [], [], []
+            batch_rows = 0
+            while self._pending and batch_rows < self.batch_size:
+                frame_seqs, frame_ids, X = self._pending.popleft()
+                take = self.batch_size - batch_rows
+                if len(X) > take:
+                    # Split large frames so credits come back batch by batch
+                    self._pending.appendleft((frame_seqs[take:], frame_ids[take:], X[take:]))
+                    frame_seqs, frame_ids, X = frame_seqs[:take], frame_ids[:take], X[:take]
+                seqs.extend(frame_seqs)
+                ids.extend(frame_ids)
+                matrices.append(X)
+                batch_rows += len(X)
+            if not self._pending:
+                self._rows_available.clear()
+
+            try:
+                # Off the event loop, so other connections and requests are served meanwhile
+                pass_probabilities = await asyncio.to_thread(self.scorer, np.concatenate(matrices))
+            except Exception as e:
+                logger.error(f"Error scoring streamed batch: {str(e)}")
+                await self.websocket.send_json({'type': 'error', 'detail': f"Scoring failed: {str(e)}"})
+                await self.websocket.close(code=1011)
+                return
+            if self.recorder is not None:
+                try:
+                    self.recorder(self, ids, pass_probabilities)
+                except Exception as e:
+                    logger.error(f"Error recording streamed batch: {str(e)}")
+            await self.websocket.send_json({
+                'type': 'predictions',
+                'results': [self._format_result(seq, sample_id, float(probability))
+                            for seq, sample_id, probability in zip(seqs, ids, pass_probabilities)],
+                'credits': batch_rows
+            })
+
+            async with self._capacity:
+                self._pending_rows -= batch_rows
+                self._capacity.notify_all()
+
+    def _format_result(self, seq: int, sample_id: Any, pass_probability: float) -> Dict[str, Any]:
+        prediction = 1 if pass_probability > self.threshold else 0
+        result = {
+            'seq': seq,
+            'prediction': "Pass" if prediction == 1 else "Fail",
+            'confidence': pass_probability if prediction == 1 else 1 - pass_probability
+        }
+        if sample_id is not None:
+            result['id'] = sample_id
+        return result
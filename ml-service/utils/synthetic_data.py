@@ -0,0 +1,315 @@
+"""
+Vectorized synthetic workloads shaped like the Bosch production line data
+"""
+
+import numpy as np
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional
+import threading
+import logging
+
+if TYPE_CHECKING:
+    from utils.dataset_store import DatasetStore
+
+logger = logging.getLogger(__name__)
+
+# Stations per line in the Bosch numeric data, used as line proportions
+BOSCH_LINE_STATIONS = (24, 2, 3, 23)
+
+# Sensor field: (mean, standard deviation, decimals)
+SENSOR_FIELDS = {
+    'temperature': (20.0, 5.0, 1),   # 20°C ± 5°C
+    'pressure': (1000.0, 50.0, 0),   # 1000 hPa ± 50 hPa
+    'humidity': (50.0, 15.0, 1),     # 50% ± 15%
+    'vibration': (0.0, 0.5, 3),      # Vibration sensor
+    'voltage': (220.0, 10.0, 1),     # 220V ± 10V
+    'current': (5.0, 1.0, 2)         # 5A ± 1A
+}
+
+def _split(total: int, weights: np.ndarray) -> np.ndarray:
+    """Split total into len(weights) positive parts proportional to weights"""
+    weights = np.asarray(weights, dtype=np.float64)
+    extra = (total - len(weights)) * weights / weights.sum()
+    sizes = 1 + np.floor(extra).astype(np.int64)
+    remainder = total - sizes.sum()
+    sizes[np.argsort(np.floor(extra) - extra, kind='stable')[:remainder]] += 1
+    return sizes
+
+class SyntheticDataGenerator:
+    """
+    Seeded generator of Bosch-like rows in array form
+
+    Features are named L<line>_S<station>_F<feature> and grouped by station.
+    Every part follows one of a few product routes through the stations;
+    each route covers a subset of lines and stations, and a visited station
+    is occasionally skipped. Features of stations a part did not visit are
+    NaN, so rows are mostly empty in station-shaped blocks as in the Bosch
+    data. Values carry three decimals.
+
+    Rather than drawing every value, each station keeps a pool of
+    pre-drawn value blocks, and a visited station copies in one block
+    picked at random. Stations pick independently, so rows rarely repeat.
+    Generating a chunk is then one block copy per station, and each
+    block's share of the failure risk is also computed only once. Parts fail at
+    failure_rate, driven by a few signal features and by the route.
+    Timestamps are strictly increasing with exponential gaps.
+
+    The same seed and chunk size always produce the same rows.
+    """
+
+    def __init__(self, n_features: int = 968, n_stations: Optional[int] = None, n_lines: int = 4,
+                 failure_rate: float = 0.0058, n_routes: int = 8, n_signal_features: int = 8,
+                 mean_interval_ms: float = 1000.0, start: str = '2021-01-01T00:00:00',
+                 seed: int = 42, pool_rows: int = 4096):
+        """
+        Initialize the generator and draw its station layout
+
+        Args:
+            n_features: Feature columns
+            n_stations: Stations the features are grouped by; defaults to the
+                Bosch density of about 19 features per station, at most 52
+            n_lines: Production lines the stations are grouped by
+            failure_rate: Fraction of parts that fail
+            n_routes: Product routes through the stations
+            n_signal_features: Features that drive failures
+            mean_interval_ms: Mean time between consecutive parts
+            start: Timestamp of the first part
+            seed: Seed of the layout and of every chunk
+            pool_rows: Pre-drawn value blocks per station
+
+        Raises:
+            ValueError: If the layout is inconsistent
+        """
+        if n_stations is None:
+            n_stations = min(n_features, max(n_lines, min(52, round(n_features / 18.6))))
+        if not 1 <= n_lines <= n_stations <= n_features:
+            raise ValueError("Need 1 <= n_lines <= n_stations <= n_features")
+        if not 0 < failure_rate < 1:
+            raise ValueError("failure_rate must be in (0, 1)")
+
+        self.n_features = n_features
+        self.n_stations = n_stations
+        self.failure_rate = failure_rate
+        self.mean_interval_ms = mean_interval_ms
+        self.start = np.datetime64(start, 'ms')
+        self.seed = seed
+
+        rng = np.random.default_rng(seed)
+
+        # Layout: stations per line, features per station
+        line_weights = BOSCH_LINE_STATIONS if n_lines == len(BOSCH_LINE_STATIONS) else np.ones(n_lines)
+        station_lines = np.repeat(np.arange(n_lines), _split(n_stations, line_weights))
+        station_sizes = _split(n_features, rng.dirichlet(np.ones(n_stations)))
+        self.station_bounds = np.r_[0, np.cumsum(station_sizes)]
+        self.feature_columns = [
+            f"L{station_lines[s]}_S{s}_F{j}"
+            for s in range(n_stations)
+            for j in range(self.station_bounds[s], self.station_bounds[s + 1])
+        ]
+
+        # Routes: each covers some lines and some stations on them
+        route_lines = rng.random((n_routes, n_lines)) < 0.6
+        route_lines[np.arange(n_routes), rng.integers(0, n_lines, n_routes)] = True
+        self.route_stations = route_lines[:, station_lines] & (rng.random((n_routes, n_stations)) < 0.4)
+        for route in np.flatnonzero(~self.route_stations.any(axis=1)):
+            self.route_stations[route, rng.integers(0, n_stations)] = True
+        self.route_cdf = np.cumsum(rng.dirichlet(np.full(n_routes, 0.7)))
+        self.route_cdf[-1] = 1.0
+        self.skip_rate = 0.05
+
+        # Value pools, standard normal before each feature's offset and scale
+        standard = [rng.standard_normal((pool_rows, size), dtype=np.float32) for size in station_sizes]
+        offsets = rng.normal(0, 0.1, n_features).astype(np.float32)
+        scales = rng.uniform(0.02, 0.3, n_features).astype(np.float32)
+        self.pools = [
+            np.round(block * scales[a:b] + offsets[a:b], 3)
+            for block, a, b in zip(standard, self.station_bounds[:-1], self.station_bounds[1:])
+        ]
+
+        # Failure risk: signal features plus a per-route propensity
+        signal = rng.choice(n_features, min(n_signal_features, n_features), replace=False)
+        weights = np.zeros(n_features, dtype=np.float32)
+        weights[signal] = rng.choice([-1.0, 1.0], len(signal)) * rng.uniform(1.0, 2.0, len(signal))
+        self.signal_features = [self.feature_columns[j] for j in sorted(signal)]
+        self.pool_risk = [
+            block @ weights[a:b]
+            for block, a, b in zip(standard, self.station_bounds[:-1], self.station_bounds[1:])
+        ]
+        self.route_risk = rng.normal(0, 0.5, n_routes)
+
+        # Calibrate the failure cut so parts fail at failure_rate
+        calibration = self._risk(np.random.default_rng([seed, 2 ** 32 - 1]), 200_000)[0]
+        self.risk_cut = float(np.quantile(calibration, 1 - failure_rate))
+
+    def _risk(self, rng: np.random.Generator, n_rows: int):
+        """Failure risk, visiting rows per station and pool picks of n_rows parts"""
+        # Station-major so each station's rows are contiguous
+        routes = np.searchsorted(self.route_cdf, rng.random(n_rows), side='right')
+        visited = self.route_stations.T[:, routes]
+        visited &= rng.random((self.n_stations, n_rows), dtype=np.float32) >= self.skip_rate
+        picks = rng.integers(0, len(self.pools[0]), (self.n_stations, n_rows), dtype=np.int32)
+
+        risk = self.route_risk[routes] + rng.normal(0, 0.5, n_rows)
+        station_rows = [np.flatnonzero(station_visited) for station_visited in visited]
+        for s, rows in enumerate(station_rows):
+            risk[rows] += self.pool_risk[s][picks[s, rows]]
+        return risk, station_rows, picks
+
+    def _fill(self, chunk_index: int, first_row: int, out: Dict[str, np.ndarray],
+              last_time: np.datetime64) -> None:
+        """Fill the arrays in out with the chunk's rows"""
+        rng = np.random.default_rng([self.seed, chunk_index])
+        features = out['features']
+        n_rows = len(features)
+
+        risk, station_rows, picks = self._risk(rng, n_rows)
+        out['responses'][:] = risk <= self.risk_cut  # 1 = Pass
+
+        features.fill(np.nan)
+        for s, rows in enumerate(station_rows):
+            features[rows, self.station_bounds[s]:self.station_bounds[s + 1]] = self.pools[s][picks[s, rows]]
+
+        gaps = np.maximum(1, rng.exponential(self.mean_interval_ms, n_rows).round()).astype(np.int64)
+        out['timestamps'][:] = last_time + np.cumsum(gaps).astype('timedelta64[ms]')
+        out['ids'][:] = np.arange(first_row, first_row + n_rows)
+
+    @staticmethod
+    def _allocate(n_rows: int, n_features: int) -> Dict[str, np.ndarray]:
+        return {
+            'features': np.empty((n_rows, n_features), dtype=np.float32),
+            'timestamps': np.empty(n_rows, dtype='datetime64[ms]'),
+            'ids': np.empty(n_rows, dtype=np.int64),
+            'responses': np.empty(n_rows, dtype=np.int8)
+        }
+
+    def chunks(self, n_rows: int, chunk_rows: int = 100_000) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Generate rows chunk by chunk
+
+        The chunk arrays are reused: each chunk overwrites the previous
+        one, so copy any array that must outlive the next iteration.
+
+        Args:
+            n_rows: Rows to generate
+            chunk_rows: Rows per chunk
+
+        Yields:
+            Dictionary with features, timestamps, ids and responses arrays
+        """
+        buffers = self._allocate(min(chunk_rows, n_rows), self.n_features)
+        last_time = self.start - np.timedelta64(1, 'ms')
+        for chunk_index, first_row in enumerate(range(0, n_rows, chunk_rows)):
+            size = min(chunk_rows, n_rows - first_row)
+            chunk = {name: array[:size] for name, array in buffers.items()}
+            self._fill(chunk_index, first_row, chunk, last_time)
+            last_time = chunk['timestamps'][-1]
+            yield chunk
+
+    def generate(self, n_rows: int, chunk_rows: int = 100_000) -> Dict[str, np.ndarray]:
+        """
+        Generate rows in memory
+
+        Args:
+            n_rows: Rows to generate
+            chunk_rows: Rows per chunk; the same as for chunks gives the same rows
+
+        Returns:
+            Dictionary with features, timestamps, ids and responses arrays
+        """
+        arrays = self._allocate(n_rows, self.n_features)
+        last_time = self.start - np.timedelta64(1, 'ms')
+        for chunk_index, first_row in enumerate(range(0, n_rows, chunk_rows)):
+            rows = slice(first_row, min(first_row + chunk_rows, n_rows))
+            self._fill(chunk_index, first_row, {name: array[rows] for name, array in arrays.items()},
+                       last_time)
+            last_time = arrays['timestamps'][rows.stop - 1]
+        return arrays
+
+    def save(self, store: 'DatasetStore', n_rows: int, chunk_rows: int = 100_000) -> str:
+        """
+        Write rows to a dataset store chunk by chunk
+
+        Args:
+            store: Dataset store to replace the contents of
+            n_rows: Rows to generate
+            chunk_rows: Rows per chunk
+
+        Returns:
+            Fingerprint of the stored dataset
+        """
+        return store.save_chunks(self.chunks(n_rows, chunk_rows), n_rows, self.feature_columns)
+
+    def to_points(self, arrays: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """
+        Convert rows to API data points, leaving out missing features
+
+        Args:
+            arrays: Rows as returned by generate or chunks
+
+        Returns:
+            Data points with timestamp, id, response and features
+        """
+        columns = np.array(self.feature_columns, dtype=object)
+        timestamps = np.datetime_as_string(arrays['timestamps'], unit='ms')
+        # Through float64 so values keep their three decimals in JSON
+        values = arrays['features'].astype(np.float64).round(3)
+        points = []
+        for timestamp, sample_id, response, row in zip(timestamps, arrays['ids'].tolist(),
+                                                       arrays['responses'].tolist(), values):
+            present = ~np.isnan(row)
+            points.append({
+                'timestamp': str(timestamp),
+                'id': sample_id,
+                'response': response,
+                'features': dict(zip(columns[present].tolist(), row[present].tolist()))
+            })
+        return points
+
+class SensorReadings:
+    """
+    Synthetic sensor readings drawn a block at a time
+
+    Readings are drawn and rounded for block_rows rows per call to the
+    random generator and handed out one at a time, so per-result callers
+    pay a list lookup rather than six random draws.
+    """
+
+    def __init__(self, seed: Optional[int] = None, block_rows: int = 4096):
+        """
+        Initialize the reading source
+
+        Args:
+            seed: Optional seed for reproducible readings
+            block_rows: Readings drawn per block
+        """
+        self.rng = np.random.default_rng(seed)
+        self.block_rows = block_rows
+        self._lock = threading.Lock()
+        self._block = []
+        self._next = 0
+
+    def block(self, n_rows: int) -> Dict[str, np.ndarray]:
+        """
+        Draw n_rows readings of every sensor
+
+        Args:
+            n_rows: Readings per sensor
+
+        Returns:
+            Dictionary of reading arrays keyed by sensor
+        """
+        return {
+            name: np.round(self.rng.normal(mean, std, n_rows), decimals)
+            for name, (mean, std, decimals) in SENSOR_FIELDS.items()
+        }
+
+    def next(self) -> Dict[str, float]:
+        """Get one reading of every sensor"""
+        with self._lock:
+            if self._next >= len(self._block):
+                readings = self.block(self.block_rows)
+                self._block = [dict(zip(readings, values))
+                               for values in zip(*(array.tolist() for array in readings.values()))]
+                self._next = 0
+            reading = self._block[self._next]
+            self._next += 1
+        return reading